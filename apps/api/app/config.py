@@ -6,13 +6,100 @@ from typing import Optional
 class Settings(BaseSettings):
 
     GEMINI_API_KEY: str
+    GEMINI_MAX_CONCURRENCY: int = 16
+    GEMINI_RPM: int = 300  # per worker; 0 disables
+    GEMINI_TPM: int = 1_000_000  # per worker; 0 disables
+    GEMINI_QUEUE_SIZE: int = 64
+    GEMINI_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    GEMINI_BACKOFF_SECONDS: float = 5.0
+    GEMINI_HEDGE_ENABLED: bool = False
+    GEMINI_HEDGE_PERCENTILE: float = 0.95
+    GEMINI_HEDGE_MIN_DELAY_SECONDS: float = 1.0
+    GEMINI_HEDGE_DEFAULT_DELAY_SECONDS: float = 5.0  # until enough samples exist
+    GEMINI_HEDGE_MIN_SAMPLES: int = 20
+    GEMINI_BREAKER_ENABLED: bool = True
+    GEMINI_BREAKER_WINDOW: int = 20
+    GEMINI_BREAKER_MIN_CALLS: int = 10
+    GEMINI_BREAKER_ERROR_RATE: float = 0.5
+    GEMINI_BREAKER_COOLDOWN_SECONDS: float = 30.0
+    GEMINI_TIMEOUT_SECONDS: float = 30.0
+    GEMINI_POOL_SIZE: int = 32
+    GEMINI_MODIFICATION_MODE: str = "patch"  # patch, full
+    GEMINI_COMPACT_PROMPTS: bool = True
+    GEMINI_STRUCTURED_OUTPUT: str = "schema"  # schema, json, off
+    FAST_EDITS_ENABLED: bool = True
+    TEMPLATE_MATCH_ENABLED: bool = True
+    TEMPLATE_MATCH_THRESHOLD: float = 0.5
+    TEMPLATE_MATCH_MARGIN: float = 0.15
+    TEMPLATE_FALLBACK_THRESHOLD: float = 0.25  # looser match used while Gemini is unavailable
+    GEMINI_CACHE_ENABLED: bool = True
+    GEMINI_CACHE_DIR: str = "/tmp/animation_gemini_cache"
+    GEMINI_CACHE_TTL_SECONDS: float = 7 * 24 * 3600
+    GEMINI_CACHE_MAX_MB: int = 64
     
 
     MANIM_QUALITY: str = "medium_quality"
     MAX_SCENE_DURATION: float = 10.0
     MAX_TOTAL_DURATION: float = 60.0
     TEMP_DIR: str = "/tmp/animations"
-    
+    TEMP_GC_ENABLED: bool = True
+    TEMP_GC_BUDGET_MB: int = 2048
+    TEMP_GC_MAX_AGE_HOURS: float = 24.0
+    TEMP_GC_MIN_AGE_SECONDS: int = 900  # grace period for files still being written
+    TEMP_GC_INTERVAL_SECONDS: int = 300
+    MANIM_CACHE_DIR: str = "/tmp/animation_manim_cache"  # tex/text outputs shared by all renders
+    MANIM_CACHE_MAX_MB: int = 512
+    MANIM_CACHE_WARM_ON_STARTUP: bool = True  # precompile template formulas and labels
+    MANIM_PARTIAL_CACHE_ENABLED: bool = True  # reuse unchanged play calls between renders of a project
+    MANIM_MEDIA_DIR: str = "/tmp/animation_manim_media"  # one media dir per project
+    MANIM_MEDIA_MAX_MB: int = 4096
+    RENDER_WORKERS: int = 0  # shared render pool size; 0 = one per CPU
+    RENDER_MAX_ACTIVE_JOBS: int = 16
+    RENDER_SCHEDULER_AGING: float = 1.0  # queued seconds of work forgiven per second a task waits
+    RENDER_SPLIT_SCENES: bool = True
+    RENDER_SEGMENT_MIN_SECONDS: float = 3.0  # shorter segments cost more in Manim startup than they save
+    RENDER_SEGMENT_WORKERS: int = 0  # 0 = one per CPU
+    RENDER_OPTIMIZE_IR: bool = True  # drop no-op plays and dead objects before code generation
+    RENDER_WORKER_MAX_TASKS: int = 200  # renders before a worker is replaced (bounds leaks); 0 = never
+    MOBJECT_CACHE_ENTRIES: int = 256  # per worker
+    LATEX_BINARY: str = "latex"
+    DVISVGM_BINARY: str = "dvisvgm"
+    LATEX_SVG_CACHE_DIR: str = "/tmp/animation_latex_svg"
+    LATEX_SVG_CACHE_MAX_MB: int = 64
+    QUICK_PREVIEW_WIDTH: int = 256
+    QUICK_PREVIEW_HEIGHT: int = 144
+    QUICK_PREVIEW_FPS: int = 6
+    QUICK_PREVIEW_MAX_FRAMES: int = 240  # fps drops for long animations to stay under this
+    QUICK_PREVIEW_MAX_CONCURRENCY: int = 2
+    QUICK_PREVIEW_CACHE_DIR: str = "/tmp/animation_quick_previews"
+    QUICK_PREVIEW_CACHE_MAX_MB: int = 256
+    SPECULATIVE_RENDER_ENABLED: bool = True
+    SPECULATIVE_RENDER_QUALITY: str = "medium"  # must match what clients queue for the preview to be reused
+    SPECULATIVE_RENDER_TTL_SECONDS: int = 900  # unadopted previews are discarded after this
+
+
+    ARTIFACT_BACKEND: str = "local"  # local, s3
+    ARTIFACT_DIR: str = "/tmp/animation_artifacts"
+    S3_BUCKET: Optional[str] = None
+    S3_ENDPOINT_URL: Optional[str] = None  # e.g. a local MinIO stand-in
+    S3_REGION: Optional[str] = None
+    S3_ACCESS_KEY_ID: Optional[str] = None
+    S3_SECRET_ACCESS_KEY: Optional[str] = None
+    S3_PREFIX: str = "artifacts/"
+
+
+    TTS_BACKEND: str = "gtts"  # gtts, espeak, piper
+    TTS_MAX_WORKERS: int = 4
+    ESPEAK_BINARY: str = "espeak-ng"
+    ESPEAK_WORDS_PER_MINUTE: int = 165
+    PIPER_BINARY: str = "piper"
+    PIPER_MODEL: Optional[str] = None  # path to a .onnx voice model
+    PIPER_MODEL_LANG: str = "en"  # language PIPER_MODEL speaks
+    PIPER_MODELS: dict[str, str] = {}  # more voices by language (JSON), e.g. {"de": "/models/de_DE.onnx"}
+    TTS_CACHE_DIR: str = "/tmp/animation_tts_cache"
+    TTS_CACHE_MAX_MB: int = 256
+    TTS_CHUNK_CHARS: int = 400  # long narration is synthesized in parallel chunks
+
 
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
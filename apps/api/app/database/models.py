@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, Boolean, DateTime, Text, ForeignKey, JSON, Enum
+from sqlalchemy import Column, String, Integer, BigInteger, Float, Boolean, DateTime, Text, ForeignKey, JSON, Enum
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -149,4 +149,33 @@ class DBSubscription(Base):
     current_period_end = Column(DateTime, nullable=False)
     cancel_at_period_end = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DBArtifact(Base):
+    __tablename__ = "artifacts"
+    
+    content_hash = Column(String, primary_key=True)  # sha256 of the file contents
+    backend = Column(String, nullable=False)  # local, s3
+    storage_key = Column(String, nullable=False)
+    extension = Column(String, nullable=False, default="")
+    size_bytes = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    refs = relationship("DBArtifactRef", back_populates="artifact")
+
+
+class DBArtifactRef(Base):
+    __tablename__ = "artifact_refs"
+    
+    id = Column(String, primary_key=True)
+    user_id = Column(String, ForeignKey("users.id"), nullable=False, index=True)
+    artifact_hash = Column(String, ForeignKey("artifacts.content_hash"), nullable=False, index=True)
+    ref_name = Column(String, nullable=False, index=True)  # e.g. render job id
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    artifact = relationship("DBArtifact", back_populates="refs")
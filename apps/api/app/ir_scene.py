@@ -0,0 +1,117 @@
+"""
+Manim scene that plays a scene program (see ManimService.scene_program)
+directly: mobjects and animations are built from the IR's data, with no
+Python source in between. Imported by render workers only.
+"""
+from typing import Any, Callable
+from manim import (
+    DEGREES, Circle, Create, Dot, FadeIn, FadeOut, MathTex, Rectangle, Rotate,
+    Scene, Square, Text, Triangle, VMobject, Write,
+)
+
+# Animations Manim adds to the scene (on top) when they start
+INTRODUCERS = {"write", "create", "fade_in"}
+
+Build = Callable[[type, tuple, dict], Any]
+
+
+def build_mobject(obj: dict, build: Build) -> Any:
+    """Construct an IR object the way the exported code does"""
+    if obj["type"] == "text":
+        mobject = build(Text, (obj["content"] or "",), {"font_size": obj["font_size"], "color": obj["color"]})
+    elif obj["type"] == "latex":
+        mobject = build(MathTex, (obj["content"] or "x",), {"color": obj["color"]})
+    elif obj["type"] == "shape" and obj["shape"] == "circle":
+        mobject = build(Circle, (), {
+            "radius": obj["radius"] or 1.0, "color": obj["color"], "fill_opacity": obj["fill_opacity"],
+        })
+    elif obj["type"] == "shape" and obj["shape"] == "square":
+        mobject = build(Square, (), {
+            "side_length": obj["side_length"] or 2.0, "color": obj["color"], "fill_opacity": obj["fill_opacity"],
+        })
+    elif obj["type"] == "shape" and obj["shape"] == "rectangle":
+        mobject = build(Rectangle, (), {
+            "width": obj["width"] or 2.0, "height": obj["height"] or 1.0,
+            "color": obj["color"], "fill_opacity": obj["fill_opacity"],
+        })
+    elif obj["type"] == "shape" and obj["shape"] == "triangle":
+        mobject = build(Triangle, (), {"color": obj["color"], "fill_opacity": obj["fill_opacity"]})
+    else:
+        mobject = build(Dot, (), {"color": obj["color"]})
+    return mobject.move_to(obj["position"] or [0, 0, 0])
+
+
+def build_animation(mobject: Any, anim: dict) -> Any:
+    if anim["type"] == "write":
+        return Write(mobject)
+    if anim["type"] == "create":
+        return Create(mobject)
+    if anim["type"] == "fade_in":
+        return FadeIn(mobject)
+    if anim["type"] == "fade_out":
+        return FadeOut(mobject)
+    if anim["type"] == "move_to":
+        return mobject.animate.move_to(anim["target_position"])
+    if anim["type"] == "scale":
+        return mobject.animate.scale(anim["scale_factor"] or 1.0)
+    if anim["type"] == "rotate":
+        return Rotate(mobject, angle=(anim["angle"] or 0.0) * DEGREES)
+    raise ValueError(f"Unsupported animation type: {anim['type']}")
+
+
+class IRScene(Scene):
+    """
+    Program: background color, style colors, the objects (IR dicts), the
+    plays whose end state the video starts from ("prior", for scene
+    segments) and the steps to render: ("wait", seconds) or
+    ("play", object id, animation dict).
+    """
+
+    def __init__(self, program: dict, build: Build, **kwargs):
+        self._program = program
+        self._build = build
+        super().__init__(**kwargs)
+
+    def construct(self):
+        program = self._program
+        self.camera.background_color = program["background"]
+        Text.set_default(color=program["text_color"])
+        MathTex.set_default(color=program["math_color"])
+        VMobject.set_default(color=program["primary_color"])
+
+        mobjects = {obj["id"]: build_mobject(obj, self._build) for obj in program["objects"]}
+        self._restore(mobjects, program["prior"])
+
+        for step in program["steps"]:
+            if step[0] == "wait":
+                self.wait(step[1])
+            else:
+                _, obj_id, anim = step
+                self.play(build_animation(mobjects[obj_id], anim), run_time=anim["duration"])
+
+    def _restore(self, mobjects: dict, plays: list) -> None:
+        """
+        Put mobjects, instantly, into the state the given plays leave: the
+        same transforms in the same order, and the same mobjects on screen
+        in the same z-order.
+        """
+        on_scene: list[str] = []
+        for obj_id, anim in plays:
+            # Introducers are (re-)added on top; other animations add if missing
+            if anim["type"] in INTRODUCERS and obj_id in on_scene:
+                on_scene.remove(obj_id)
+            if obj_id not in on_scene:
+                on_scene.append(obj_id)
+
+            mobject = mobjects[obj_id]
+            if anim["type"] == "fade_out":
+                on_scene.remove(obj_id)  # FadeOut restores the mobject, then removes it
+            elif anim["type"] == "move_to":
+                mobject.move_to(anim["target_position"])
+            elif anim["type"] == "scale":
+                mobject.scale(anim["scale_factor"] or 1.0)
+            elif anim["type"] == "rotate":
+                mobject.rotate((anim["angle"] or 0.0) * DEGREES)
+
+        if on_scene:
+            self.add(*(mobjects[obj_id] for obj_id in on_scene))
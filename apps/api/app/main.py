@@ -1,9 +1,11 @@
 from fastapi import FastAPI, HTTPException, Depends, Header, Request, Response, status
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from datetime import datetime
+import asyncio
+import json
 import os
 import uuid
 from typing import Optional, List
@@ -29,14 +31,21 @@ from .models import (
     ConversationDetail,
 )
 from .services.gemini_service import GeminiService
-from .services.manim_service import ManimService
+from .services.manim_service import ManimService, render_workers
 from .services.video_service import VideoService
 from .services.audio_service import AudioService
 from .services.auth_service import AuthService
 from .services.template_service import TemplateService
 from .services.job_queue_service import JobQueueService
+from .services.render_scheduler import URGENT, render_scheduler
+from .services.manim_cache_service import manim_asset_cache, manim_media_store
 from .services.marketplace_service import MarketplaceService
-from .database.database import get_db, init_db
+from .services.artifact_store_service import ArtifactStoreService
+from .services.temp_gc_service import TempDirGarbageCollector
+from .services.svg_preview_service import SvgPreviewService
+from .services.quick_preview_service import QuickPreviewService
+from .services.gemini_limiter import GeminiOverloadedError
+from .database.database import get_db, get_db_context, init_db
 from .database.models import (
     DBUser,
     DBAnimationProject,
@@ -70,10 +79,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["Content-Disposition"]  
+    expose_headers=["Content-Disposition", "Retry-After"]  
 )
 
 
+@app.exception_handler(GeminiOverloadedError)
+async def gemini_overloaded_handler(request: Request, exc: GeminiOverloadedError):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "retry_after": exc.retry_after},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 gemini_service = GeminiService()
 manim_service = ManimService()
 video_service = VideoService()
@@ -82,10 +100,28 @@ auth_service = AuthService()
 template_service = TemplateService()
 job_queue_service = JobQueueService()
 marketplace_service = MarketplaceService()
+artifact_store_service = ArtifactStoreService()
+svg_preview_service = SvgPreviewService()
+quick_preview_service = QuickPreviewService()
+temp_gc = TempDirGarbageCollector()
+temp_gc.exclude(settings.ARTIFACT_DIR)
+temp_gc.exclude(settings.TTS_CACHE_DIR)
+temp_gc.exclude(settings.LATEX_SVG_CACHE_DIR)
+temp_gc.exclude(settings.QUICK_PREVIEW_CACHE_DIR)
+temp_gc.add_cache(manim_asset_cache.cache_dir, manim_asset_cache.max_bytes)
+temp_gc.add_dir_cache(manim_media_store.root, manim_media_store.max_bytes)
 
 
 RATE_LIMIT_STORE = {}
 
+MEDIA_TYPES = {
+    ".mp4": "video/mp4",
+    ".gif": "image/gif",
+    ".webm": "video/webm",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+}
+
 
 
 
@@ -241,11 +277,70 @@ async def root():
     }
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    if settings.TEMP_GC_ENABLED:
+        asyncio.create_task(temp_gc.run_forever())
+    if settings.MANIM_CACHE_WARM_ON_STARTUP:
+        asyncio.create_task(_warm_manim_cache())
+
+
+async def _warm_manim_cache():
+    """Compile template formulas and labels into the shared Manim cache"""
+    objects = [
+        obj
+        for template in template_service.get_all_templates(include_premium=True)
+        for scene in template.animation_ir.scenes
+        for obj in scene.objects
+    ]
+    try:
+        count = await asyncio.to_thread(manim_service.warm_cache, objects)
+        print(f"Manim cache warmed with {count} template constructions")
+    except Exception as e:
+        print(f"Manim cache warm-up failed: {str(e)}")
+
+
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
 
+@app.get("/health/disk")
+async def disk_health():
+    """TEMP_DIR disk-pressure metrics and garbage collector stats"""
+    return await asyncio.to_thread(temp_gc.get_metrics)
+
+
+@app.get("/health/render")
+async def render_health():
+    """Render slots, shared scheduler queue, speculative and quick preview stats"""
+    return {
+        "current_jobs": job_queue_service.current_jobs,
+        "waiting_jobs": job_queue_service.waiting_jobs,
+        "max_concurrent_jobs": job_queue_service.max_concurrent_jobs,
+        "scheduler": render_scheduler.get_metrics(),
+        "speculative": job_queue_service.speculative_stats,
+        "quick_previews": quick_preview_service.get_metrics(),
+        "manim_cache": manim_asset_cache.get_metrics(),
+        "manim_media": manim_media_store.get_metrics(),
+        "render_workers": render_workers.get_metrics()
+    }
+
+
+@app.get("/health/gemini")
+async def gemini_health():
+    """Gemini limiter, breaker, per-attempt latency, cache and local fast-path metrics"""
+    return {
+        "limiter": gemini_service.limiter.get_metrics(),
+        "circuit_breaker": gemini_service.breaker.get_metrics(),
+        "latency": gemini_service.latency.get_metrics(),
+        "hedges": {"fired": gemini_service.hedges_fired, "won": gemini_service.hedges_won},
+        **gemini_service.cache.get_metrics(),
+        "fast_edits": gemini_service.fast_edits,
+        "template_matches": gemini_service.template_matches
+    }
+
+
 
 
 @app.post("/auth/register", response_model=Token)
@@ -340,6 +435,90 @@ async def apply_template(
 
 
 
+def _serialize_history(history: List[ChatMessage]) -> list[dict]:
+    return [
+        {
+            **msg.model_dump(exclude={"timestamp"}),
+            "timestamp": msg.timestamp.isoformat()
+        }
+        for msg in history
+    ]
+
+
+def _check_chat_allowed(current_user: User, db: Session) -> DBUser:
+    """Rate limit and credit checks shared by the chat endpoints"""
+    check_rate_limit(current_user, db)
+    
+    db_user = db.query(DBUser).filter(DBUser.id == current_user.id).first()
+    
+    if db_user.credits_remaining <= 0:
+        raise HTTPException(
+            status_code=402,
+            detail="No credits remaining. Please upgrade your plan!"
+        )
+    
+    return db_user
+
+
+def _charge_chat_credit(db_user: DBUser, db: Session) -> None:
+    db_user.credits_remaining -= 1
+    db_user.credits_used += 1
+    db_user.animations_created += 1
+    db.commit()
+
+
+def _chat_success_payload(
+    request: ConversationRequest,
+    assistant_text: str,
+    updated_animation: AnimationIR,
+    credits_remaining: int
+) -> dict:
+    manim_code = manim_service.generate_full_code(updated_animation)
+    description = _generate_description(updated_animation)
+    
+    user_msg = ChatMessage(
+        role="user",
+        content=request.message,
+        timestamp=datetime.utcnow(),
+        animation_state=request.current_animation
+    )
+    
+    assistant_msg = ChatMessage(
+        role="assistant",
+        content=assistant_text,
+        timestamp=datetime.utcnow(),
+        animation_state=updated_animation
+    )
+    
+    updated_history = request.conversation_history + [user_msg, assistant_msg]
+    
+    return {
+        "success": True,
+        "assistant_message": assistant_text,
+        "animation_ir": updated_animation.model_dump(),
+        "manim_code": manim_code,
+        "description": description,
+        "validation": {"valid": True, "errors": []},
+        "conversation_history": _serialize_history(updated_history),
+        "credits_used": 1,
+        "credits_remaining": credits_remaining
+    }
+
+
+def _chat_error_payload(request: ConversationRequest, error: str, credits_remaining: int) -> dict:
+    return {
+        "success": False,
+        "assistant_message": f"Error: {error}",
+        "animation_ir": None,
+        "manim_code": None,
+        "description": None,
+        "validation": {"valid": False, "errors": [error]},
+        "conversation_history": _serialize_history(request.conversation_history),
+        "credits_used": 0,
+        "credits_remaining": credits_remaining
+    }
+
+
 @app.post("/chat")
 async def chat(
     request: ConversationRequest,
@@ -348,99 +527,103 @@ async def chat(
 ):
     """Conversational animation generation with auth and credits"""
     try:
-
-        check_rate_limit(current_user, db)
-        
-
-        db_user = db.query(DBUser).filter(DBUser.id == current_user.id).first()
-        
-
-        if db_user.credits_remaining <= 0:
-            raise HTTPException(
-                status_code=402,
-                detail="No credits remaining. Please upgrade your plan!"
-            )
+        db_user = _check_chat_allowed(current_user, db)
+        job_queue_service.cancel_speculative(current_user.id)
         
-
-        assistant_text, updated_animation = gemini_service.generate_conversational_response(
+        assistant_text, updated_animation = await gemini_service.generate_conversational_response(
             user_message=request.message,
             conversation_history=request.conversation_history,
-            current_animation=request.current_animation
+            current_animation=request.current_animation,
+            use_cache=request.use_cache,
+            include_premium=current_user.tier != UserTier.FREE
         )
         
-
         validate_animation_limits(updated_animation, current_user)
         
-
-        db_user.credits_remaining -= 1
-        db_user.credits_used += 1
-        db_user.animations_created += 1
-        db.commit()
+        _charge_chat_credit(db_user, db)
         
-
-        manim_code = manim_service.generate_full_code(updated_animation)
-        description = _generate_description(updated_animation)
+        # Most chat turns are followed by a render; get a head start on it
+        job_queue_service.speculate(current_user.id, updated_animation)
         
-
-        user_msg = ChatMessage(
-            role="user",
-            content=request.message,
-            timestamp=datetime.utcnow(),
-            animation_state=request.current_animation
-        )
-        
-        assistant_msg = ChatMessage(
-            role="assistant",
-            content=assistant_text,
-            timestamp=datetime.utcnow(),
-            animation_state=updated_animation
-        )
-        
-        updated_history = request.conversation_history + [user_msg, assistant_msg]
-        
-        return JSONResponse(content={
-            "success": True,
-            "assistant_message": assistant_text,
-            "animation_ir": updated_animation.model_dump(),
-            "manim_code": manim_code,
-            "description": description,
-            "validation": {"valid": True, "errors": []},
-            "conversation_history": [
-                {
-                    **msg.model_dump(exclude={"timestamp"}),
-                    "timestamp": msg.timestamp.isoformat()
-                }
-                for msg in updated_history
-            ],
-                        "credits_used": 1,
-            "credits_remaining": db_user.credits_remaining
-        })
+        return JSONResponse(content=_chat_success_payload(
+            request, assistant_text, updated_animation, db_user.credits_remaining
+        ))
         
     except HTTPException:
         raise
     except ValueError as e:
         return JSONResponse(
             status_code=400,
-            content={
-                "success": False,
-                "assistant_message": f"Error: {str(e)}",
-                "animation_ir": None,
-                "manim_code": None,
-                "description": None,
-                "validation": {"valid": False, "errors": [str(e)]},
-                "conversation_history": [
-                    {
-                        **msg.model_dump(exclude={"timestamp"}),
-                        "timestamp": msg.timestamp.isoformat()
-                    }
-                    for msg in request.conversation_history
-                ],
-                "credits_used": 0,
-                "credits_remaining": current_user.credits_remaining
-            }
+            content=_chat_error_payload(request, str(e), current_user.credits_remaining)
         )
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/chat/stream")
+async def chat_stream(
+    request: ConversationRequest,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Streaming variant of /chat (Server-Sent Events).
+    Emits a "scene" event for each scene as soon as it validates, then a
+    "done" event with the same payload /chat returns, or an "error" event.
+    """
+    _check_chat_allowed(current_user, db)
+    gemini_service.limiter.check()
+    job_queue_service.cancel_speculative(current_user.id)
+    
+    async def event_stream():
+        try:
+            async for kind, value in gemini_service.stream_conversational_response(
+                user_message=request.message,
+                conversation_history=request.conversation_history,
+                current_animation=request.current_animation,
+                use_cache=request.use_cache,
+                include_premium=current_user.tier != UserTier.FREE
+            ):
+                if kind == "scene":
+                    yield _sse("scene", value.model_dump())
+                    continue
+                
+                assistant_text, updated_animation = value
+                validate_animation_limits(updated_animation, current_user)
+                
+                # The request's session may already be closed once streaming starts
+                with get_db_context() as stream_db:
+                    db_user = stream_db.query(DBUser).filter(DBUser.id == current_user.id).first()
+                    _charge_chat_credit(db_user, stream_db)
+                    credits_remaining = db_user.credits_remaining
+                
+                job_queue_service.speculate(current_user.id, updated_animation)
+                yield _sse("done", _chat_success_payload(
+                    request, assistant_text, updated_animation, credits_remaining
+                ))
+        except HTTPException as e:
+            yield _sse("error", _chat_error_payload(request, str(e.detail), current_user.credits_remaining))
+        except ValueError as e:
+            yield _sse("error", _chat_error_payload(request, str(e), current_user.credits_remaining))
+        except GeminiOverloadedError as e:
+            yield _sse("error", {
+                **_chat_error_payload(request, str(e), current_user.credits_remaining),
+                "retry_after": e.retry_after
+            })
+        except Exception as e:
+            # The 500 /chat would give; the stream has already started, so send it as an event
+            print(f"Chat stream failed: {str(e)}")
+            yield _sse("error", _chat_error_payload(request, "Internal Server Error", current_user.credits_remaining))
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
 
 @app.post("/projects", response_model=SaveProjectResponse)
@@ -658,7 +841,12 @@ async def queue_render_job(
         raise HTTPException(status_code=403, detail="WebM export requires Pro plan")
     if request.quality == "4k" and limits.max_render_quality != "4k":
         raise HTTPException(status_code=403, detail="4K rendering requires Enterprise plan")
-    
+
+    # Fail before rendering, not after: the output could not be stored
+    try:
+        artifact_store_service.check_quota(db, current_user.id)
+    except ValueError as e:
+        raise HTTPException(status_code=403, detail=str(e))
 
     job = job_queue_service.create_render_job(
         user_id=current_user.id,
@@ -707,7 +895,8 @@ async def get_render_status(
 @app.get("/render/download/{job_id}")
 async def download_render(
     job_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """Download rendered video"""
     job = job_queue_service.get_job_status(job_id)
@@ -718,6 +907,26 @@ async def download_render(
     if job.status != "completed" or not job.video_url:
         raise HTTPException(status_code=400, detail="Video not ready")
     
+    if job.artifact_hash:
+        artifact = artifact_store_service.get_artifact(db, job.artifact_hash)
+        if not artifact:
+            raise HTTPException(status_code=404, detail="Video file not found")
+        
+        media_type = MEDIA_TYPES.get(artifact.extension, "application/octet-stream")
+        filename = f"animation_{job_id}{artifact.extension}"
+        local_path = artifact_store_service.local_path(artifact)
+        
+        if local_path:
+            if not os.path.exists(local_path):
+                raise HTTPException(status_code=404, detail="Video file not found")
+            return FileResponse(local_path, media_type=media_type, filename=filename)
+        
+        return StreamingResponse(
+            artifact_store_service.iter_content(artifact),
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+    
     if not os.path.exists(job.video_url):
         raise HTTPException(status_code=404, detail="Video file not found")
     
@@ -743,6 +952,35 @@ async def list_user_jobs(current_user: User = Depends(get_current_user)):
     ]
 
 
+@app.delete("/render/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_render_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a finished render job and free its storage"""
+    if not job_queue_service.delete_job(job_id, current_user.id):
+        raise HTTPException(status_code=404, detail="Job not found or still running")
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@app.get("/storage/usage")
+async def get_storage_usage(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get the user's artifact storage usage against their tier quota"""
+    used_bytes = artifact_store_service.get_usage_bytes(db, current_user.id)
+    limit_mb = TIER_LIMITS[current_user.tier].storage_limit_mb
+    
+    return {
+        "used_bytes": used_bytes,
+        "used_mb": round(used_bytes / (1024 * 1024), 2),
+        "limit_mb": limit_mb,
+        "percent_used": round(100 * used_bytes / (limit_mb * 1024 * 1024), 1)
+    }
+
+
 @app.post("/render/instant")
 async def instant_render(
     animation_ir: AnimationIR,
@@ -753,15 +991,19 @@ async def instant_render(
     try:
         validate_animation_limits(animation_ir, current_user)
         
-        video_files = manim_service.render_scenes(animation_ir)
-        
+        # Rendered and merged on the shared render pool, like queued jobs
         final_video_id = str(uuid.uuid4())
+        units = manim_service.plan_animation(animation_ir, media_key=f"user_{current_user.id}")
+        video_files = await manim_service.render_planned(final_video_id, units)
+        
         final_video_path = os.path.join(
             settings.TEMP_DIR,
             f"final_{final_video_id}.mp4"
         )
         
-        video_service.merge_videos(video_files, final_video_path)
+        await render_scheduler.run(
+            final_video_id, video_service.merge_videos, video_files, final_video_path, tier=URGENT
+        )
         
         return FileResponse(
             final_video_path,
@@ -774,6 +1016,72 @@ async def instant_render(
         raise HTTPException(status_code=500, detail=f"Render failed: {str(e)}")
 
 
+@app.post("/preview/svg")
+async def svg_preview(
+    animation_ir: AnimationIR,
+    loop: bool = True,
+    current_user: User = Depends(get_current_user)
+):
+    """Approximate, Manim-free preview: the animation as a self-playing SVG"""
+    validate_animation_limits(animation_ir, current_user)
+    
+    # LaTeX expressions not yet in the cache run through latex/dvisvgm
+    svg = await asyncio.to_thread(svg_preview_service.compile, animation_ir, loop)
+    return Response(
+        content=svg,
+        media_type="image/svg+xml",
+        headers={"Cache-Control": "private, max-age=300"}
+    )
+
+
+@app.post("/preview/quick")
+async def quick_preview(
+    animation_ir: AnimationIR,
+    format: str = "webp",
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Tiny, low-fps rendered preview: a looping animated WebP, or a sprite
+    sheet plus frame index (format=sprite). Cached by IR hash; only
+    previews that have to be rendered count against the daily limit.
+    """
+    validate_animation_limits(animation_ir, current_user)
+    
+    try:
+        _, path, index = await asyncio.to_thread(
+            quick_preview_service.get_preview, animation_ir, asyncio.get_running_loop(), format,
+            lambda: check_rate_limit(current_user, db)
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Preview failed: {str(e)}")
+    
+    return {
+        "format": format,
+        "preview_url": f"/preview/quick/{os.path.basename(path)}",
+        "frame_index": index
+    }
+
+
+@app.get("/preview/quick/{name}")
+async def download_quick_preview(
+    name: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Serve a cached quick preview (content-addressed, so it never changes)"""
+    path = quick_preview_service.find(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    
+    return FileResponse(
+        path,
+        media_type=MEDIA_TYPES[os.path.splitext(path)[1]],
+        headers={"Cache-Control": "private, max-age=31536000, immutable"}
+    )
 
 
 @app.post("/billing/create-checkout-session")
@@ -1141,7 +1449,9 @@ async def generate_animation_plan(
 ):
     """Legacy endpoint: Generate plan without conversation"""
     try:
-        animation_ir = gemini_service.generate_animation_json(request.prompt)
+        animation_ir = await gemini_service.generate_animation_json(
+            request.prompt, request.use_cache, include_premium=current_user.tier != UserTier.FREE
+        )
         manim_code = manim_service.generate_full_code(animation_ir)
         description = _generate_description(animation_ir)
         
@@ -1174,16 +1484,22 @@ async def generate_animation(
 ):
     """Legacy endpoint: Generate and render in one step"""
     try:
-        animation_ir = gemini_service.generate_animation_json(request.prompt)
-        video_files = manim_service.render_scenes(animation_ir)
+        animation_ir = await gemini_service.generate_animation_json(
+            request.prompt, request.use_cache, include_premium=current_user.tier != UserTier.FREE
+        )
         
         final_video_id = str(uuid.uuid4())
+        units = manim_service.plan_animation(animation_ir, media_key=f"user_{current_user.id}")
+        video_files = await manim_service.render_planned(final_video_id, units)
+        
         final_video_path = os.path.join(
             settings.TEMP_DIR,
             f"final_{final_video_id}.mp4"
         )
         
-        video_service.merge_videos(video_files, final_video_path)
+        await render_scheduler.run(
+            final_video_id, video_service.merge_videos, video_files, final_video_path, tier=URGENT
+        )
         
         return FileResponse(
             final_video_path,
@@ -48,6 +48,7 @@ class Scene(BaseModel):
     duration: float = Field(gt=0, le=10)
     background_color: str = "#1a1a2e"
     objects: List[AnimationObject] = Field(max_length=10)  
+    narration: Optional[str] = None
 
 
 class AudioConfig(BaseModel):
@@ -139,6 +140,7 @@ class AnimationTemplate(BaseModel):
     description: str
     category: Literal["educational", "marketing", "social", "presentation", "logo", "explainer"]
     animation_ir: AnimationIR
+    keywords: List[str] = []
     thumbnail_url: Optional[str] = None
     is_premium: bool = False
     use_count: int = 0
@@ -163,8 +165,10 @@ class RenderJob(BaseModel):
     output_format: Literal["mp4", "gif", "webm"] = "mp4"
     quality: Literal["low", "medium", "high", "4k"] = "medium"
     manim_code: Optional[str] = None
+    speculative: bool = False  # started after /chat, before the user asked for it
 
     video_url: Optional[str] = None
+    artifact_hash: Optional[str] = None
     error_message: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     started_at: Optional[datetime] = None
@@ -192,6 +196,7 @@ class ConversationRequest(BaseModel):
     conversation_history: List[ChatMessage] = Field(default=[])
     current_animation: Optional[AnimationIR] = None
     style_preference: Optional[str] = None  
+    use_cache: bool = True  # False asks for a fresh generation instead of a cached one
 
 
 class ConversationResponse(BaseModel):
@@ -327,6 +332,7 @@ class UsageStats(BaseModel):
 
 class GenerateRequest(BaseModel):
     prompt: str = Field(min_length=10, max_length=2000)
+    use_cache: bool = True
 
 
 class GenerateResponse(BaseModel):
@@ -0,0 +1,194 @@
+"""
+Long-lived Manim render processes.
+
+Each worker imports Manim once and plays scene programs in-process with
+IRScene (instead of a fresh `manim` CLI run per scene), keeping an LRU cache
+of constructed mobjects across scenes and jobs: a repeated Text, MathTex or
+shape construction is served as a deep copy of the cached mobject instead of
+re-running text layout, LaTeX/SVG parsing and path generation.
+
+This module is imported by the spawned workers, so it must not import the
+app's settings or services.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partialmethod
+from multiprocessing import get_context
+from typing import Any, Optional
+
+
+def class_defaults(cls: type) -> tuple:
+    """Keywords installed with Mobject.set_default on `cls` and its bases"""
+    found = []
+    for klass in cls.__mro__:
+        init = klass.__dict__.get("__init__")
+        while init is not None:
+            method = init if isinstance(init, partialmethod) else getattr(init, "__partialmethod__", None)
+            if method is None:
+                break
+            found.append((klass.__qualname__, tuple(sorted(method.keywords.items()))))
+            init = method.func
+    return tuple(found)
+
+
+class MobjectCache:
+    """
+    LRU cache of constructed mobjects keyed by class, constructor arguments
+    and the class's set_default keywords (how scene styles are applied).
+    Every hit returns a copy, so scenes never share or mutate a cached one.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, Any] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def build(self, cls: type, args: tuple, kwargs: dict) -> Any:
+        if self.max_entries <= 0:
+            return cls(*args, **kwargs)
+
+        key = repr((cls.__module__, cls.__qualname__, args, sorted(kwargs.items()), class_defaults(cls)))
+        cached = self.entries.get(key)
+        if cached is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return cached.copy()
+
+        self.misses += 1
+        mobject = cls(*args, **kwargs)
+        self.entries[key] = mobject
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return mobject.copy()
+
+
+_cache: Optional[MobjectCache] = None
+
+
+def init_worker(cache_entries: int) -> None:
+    global _cache
+    import manim  # noqa: F401  (paid once per worker, not per scene)
+    _cache = MobjectCache(cache_entries)
+
+
+def _reset_defaults() -> None:
+    """Undo set_default calls left behind by the previous scene"""
+    from manim import Mobject
+
+    classes = [Mobject]
+    while classes:
+        cls = classes.pop()
+        classes.extend(cls.__subclasses__())
+        original = cls.__dict__.get("_original__init__")
+        if original is not None and cls.__dict__.get("__init__") is not original:
+            cls.set_default()
+
+
+def render_program(program: dict, module_name: str, options: dict) -> tuple[str, int, int]:
+    """
+    Render a scene program with the given Manim config options; module_name
+    names its media folders. Returns (video path, cache hits, cache misses).
+    """
+    import manim
+    from .ir_scene import IRScene
+
+    _reset_defaults()
+    hits, misses = _cache.hits, _cache.misses
+    with manim.tempconfig({**options, "input_file": f"{module_name}.py"}):
+        scene = IRScene(program, _cache.build)
+        scene.render()
+        path = str(scene.renderer.file_writer.movie_file_path)
+    return path, _cache.hits - hits, _cache.misses - misses
+
+
+def warm(objects: list[dict], options: dict) -> int:
+    """
+    Construct IR objects (compiling their LaTeX and text into the tex/text
+    dirs in options) without rendering. Returns how many could be built.
+    """
+    import manim
+    from .ir_scene import build_mobject
+
+    _reset_defaults()
+    built = 0
+    with manim.tempconfig(options):
+        for obj in objects:
+            try:
+                build_mobject(obj, _cache.build)
+                built += 1
+            except Exception as e:
+                print(f"Could not precompile {obj.get('content')!r}: {e}")
+    return built
+
+
+class RenderWorkerPool:
+    """Parent side: a pool of spawned render workers, rebuilt if one dies"""
+
+    def __init__(self, processes: int, cache_entries: int, max_tasks_per_worker: int):
+        self.processes = processes
+        self.cache_entries = cache_entries
+        self.max_tasks_per_worker = max_tasks_per_worker or None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.restarts = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking the threaded API process is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processes,
+                    mp_context=get_context("spawn"),
+                    initializer=init_worker,
+                    initargs=(self.cache_entries,),
+                    max_tasks_per_child=self.max_tasks_per_worker,
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+                self.restarts += 1
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _call(self, fn, *args):
+        executor = self._pool()
+        try:
+            return executor.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._discard(executor)
+            raise RuntimeError("Manim rendering failed: render worker exited unexpectedly")
+        except Exception as e:
+            raise RuntimeError(f"Manim rendering failed: {e}")
+
+    def render(self, program: dict, module_name: str, options: dict) -> str:
+        """Render a scene program on a worker (blocking); returns the video path"""
+        path, hits, misses = self._call(render_program, program, module_name, options)
+
+        with self._lock:
+            self.rendered += 1
+            self.cache_hits += hits
+            self.cache_misses += misses
+        return path
+
+    def warm(self, objects: list[dict], options: dict) -> int:
+        """Precompile objects' LaTeX and text on a worker (blocking)"""
+        return self._call(warm, objects, options)
+
+    def get_metrics(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "processes": self.processes,
+            "rendered": self.rendered,
+            "mobject_cache_hits": self.cache_hits,
+            "mobject_cache_misses": self.cache_misses,
+            "mobject_cache_hit_rate": round(self.cache_hits / lookups, 3) if lookups else 0.0,
+            "restarts": self.restarts,
+        }
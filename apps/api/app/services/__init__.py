@@ -1,4 +1,4 @@
-from . import job_queue_service, manim_service, video_service, auth_service, template_service, gemini_service, marketplace_service, stripe_service
+from . import job_queue_service, manim_service, video_service, auth_service, template_service, gemini_service, marketplace_service, stripe_service, artifact_store_service
 
 __all__ = [
     "job_queue_service",
@@ -9,4 +9,5 @@ __all__ = [
     "gemini_service",
     "marketplace_service",
     "stripe_service",
+    "artifact_store_service",
 ]
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Iterator, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from ..models import TIER_LIMITS, UserTier
+from ..database.models import DBArtifact, DBArtifactRef, DBUser
+from ..config import get_settings
+
+settings = get_settings()
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> tuple[str, int]:
+    """Return (sha256 hex digest, size in bytes) of a file"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+class LocalArtifactBackend:
+    """Stores artifacts on the local filesystem, sharded by hash prefix"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put(self, key: str, src_path: str) -> None:
+        """Move a file into the store atomically"""
+        dst = self.path(key)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = f"{dst}.{uuid.uuid4().hex}.tmp"
+        shutil.move(src_path, tmp)
+        os.replace(tmp, dst)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self.path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        if self.exists(key):
+            os.remove(self.path(key))
+
+
+class S3ArtifactBackend:
+    """Stores artifacts in an S3-compatible bucket (AWS, MinIO, ...)"""
+
+    name = "s3"
+
+    def __init__(self):
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("boto3 is required for ARTIFACT_BACKEND=s3")
+
+        if not settings.S3_BUCKET:
+            raise RuntimeError("S3_BUCKET must be set for ARTIFACT_BACKEND=s3")
+
+        self.bucket = settings.S3_BUCKET
+        self.prefix = settings.S3_PREFIX
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        )
+
+    def path(self, key: str) -> Optional[str]:
+        return None
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except Exception:
+            return False
+
+    def put(self, key: str, src_path: str) -> None:
+        self.client.upload_file(src_path, self.bucket, self.prefix + key)
+        os.remove(src_path)
+
+    def open(self, key: str) -> BinaryIO:
+        response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        return response["Body"]
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+
+def get_artifact_backend():
+    """Build the backend selected by ARTIFACT_BACKEND"""
+    if settings.ARTIFACT_BACKEND == "local":
+        return LocalArtifactBackend(settings.ARTIFACT_DIR)
+    if settings.ARTIFACT_BACKEND == "s3":
+        return S3ArtifactBackend()
+    raise ValueError(f"Unknown artifact backend: {settings.ARTIFACT_BACKEND}")
+
+
+class ArtifactStoreService:
+    """
+    Content-addressed store for rendered outputs.
+
+    Identical files are stored once. Each user holds references to the
+    artifacts they produced and is charged once per distinct artifact
+    against their tier's storage_limit_mb.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or get_artifact_backend()
+
+    def _storage_key(self, content_hash: str, extension: str) -> str:
+        return f"{content_hash[:2]}/{content_hash}{extension}"
+
+    def get_usage_bytes(self, db: Session, user_id: str) -> int:
+        """Bytes of distinct artifacts referenced by a user"""
+        referenced = db.query(DBArtifactRef.artifact_hash).filter(
+            DBArtifactRef.user_id == user_id
+        )
+        total = db.query(func.coalesce(func.sum(DBArtifact.size_bytes), 0)).filter(
+            DBArtifact.content_hash.in_(referenced)
+        ).scalar()
+        return int(total or 0)
+
+    def get_limit_bytes(self, db: Session, user_id: str) -> int:
+        db_user = db.query(DBUser).filter(DBUser.id == user_id).first()
+        tier = UserTier(db_user.tier.value) if db_user and db_user.tier else UserTier.FREE
+        return TIER_LIMITS[tier].storage_limit_mb * 1024 * 1024
+
+    def check_quota(self, db: Session, user_id: str, incoming_bytes: int = 0) -> None:
+        """
+        Raise ValueError unless incoming_bytes more fit in the user's quota.
+        With incoming_bytes=0 (e.g. when a render is queued and its size is
+        not known yet), only checks that the user has space left.
+        """
+        used = self.get_usage_bytes(db, user_id)
+        limit = self.get_limit_bytes(db, user_id)
+        if used + incoming_bytes > limit or used >= limit:
+            raise ValueError(
+                f"Storage limit reached ({limit // (1024 * 1024)} MB). "
+                "Delete old renders or upgrade your plan."
+            )
+
+    def store(self, db: Session, user_id: str, src_path: str, ref_name: str) -> DBArtifact:
+        """
+        Add a file to the store and reference it from user_id under ref_name.
+        The source file is consumed (moved into the store or deleted).
+        Raises ValueError when the user's storage quota would be exceeded.
+        """
+        try:
+            content_hash, size = hash_file(src_path)
+            extension = os.path.splitext(src_path)[1]
+
+            artifact = db.query(DBArtifact).filter(DBArtifact.content_hash == content_hash).first()
+            already_referenced = db.query(DBArtifactRef).filter(
+                DBArtifactRef.user_id == user_id,
+                DBArtifactRef.artifact_hash == content_hash
+            ).first() is not None
+
+            if not already_referenced:
+                self.check_quota(db, user_id, size)
+
+            if artifact is None:
+                artifact = DBArtifact(
+                    content_hash=content_hash,
+                    backend=self.backend.name,
+                    storage_key=self._storage_key(content_hash, extension),
+                    extension=extension,
+                    size_bytes=size,
+                    ref_count=0
+                )
+                db.add(artifact)
+                try:
+                    db.flush()
+                except IntegrityError:
+                    # A concurrent store() of the same content inserted it first
+                    db.rollback()
+                    artifact = db.query(DBArtifact).filter(DBArtifact.content_hash == content_hash).first()
+                    if artifact is None:
+                        raise
+
+            if not self.backend.exists(artifact.storage_key):
+                self.backend.put(artifact.storage_key, src_path)
+
+            db.add(DBArtifactRef(
+                id=str(uuid.uuid4()),
+                user_id=user_id,
+                artifact_hash=content_hash,
+                ref_name=ref_name
+            ))
+            # Incremented in SQL so concurrent stores of the same content don't lose counts
+            db.query(DBArtifact).filter(DBArtifact.content_hash == content_hash).update(
+                {DBArtifact.ref_count: DBArtifact.ref_count + 1, DBArtifact.last_accessed_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+            db.commit()
+            db.refresh(artifact)
+            return artifact
+        finally:
+            if os.path.exists(src_path):
+                os.remove(src_path)
+
+    def release(self, db: Session, user_id: str, ref_name: str) -> int:
+        """
+        Drop a user's references under ref_name. Artifacts left without
+        references are deleted from the backend. Returns refs removed.
+        """
+        refs = db.query(DBArtifactRef).filter(
+            DBArtifactRef.user_id == user_id,
+            DBArtifactRef.ref_name == ref_name
+        ).all()
+
+        unreferenced = []
+        for ref in refs:
+            content_hash = ref.artifact_hash
+            db.delete(ref)
+            db.query(DBArtifact).filter(DBArtifact.content_hash == content_hash).update(
+                {DBArtifact.ref_count: DBArtifact.ref_count - 1}, synchronize_session=False
+            )
+            artifact = db.query(DBArtifact).filter(
+                DBArtifact.content_hash == content_hash,
+                DBArtifact.ref_count <= 0
+            ).first()
+            if artifact:
+                unreferenced.append(artifact.storage_key)
+                db.delete(artifact)
+
+        db.commit()
+        # Blobs go only once the rows are gone, so no row outlives its blob
+        for storage_key in unreferenced:
+            self.backend.delete(storage_key)
+        return len(refs)
+
+    def get_artifact(self, db: Session, content_hash: str) -> Optional[DBArtifact]:
+        return db.query(DBArtifact).filter(DBArtifact.content_hash == content_hash).first()
+
+    def local_path(self, artifact: DBArtifact) -> Optional[str]:
+        """Filesystem path for an artifact, or None if it is not stored locally"""
+        return self.backend.path(artifact.storage_key)
+
+    def iter_content(self, artifact: DBArtifact) -> Iterator[bytes]:
+        """Stream an artifact's bytes from the backend"""
+        body = self.backend.open(artifact.storage_key)
+        try:
+            for chunk in iter(lambda: body.read(HASH_CHUNK_SIZE), b""):
+                yield chunk
+        finally:
+            body.close()
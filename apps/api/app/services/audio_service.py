@@ -1,35 +1,311 @@
+import hashlib
 import os
+import re
+import subprocess
+import threading
+import unicodedata
 import uuid
-from gtts import gTTS
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Optional
+from .temp_gc_service import evict_lru, in_use
 from ..config import get_settings
 
 settings = get_settings()
 
+
+class TTSCache:
+    """
+    Persistent, size-bounded cache of synthesized narration.
+    Entries are keyed by backend plus normalized (text, lang) and stored as
+    AAC so the final mux can stream-copy the audio track.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._locks: dict[str, list] = {}  # key -> [lock, threads using it]
+        self._locks_guard = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str, lang: str, backend: str = "gtts") -> str:
+        payload = f"{backend}\0{lang.strip().lower()}\0{self.normalize_text(text)}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.m4a")
+
+    @contextmanager
+    def lock_for(self, key: str):
+        """Per-key lock so concurrent misses synthesize once; dropped when no thread needs it"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)  # mark as recently used for LRU eviction
+        return path
+
+    def put(self, key: str, src_path: str) -> str:
+        """
+        Move an AAC file into the cache and enforce the size budget. The
+        new entry and ones used recently (whose paths callers may still be
+        muxing) are never evicted.
+        """
+        path = self.path_for(key)
+        os.replace(src_path, path)
+        with in_use(path):
+            evict_lru(self.cache_dir, self.max_bytes, min_age_seconds=settings.TEMP_GC_MIN_AGE_SECONDS)
+        return path
+
+    def contains(self, path: str) -> bool:
+        return os.path.abspath(path).startswith(os.path.abspath(self.cache_dir) + os.sep)
+
+
+class GTTSBackend:
+    """Google Translate TTS (needs outbound network)"""
+
+    name = "gtts"
+    extension = ".mp3"
+
+    def synthesize(self, text: str, lang: str, output_path: str) -> str:
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=lang, slow=False)
+        tts.save(output_path)
+        return output_path
+
+
+class EspeakBackend:
+    """Offline TTS through the espeak-ng command line tool"""
+
+    name = "espeak"
+    extension = ".wav"
+
+    def synthesize(self, text: str, lang: str, output_path: str) -> str:
+        cmd = [
+            settings.ESPEAK_BINARY,
+            '-v', lang,
+            '-s', str(settings.ESPEAK_WORDS_PER_MINUTE),
+            '-w', output_path,
+            text
+        ]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            return output_path
+        except FileNotFoundError:
+            raise RuntimeError(f"{settings.ESPEAK_BINARY} is not installed")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"espeak-ng failed: {e.stderr.decode()}")
+
+
+class PiperBackend:
+    """Offline neural TTS through the piper command line tool"""
+
+    name = "piper"
+    extension = ".wav"
+
+    def model_for(self, lang: str) -> str:
+        """
+        Voice model for a language ("pt-BR" falls back to "pt"). Each piper
+        model speaks one language, so a language without one is an error.
+        """
+        models = {code.lower(): path for code, path in settings.PIPER_MODELS.items()}
+        if settings.PIPER_MODEL:
+            models.setdefault(settings.PIPER_MODEL_LANG.lower(), settings.PIPER_MODEL)
+        if not models:
+            raise RuntimeError("PIPER_MODEL must be set for TTS_BACKEND=piper")
+
+        lang = lang.strip().lower().replace("_", "-")
+        for code in (lang, lang.split("-")[0]):
+            if code in models:
+                return models[code]
+        raise ValueError(f"No piper voice model for language '{lang}' (have: {', '.join(sorted(models))})")
+
+    def synthesize(self, text: str, lang: str, output_path: str) -> str:
+        cmd = [
+            settings.PIPER_BINARY,
+            '--model', self.model_for(lang),
+            '--output_file', output_path
+        ]
+        try:
+            subprocess.run(cmd, input=text.encode("utf-8"), check=True, capture_output=True)
+            return output_path
+        except FileNotFoundError:
+            raise RuntimeError(f"{settings.PIPER_BINARY} is not installed")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"piper failed: {e.stderr.decode()}")
+
+
+TTS_BACKENDS = {
+    "gtts": GTTSBackend,
+    "espeak": EspeakBackend,
+    "piper": PiperBackend,
+}
+
+
+def get_tts_backend(name: Optional[str] = None):
+    """Build the TTS backend selected by TTS_BACKEND"""
+    name = name or settings.TTS_BACKEND
+    if name not in TTS_BACKENDS:
+        raise ValueError(f"Unknown TTS backend: {name}")
+    return TTS_BACKENDS[name]()
+
+
 class AudioService:
     """Service to handle audio generation (TTS) and processing."""
 
-    def __init__(self):
+    def __init__(self, backend=None):
         os.makedirs(settings.TEMP_DIR, exist_ok=True)
+        self.backend = backend or get_tts_backend()
+        self.cache = TTSCache(
+            settings.TTS_CACHE_DIR,
+            settings.TTS_CACHE_MAX_MB * 1024 * 1024
+        )
 
     def generate_voiceover(self, text: str, lang: str = "en") -> str:
         """
-        Generate MP3 voiceover from text using gTTS.
-        Returns the path to the generated file.
+        Generate an AAC voiceover from text with the configured TTS backend.
+        Repeated (text, lang) pairs are served from the TTS cache.
+        Returns the path to the audio file.
         """
         if not text or not text.strip():
             raise ValueError("Text content is empty")
 
-        filename = f"voiceover_{uuid.uuid4()}.mp3"
-        output_path = os.path.join(settings.TEMP_DIR, filename)
+        key = self.cache.key(text, lang, self.backend.name)
+        cached = self.cache.get(key)
+        if cached:
+            return cached
+
+        with self.cache.lock_for(key):
+            cached = self.cache.get(key)
+            if cached:
+                return cached
+
+            raw_path = os.path.join(
+                settings.TEMP_DIR,
+                f"voiceover_{uuid.uuid4()}{self.backend.extension}"
+            )
+            aac_path = os.path.join(settings.TEMP_DIR, f"voiceover_{uuid.uuid4()}.m4a")
+
+            try:
+                self.backend.synthesize(self.cache.normalize_text(text), lang, raw_path)
+                self._transcode_to_aac(raw_path, aac_path)
+                return self.cache.put(key, aac_path)
+            except Exception as e:
+                raise RuntimeError(f"TTS generation failed: {str(e)}")
+            finally:
+                for path in (raw_path, aac_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def generate_voiceovers(self, items: list[tuple[str, str]]) -> list[str]:
+        """
+        Batch synthesis of (text, lang) pairs, run concurrently.
+        Returns audio paths in input order.
+        """
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(settings.TTS_MAX_WORKERS, len(items))) as pool:
+            return list(pool.map(lambda item: self.generate_voiceover(*item), items))
+
+    def split_narration(self, text: str, max_chars: Optional[int] = None) -> list[str]:
+        """Split narration into sentence-aligned chunks of at most max_chars"""
+        max_chars = max_chars or settings.TTS_CHUNK_CHARS
+        sentences = re.split(r"(?<=[.!?;])\s+", TTSCache.normalize_text(text))
+        
+        chunks: list[str] = []
+        current = ""
+        for sentence in sentences:
+            if current and len(current) + 1 + len(sentence) > max_chars:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}".strip()
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def build_aligned_track(
+        self,
+        segments: list[tuple[Optional[str], Optional[float]]],
+        output_path: str
+    ) -> str:
+        """
+        Concatenate audio segments into one AAC track.
+        Each segment is (audio_path or None for silence, duration or None).
+        With a duration the segment is padded/trimmed to exactly that length,
+        which keeps per-scene narration aligned to scene boundaries.
+        """
+        inputs: list[str] = []
+        filters: list[str] = []
+        for i, (path, duration) in enumerate(segments):
+            if path:
+                inputs += ['-i', path]
+            else:
+                inputs += ['-f', 'lavfi', '-t', f'{duration or 0}', '-i', 'anullsrc=r=44100:cl=mono']
+            
+            chain = f"[{i}:a]aresample=44100,aformat=sample_fmts=fltp:channel_layouts=mono"
+            if duration is not None:
+                chain += f",apad,atrim=0:{duration},asetpts=PTS-STARTPTS"
+            filters.append(f"{chain}[a{i}]")
+        
+        labels = "".join(f"[a{i}]" for i in range(len(segments)))
+        filters.append(f"{labels}concat=n={len(segments)}:v=0:a=1[out]")
+        
+        cmd = [
+            'ffmpeg',
+            *inputs,
+            '-filter_complex', ";".join(filters),
+            '-map', '[out]',
+            '-c:a', 'aac',
+            '-b:a', '128k',
+            output_path,
+            '-y'
+        ]
+        
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg narration alignment failed: {e.stderr.decode()}")
+
+    def _transcode_to_aac(self, src_path: str, output_path: str) -> str:
+        """Transcode audio to AAC in an MP4 container"""
+        cmd = [
+            'ffmpeg',
+            '-i', src_path,
+            '-vn',
+            '-c:a', 'aac',
+            '-b:a', '128k',
+            output_path,
+            '-y'
+        ]
 
         try:
-            tts = gTTS(text=text, lang=lang, slow=False)
-            tts.save(output_path)
+            subprocess.run(cmd, check=True, capture_output=True)
             return output_path
-        except Exception as e:
-            raise RuntimeError(f"TTS generation failed: {str(e)}")
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg AAC transcode failed: {e.stderr.decode()}")
 
     def cleanup_audio(self, filepath: str):
-        """Delete audio file."""
+        """Delete audio file (cached narration is kept)."""
+        if self.cache.contains(filepath):
+            return
         if os.path.exists(filepath):
-            os.remove(filepath)
\ No newline at end of file
+            os.remove(filepath)
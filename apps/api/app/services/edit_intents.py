@@ -0,0 +1,351 @@
+import re
+from typing import Optional
+from ..models import AnimationIR
+from .ir_repair import MIN_DURATION, MAX_SCENE_SECONDS, coerce_object, coerce_position
+from .ir_timeline import schedule_scene, scene_length
+from .styles import STYLES
+
+COLOR_NAMES = {
+    "red": "#ff0000",
+    "green": "#00c853",
+    "blue": "#2962ff",
+    "yellow": "#ffeb3b",
+    "orange": "#ff9800",
+    "purple": "#9c27b0",
+    "violet": "#8f00ff",
+    "pink": "#ff4081",
+    "white": "#ffffff",
+    "black": "#000000",
+    "gray": "#9e9e9e",
+    "grey": "#9e9e9e",
+    "cyan": "#00e5ff",
+    "teal": "#009688",
+    "magenta": "#ff00ff",
+    "gold": "#ffd700",
+    "brown": "#795548",
+    "navy": "#1a237e",
+}
+
+SHAPES = {"circle", "square", "rectangle", "triangle", "polygon", "arrow"}
+TEXT_WORDS = {"text", "title", "heading", "label", "caption", "word", "words"}
+ALL_WORDS = {"everything", "all", "all objects", "all elements", "every object"}
+
+# Absolute placements for "move X to the left" etc.
+PLACES = {
+    "left": (-4.0, None),
+    "right": (4.0, None),
+    "top": (None, 2.5),
+    "bottom": (None, -2.5),
+    "center": (0.0, 0.0),
+    "centre": (0.0, 0.0),
+    "middle": (0.0, 0.0),
+}
+# Relative nudges for "move X left" (units per step)
+DIRECTIONS = {"left": (-1, 0), "right": (1, 0), "up": (0, 1), "down": (0, -1)}
+DEFAULT_STEP = 2.0
+
+_COLOR = r"(?P<color>#[0-9a-f]{6}|#[0-9a-f]{3}|" + "|".join(COLOR_NAMES) + r")"
+_NUMBER = r"(?P<number>\d+(?:\.\d+)?)"
+_STYLE = r"(?P<style>" + "|".join(STYLES) + r")"
+
+RECOLOR = [
+    re.compile(r"(?:make|turn|color|colour|paint|change|set)\s+(?P<target>.+?)\s+(?:to\s+|into\s+)?" + _COLOR),
+    re.compile(r"(?:change|set)\s+the\s+colou?r\s+of\s+(?P<target>.+?)\s+to\s+" + _COLOR),
+]
+BACKGROUND = [
+    re.compile(r"(?:make|change|set|turn)\s+(?:the\s+)?background(?:\s+colou?r)?\s+(?:to\s+|into\s+)?" + _COLOR),
+    re.compile(_COLOR + r"\s+background"),
+]
+STYLE = [
+    re.compile(r"(?:use|switch\s+to|change\s+to|apply|make\s+it)\s+(?:the\s+|a\s+)?" + _STYLE + r"(?:\s+(?:style|theme|preset|look))?"),
+    re.compile(r"(?:change|set|switch)\s+(?:the\s+)?(?:style|theme)\s+to\s+" + _STYLE),
+]
+MOVE = [
+    re.compile(r"move\s+(?P<target>.+?)\s+to\s+(?:the\s+)?(?P<place>" + "|".join(PLACES) + r")"),
+    re.compile(r"move\s+(?P<target>.+?)\s+(?:to\s+)?\(?\s*(?P<x>-?\d+(?:\.\d+)?)\s*,\s*(?P<y>-?\d+(?:\.\d+)?)\s*\)?"),
+    re.compile(
+        r"move\s+(?P<target>.+?)\s+(?P<direction>left|right|up|down)"
+        r"(?:\s+by\s+" + _NUMBER + r"(?:\s+units?)?)?"
+    ),
+]
+# Numeric forms come first so "make X 2x bigger" does not read "X 2x" as the target
+RESIZE = [
+    re.compile(r"make\s+(?P<target>.+?)\s+" + _NUMBER + r"\s*(?:x|times)\s+(?P<dir>bigger|larger|smaller)"),
+    re.compile(r"make\s+(?P<target>.+?)\s+(?P<amount>a\s+(?:bit|little)\s+)?(?P<dir>bigger|larger|smaller)"),
+    re.compile(r"(?P<dir>double|halve)\s+(?:the\s+size\s+of\s+)?(?P<target>.+?)(?:\s+size)?"),
+    re.compile(r"(?:scale|resize)\s+(?P<target>.+?)\s+(?:by|to)\s+" + _NUMBER + r"\s*(?:x|times)?"),
+]
+SPEED = [
+    re.compile(r"make\s+(?P<target>.+?)\s+" + _NUMBER + r"\s*(?:x|times)\s+(?P<dir>faster|slower|quicker)"),
+    re.compile(r"make\s+(?P<target>.+?)\s+(?P<amount>a\s+(?:bit|little)\s+)?(?P<dir>faster|slower|quicker)"),
+    re.compile(r"(?P<dir>speed\s+up|slow\s+down)(?:\s+(?P<target>.+?))?"),
+]
+
+
+def _clean(message: str) -> str:
+    text = " ".join(message.lower().split())
+    text = re.sub(r"^(?:please|can you|could you|now)\s+", "", text)
+    text = re.sub(r"\s+please$", "", text)
+    return text.rstrip(" .!?")
+
+
+def _strip_articles(target: str) -> str:
+    return re.sub(r"^(?:the|my|that|this|a)\s+", "", target.strip()).strip()
+
+
+def _all_objects(animation: AnimationIR) -> list[tuple[str, object]]:
+    return [(scene.scene_id, obj) for scene in animation.scenes for obj in scene.objects]
+
+
+def resolve_targets(target: Optional[str], animation: AnimationIR) -> Optional[list[tuple[str, object]]]:
+    """
+    Resolve a target phrase to (scene_id, object) pairs.
+    Returns None when the phrase is unknown or ambiguous.
+    """
+    objects = _all_objects(animation)
+    target = _strip_articles(target or "it")
+
+    if target in ALL_WORDS or target in ("animation", "animations", "video", "whole animation", "scene"):
+        return objects or None
+    if target in ("it", "them"):
+        ids = {obj.id for _, obj in objects}
+        return objects if len(ids) == 1 else None
+
+    quoted = re.fullmatch(r"(?:text\s+)?[\"'](.+)[\"']", target)
+    if quoted:
+        content = quoted.group(1)
+        matches = [(sid, obj) for sid, obj in objects if (obj.content or "").lower() == content]
+        return matches or None
+
+    by_id = [(sid, obj) for sid, obj in objects if obj.id.lower() in (target, target.replace(" ", "_"))]
+    if by_id:
+        return by_id
+
+    by_content = [(sid, obj) for sid, obj in objects if (obj.content or "").lower() == target]
+    if by_content:
+        return by_content
+
+    words = target.split()
+    plural = words[0] in ("all", "every", "both") or (target.endswith("s") and target[:-1] in SHAPES | TEXT_WORDS)
+    noun = words[-1].rstrip("s") if plural and words[-1] != "text" else words[-1]
+    color_word = words[-2] if len(words) >= 2 and words[-2] in COLOR_NAMES else None
+
+    if noun in SHAPES or noun == "shape":
+        matches = [(sid, obj) for sid, obj in objects if obj.type == "shape" and (noun == "shape" or obj.shape == noun)]
+    elif noun in TEXT_WORDS:
+        matches = [(sid, obj) for sid, obj in objects if obj.type in ("text", "latex")]
+        if noun == "title":
+            titled = [(sid, obj) for sid, obj in matches if "title" in obj.id.lower()]
+            matches = titled or matches
+    elif noun in ("formula", "equation", "math"):
+        matches = [(sid, obj) for sid, obj in objects if obj.type == "latex"]
+    else:
+        return None
+
+    if color_word:
+        matches = [(sid, obj) for sid, obj in matches if obj.color.lower() == COLOR_NAMES[color_word]]
+
+    ids = {obj.id for _, obj in matches}
+    if not matches or (len(ids) > 1 and not plural):
+        return None
+    return matches
+
+
+def _color(value: str) -> str:
+    if value in COLOR_NAMES:
+        return COLOR_NAMES[value]
+    if len(value) == 4:
+        return "#" + "".join(ch * 2 for ch in value[1:])
+    return value
+
+
+def _update(scene_id: str, obj, values: dict) -> dict:
+    return {"op": "update_object", "id": obj.id, "scene_id": scene_id, "set": values}
+
+
+def _describe(targets: list[tuple[str, object]]) -> str:
+    ids = sorted({obj.id for _, obj in targets})
+    return ", ".join(ids) if len(ids) <= 3 else f"{len(ids)} objects"
+
+
+def _first_match(patterns: list, text: str):
+    for pattern in patterns:
+        match = pattern.fullmatch(text)
+        if match:
+            return match
+    return None
+
+
+def _recolor(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(RECOLOR, text)
+    if not match or "background" in match.group("target"):
+        return None
+    targets = resolve_targets(match.group("target"), animation)
+    if not targets:
+        return None
+    color = _color(match.group("color"))
+    return [_update(sid, obj, {"color": color}) for sid, obj in targets], f"recolored {_describe(targets)} to {color}"
+
+
+def _background(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(BACKGROUND, text)
+    if not match:
+        return None
+    color = _color(match.group("color"))
+    ops = [
+        {"op": "update_scene", "scene_id": scene.scene_id, "set": {"background_color": color}}
+        for scene in animation.scenes
+    ]
+    # Style presets with their own background override scene colors
+    if STYLES.get(animation.style or "default", {}).get("bg"):
+        ops.append({"op": "update_animation", "set": {"style": "default"}})
+    return ops, f"changed the background to {color}"
+
+
+def _style(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(STYLE, text)
+    if not match:
+        return None
+    style = match.group("style")
+    return [{"op": "update_animation", "set": {"style": style}}], f"switched to the {style} style"
+
+
+def _move(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(MOVE, text)
+    if not match:
+        return None
+    targets = resolve_targets(match.group("target"), animation)
+    if not targets:
+        return None
+
+    groups = match.groupdict()
+    ops = []
+    for sid, obj in targets:
+        x, y, z = obj.position
+        if groups.get("place"):
+            new_x, new_y = PLACES[groups["place"]]
+            x, y = (x if new_x is None else new_x), (y if new_y is None else new_y)
+        elif groups.get("x") is not None:
+            x, y = float(groups["x"]), float(groups["y"])
+        else:
+            step = float(groups["number"]) if groups.get("number") else DEFAULT_STEP
+            dx, dy = DIRECTIONS[groups["direction"]]
+            x, y = x + dx * step, y + dy * step
+        ops.append(_update(sid, obj, {"position": coerce_position([x, y, z])}))
+    return ops, f"moved {_describe(targets)}"
+
+
+def _resize_values(obj, factor: float) -> dict:
+    values = {}
+    if obj.type in ("text", "latex") and obj.font_size:
+        values["font_size"] = round(obj.font_size * factor)
+    for field in ("radius", "side_length", "width", "height"):
+        if getattr(obj, field) is not None:
+            values[field] = round(getattr(obj, field) * factor, 3)
+    return coerce_object(values)
+
+
+def _resize(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(RESIZE, text)
+    if not match:
+        return None
+    targets = resolve_targets(match.group("target"), animation)
+    if not targets:
+        return None
+
+    groups = match.groupdict()
+    direction = groups.get("dir")
+    if groups.get("number"):
+        factor = float(groups["number"])
+        if direction == "smaller":
+            factor = 1 / factor
+    elif direction in ("double", "halve"):
+        factor = 2.0 if direction == "double" else 0.5
+    else:
+        factor = 1.25 if groups.get("amount") else 1.5
+        if direction == "smaller":
+            factor = 1 / factor
+    if factor <= 0:
+        return None
+
+    ops = [_update(sid, obj, _resize_values(obj, factor)) for sid, obj in targets]
+    ops = [op for op in ops if op["set"]]
+    if not ops:
+        return None
+    return ops, f"resized {_describe(targets)} by {factor:g}x"
+
+
+def _speed(text: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    match = _first_match(SPEED, text)
+    if not match:
+        return None
+
+    groups = match.groupdict()
+    direction = groups["dir"]
+    faster = direction in ("faster", "quicker", "speed up")
+    factor = float(groups["number"]) if groups.get("number") else (1.25 if groups.get("amount") else 1.5)
+    if factor <= 0:
+        return None
+    scale = 1 / factor if faster else factor
+
+    target = groups.get("target")
+    whole = target is None or _strip_articles(target) in ("it", "animation", "animations", "video", "everything", "whole animation")
+    targets = _all_objects(animation) if whole else resolve_targets(target, animation)
+    if not targets:
+        return None
+
+    if not faster:
+        # Scenes and plays stretch by the same factor, as far as the longest still fits in a scene
+        if whole:
+            longest = max(scene_length(scene, schedule_scene(scene)) for scene in animation.scenes)
+        else:
+            longest = max((anim.start_time + anim.duration for _, obj in targets for anim in obj.animations), default=0.0)
+        if longest > 0:
+            scale = factor = min(factor, MAX_SCENE_SECONDS / longest)
+        if scale <= 1:
+            return None
+
+    ops = []
+    for sid, obj in targets:
+        animations = [
+            {
+                **anim.model_dump(),
+                "start_time": round(anim.start_time * scale, 3),
+                "duration": max(round(anim.duration * scale, 3), MIN_DURATION),
+            }
+            for anim in obj.animations
+        ]
+        if animations:
+            ops.append(_update(sid, obj, {"animations": animations}))
+    if whole:
+        for scene in animation.scenes:
+            duration = min(max(round(scene.duration * scale, 3), MIN_DURATION), MAX_SCENE_SECONDS)
+            ops.append({"op": "update_scene", "scene_id": scene.scene_id, "set": {"duration": duration}})
+    if not ops:
+        return None
+
+    what = "the animation" if whole else _describe(targets)
+    return ops, f"made {what} {factor:g}x {'faster' if faster else 'slower'}"
+
+
+# Order matters: background/style phrases would otherwise parse as recolors
+INTENTS = [_background, _style, _speed, _resize, _move, _recolor]
+
+
+def match_edit_intent(message: str, animation: AnimationIR) -> Optional[tuple[list[dict], str]]:
+    """
+    Recognize a simple, unambiguous edit (recolor, move, resize, speed,
+    background, style preset) and translate it into patch operations.
+    Returns (ops, summary) or None when the message needs the model.
+    """
+    text = _clean(message)
+    if not text or len(text) > 120 or re.search(r"\b(?:and|then|also|but|except)\b|[,;]", text):
+        # Compound requests go to the model; coordinates are the one comma we allow
+        if not re.fullmatch(r"move .+\(?-?\d+(?:\.\d+)?\s*,\s*-?\d+(?:\.\d+)?\)?", text):
+            return None
+
+    for intent in INTENTS:
+        result = intent(text, animation)
+        if result:
+            return result
+    return None
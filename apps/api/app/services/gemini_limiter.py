@@ -0,0 +1,202 @@
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class GeminiOverloadedError(RuntimeError):
+    """Raised when a Gemini call cannot be admitted in time; carries a Retry-After hint"""
+
+    status_code = 429
+
+    def __init__(self, retry_after: float, message: str = "Animation service is busy, please retry shortly"):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; capacity is one minute's worth"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (requests larger than capacity wait for a full bucket)"""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(missing / self.rate, 0.0) if self.rate else 0.0
+
+    def consume(self, amount: float, now: float) -> None:
+        self._refill(now)
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        """Return (or, if negative, take) tokens after the real usage is known"""
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class GeminiLimiter:
+    """
+    Admission control shared by every Gemini call in this worker.
+    Token buckets enforce requests and tokens per minute, a semaphore caps
+    in-flight calls, and callers wait in a bounded FIFO queue. A caller that
+    cannot be admitted before its deadline, or finds the queue full, gets a
+    GeminiOverloadedError with a Retry-After hint instead of waiting.
+    Budgets are per worker process: divide provider quotas by worker count.
+    """
+
+    def __init__(
+        self,
+        rpm: int,
+        tpm: int,
+        max_concurrency: int,
+        queue_size: int,
+        queue_timeout: float,
+        backoff_seconds: float,
+    ):
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.max_concurrency = max_concurrency
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.backoff_seconds = backoff_seconds
+        self.blocked_until = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self._turn = asyncio.Lock()  # FIFO: one waiter at a time draws from the buckets
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+
+    def _wait_time(self, tokens: int, now: float) -> float:
+        waits = [self.blocked_until - now]
+        if self.requests:
+            waits.append(self.requests.wait_time(1, now))
+        if self.tokens:
+            waits.append(self.tokens.wait_time(tokens, now))
+        return max(max(waits), 0.0)
+
+    def _reject(self, retry_after: float) -> GeminiOverloadedError:
+        self.rejected += 1
+        return GeminiOverloadedError(retry_after)
+
+    def check(self, tokens: int = 0) -> None:
+        """Fail fast (before starting a response) if a new call would be rejected"""
+        if self.waiting >= self.queue_size:
+            raise self._reject(self._wait_time(tokens, time.monotonic()) or self.queue_timeout)
+
+    def available_now(self, tokens: int) -> bool:
+        """True if a call would be admitted without queueing (used to decide on hedging)"""
+        return (
+            self.waiting == 0
+            and self.in_flight < self.max_concurrency
+            and self._wait_time(tokens, time.monotonic()) <= 0
+        )
+
+    async def acquire(self, tokens: int) -> None:
+        """Wait for quota and a concurrency slot, or raise GeminiOverloadedError"""
+        self.check(tokens)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.queue_timeout
+        self.waiting += 1
+        try:
+            async with self._turn:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, now)
+                    if wait <= 0:
+                        break
+                    if loop.time() + wait > deadline:
+                        # Cannot be admitted in time; tell the client when to come back
+                        raise self._reject(wait)
+                    await asyncio.sleep(wait)
+
+                if self.requests:
+                    self.requests.consume(1, now)
+                if self.tokens:
+                    self.tokens.consume(tokens, now)
+
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), timeout=max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.refund(tokens, 0, request=True)
+                raise self._reject(self.queue_timeout)
+            except asyncio.CancelledError:
+                self.refund(tokens, 0, request=True)  # the caller went away before its call
+                raise
+        finally:
+            self.waiting -= 1
+
+        self.admitted += 1
+        self.in_flight += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self.semaphore.release()
+
+    def refund(self, reserved: int, used: int, request: bool = False) -> None:
+        """Settle a token reservation against the usage Gemini reported"""
+        if self.tokens:
+            self.tokens.refund(reserved - used)
+        if request and self.requests:
+            self.requests.refund(1)
+
+    def throttle(self, retry_after: Optional[float] = None) -> float:
+        """The provider returned 429: hold all admissions for a while"""
+        self.throttled += 1
+        delay = retry_after or self.backoff_seconds
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+    @asynccontextmanager
+    async def slot(self, tokens: int):
+        await self.acquire(tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_metrics(self) -> dict:
+        now = time.monotonic()
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.wait_time(0, now)  # refill before reporting
+        return {
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "queue_size": self.queue_size,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "provider_throttled": self.throttled,
+            "blocked_for_seconds": round(max(self.blocked_until - now, 0.0), 2),
+            "requests_available": round(self.requests.tokens, 1) if self.requests else None,
+            "tokens_available": round(self.tokens.tokens) if self.tokens else None,
+        }
+
+
+def estimate_tokens(prompt: str, config: dict) -> int:
+    """Reserve prompt tokens (about 4 characters each) plus the output budget"""
+    return len(prompt) // 4 + int(config.get("max_output_tokens", 0))
+
+
+limiter = GeminiLimiter(
+    rpm=settings.GEMINI_RPM,
+    tpm=settings.GEMINI_TPM,
+    max_concurrency=settings.GEMINI_MAX_CONCURRENCY,
+    queue_size=settings.GEMINI_QUEUE_SIZE,
+    queue_timeout=settings.GEMINI_QUEUE_TIMEOUT_SECONDS,
+    backoff_seconds=settings.GEMINI_BACKOFF_SECONDS,
+)
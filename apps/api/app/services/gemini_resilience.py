@@ -0,0 +1,153 @@
+import time
+from collections import deque
+from typing import Optional
+from .gemini_limiter import GeminiOverloadedError
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class GeminiUnavailableError(GeminiOverloadedError):
+    """Raised while the circuit breaker is open"""
+
+    status_code = 503
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after, "Animation service is temporarily unavailable, please retry shortly")
+
+
+class GeminiTimeoutError(ValueError):
+    """
+    Raised when a Gemini call runs past GEMINI_TIMEOUT_SECONDS (a ValueError,
+    so endpoints report it as before, but callers can tell it from bad output)
+    """
+
+
+class LatencyTracker:
+    """Rolling per-attempt latency samples, used for hedge delays and metrics"""
+
+    def __init__(self, window: int = 500):
+        self.samples: dict[str, deque] = {}
+        self.outcomes: dict[str, dict[str, int]] = {}
+        self.window = window
+
+    def record(self, kind: str, seconds: float, outcome: str) -> None:
+        samples = self.samples.setdefault(kind, deque(maxlen=self.window))
+        if outcome != "cancelled":  # a cancelled hedge loser says nothing about latency
+            samples.append(seconds)
+        counts = self.outcomes.setdefault(kind, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def percentile(self, q: float, kind: str = "primary") -> Optional[float]:
+        samples = sorted(self.samples.get(kind, ()))
+        if not samples:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def count(self, kind: str = "primary") -> int:
+        return len(self.samples.get(kind, ()))
+
+    def get_metrics(self) -> dict:
+        return {
+            kind: {
+                "samples": len(samples),
+                "p50": self.percentile(0.5, kind),
+                "p90": self.percentile(0.9, kind),
+                "p99": self.percentile(0.99, kind),
+                "outcomes": self.outcomes.get(kind, {}),
+            }
+            for kind, samples in self.samples.items()
+        }
+
+
+class CircuitBreaker:
+    """
+    Opens when the error rate over the last `window` calls reaches
+    `error_rate` (with at least `min_calls` samples). While open, calls fail
+    fast for `cooldown` seconds; then a single probe call is let through and
+    its result closes or re-opens the circuit.
+    """
+
+    def __init__(self, window: int, min_calls: int, error_rate: float, cooldown: float, enabled: bool = True):
+        self.results: deque = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.probing = False
+        self.times_opened = 0
+
+    def _open(self) -> None:
+        if self.state != "open":
+            self.times_opened += 1
+            print(f"Gemini circuit breaker opened (error rate over last {len(self.results)} calls)")
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.probing = False
+
+    def retry_after(self) -> float:
+        return max(self.opened_at + self.cooldown - time.monotonic(), 1.0)
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected (does not start a probe)"""
+        if not self.enabled or self.state == "closed":
+            return False
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            return False
+        return self.state == "open" or self.probing
+
+    def before_call(self) -> None:
+        """Raise GeminiUnavailableError unless a call may go out now"""
+        if not self.enabled or self.state == "closed":
+            return
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.cooldown:
+                raise GeminiUnavailableError(self.retry_after())
+            self.state = "half_open"
+        if self.probing:
+            raise GeminiUnavailableError(1.0)
+        self.probing = True
+
+    def release(self) -> None:
+        """A call ended without a verdict (cancelled, throttled, client error)"""
+        if self.state == "half_open":
+            self.probing = False
+
+    def record(self, success: bool) -> None:
+        if self.state == "half_open":
+            self.probing = False
+            if success:
+                self.state = "closed"
+                self.results.clear()
+            else:
+                self._open()
+            return
+
+        self.results.append(success)
+        if self.state == "open":
+            return  # late results from calls started before the circuit opened
+        failures = self.results.count(False)
+        if len(self.results) >= self.min_calls and failures / len(self.results) >= self.error_rate:
+            self._open()
+
+    def get_metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "state": "half_open" if self.state == "open" and not self.is_open() else self.state,
+            "recent_calls": len(self.results),
+            "recent_failures": self.results.count(False),
+            "times_opened": self.times_opened,
+        }
+
+
+latency_tracker = LatencyTracker()
+
+circuit_breaker = CircuitBreaker(
+    window=settings.GEMINI_BREAKER_WINDOW,
+    min_calls=settings.GEMINI_BREAKER_MIN_CALLS,
+    error_rate=settings.GEMINI_BREAKER_ERROR_RATE,
+    cooldown=settings.GEMINI_BREAKER_COOLDOWN_SECONDS,
+    enabled=settings.GEMINI_BREAKER_ENABLED,
+)
@@ -1,10 +1,39 @@
 from google import genai
+from google.genai import errors, types
+import asyncio
+import hashlib
+import time
+import httpx
 import json
+from contextlib import nullcontext
 from ..config import get_settings
-from ..models import AnimationIR, ChatMessage
+from typing import AsyncIterator, Literal, get_args, get_origin
+from ..models import Animation, AnimationIR, AnimationObject, ChatMessage
+from .ir_stream_parser import IncrementalSceneParser
+from .ir_patch import apply_patch
+from .edit_intents import match_edit_intent
+from .template_service import TemplateService
+from .ir_codec import COMPACT_LEGEND, encode_compact, expand_compact
+from .ir_repair import coerce_animation, coerce_patch_ops, repair_json
+from .prompt_cache import PromptCache, normalize_prompt
+from .gemini_limiter import GeminiOverloadedError, estimate_tokens, limiter
+from .gemini_resilience import GeminiTimeoutError, GeminiUnavailableError, circuit_breaker, latency_tracker
 
 settings = get_settings()
-client = genai.Client(api_key=settings.GEMINI_API_KEY)
+
+# One keep-alive connection pool shared by every request in this worker
+http_client = httpx.AsyncClient(
+    limits=httpx.Limits(
+        max_connections=settings.GEMINI_POOL_SIZE,
+        max_keepalive_connections=settings.GEMINI_POOL_SIZE,
+        keepalive_expiry=60.0
+    ),
+    timeout=httpx.Timeout(settings.GEMINI_TIMEOUT_SECONDS)
+)
+client = genai.Client(
+    api_key=settings.GEMINI_API_KEY,
+    http_options=types.HttpOptions(httpx_async_client=http_client)
+)
 
 SYSTEM_PROMPT = """You are an AI animation assistant that helps users create and modify 2D animations through conversation.
 
@@ -106,93 +135,644 @@ Based on the current animation above and the user's request, output the UPDATED
  
 Output ONLY the complete updated JSON (no explanations):"""
 
+PATCH_PROMPT_TEMPLATE = """CURRENT ANIMATION STATE:
+{current_animation}
+
+USER REQUEST:
+{user_request}
+
+Do NOT output the whole animation. Output ONLY a JSON array of edit operations
+that turn the current animation into the requested one. Address objects by
+their "id" (add "scene_id" if the id appears in several scenes) and scenes by
+"scene_id". Keep every id stable.
+
+OPERATIONS:
+- {{"op": "update_object", "id": "...", "scene_id": "optional", "set": {{"color": "#ff0000"}}}}
+  settable: content, shape, radius, width, height, side_length, position,
+  font_size, color, fill_opacity, stroke_width, animations (full list)
+- {{"op": "add_object", "scene_id": "...", "object": {{...full object...}}}}
+- {{"op": "remove_object", "id": "...", "scene_id": "optional"}}
+- {{"op": "update_scene", "scene_id": "...", "set": {{"duration": 5.0, "background_color": "#000000"}}}}
+- {{"op": "add_scene", "after": "scene_id or null", "scene": {{...full scene...}}}}
+- {{"op": "remove_scene", "scene_id": "..."}}
+- {{"op": "update_animation", "set": {{"style": "cyberpunk"}}}}
+- {{"op": "replace_all", "animation": {{...full animation...}}}}  (ONLY for a completely new animation)
+
+Example for "make the title red":
+[{{"op": "update_object", "id": "title", "set": {{"color": "#ff0000"}}}}]
+
+Output ONLY the JSON array (no explanations):"""
+
+_STRING = {"type": "STRING"}
+_NUMBER = {"type": "NUMBER"}
+_POSITION = {"type": "ARRAY", "items": _NUMBER}
+
+
+def _choices(model, field: str) -> dict:
+    """STRING enum of a model's Literal (or Optional[Literal]) field, so the schema follows the models"""
+    annotation = model.model_fields[field].annotation
+    if get_origin(annotation) is not Literal:
+        annotation = next(arg for arg in get_args(annotation) if get_origin(arg) is Literal)
+    return {"type": "STRING", "enum": list(get_args(annotation))}
+
+
+# Response schema for structured output (Gemini's OpenAPI subset)
+ANIMATION_RESPONSE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "version": _STRING,
+        "metadata": {
+            "type": "OBJECT",
+            "properties": {
+                "title": _STRING,
+                "duration_estimate": _NUMBER,
+                "total_scenes": {"type": "INTEGER"},
+            },
+            "required": ["title"],
+        },
+        "style": _STRING,
+        "scenes": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "scene_id": _STRING,
+                    "duration": _NUMBER,
+                    "background_color": _STRING,
+                    "narration": _STRING,
+                    "objects": {
+                        "type": "ARRAY",
+                        "items": {
+                            "type": "OBJECT",
+                            "properties": {
+                                "type": _choices(AnimationObject, "type"),
+                                "id": _STRING,
+                                "content": _STRING,
+                                "shape": _choices(AnimationObject, "shape"),
+                                "radius": _NUMBER,
+                                "width": _NUMBER,
+                                "height": _NUMBER,
+                                "side_length": _NUMBER,
+                                "position": _POSITION,
+                                "font_size": {"type": "INTEGER"},
+                                "color": _STRING,
+                                "fill_opacity": _NUMBER,
+                                "stroke_width": _NUMBER,
+                                "animations": {
+                                    "type": "ARRAY",
+                                    "items": {
+                                        "type": "OBJECT",
+                                        "properties": {
+                                            "type": _choices(Animation, "type"),
+                                            "start_time": _NUMBER,
+                                            "duration": _NUMBER,
+                                            "target_position": _POSITION,
+                                            "scale_factor": _NUMBER,
+                                            "angle": _NUMBER,
+                                            "easing": _choices(Animation, "easing"),
+                                        },
+                                        "required": ["type", "start_time", "duration"],
+                                    },
+                                },
+                            },
+                            "required": ["type", "id"],
+                        },
+                    },
+                },
+                "required": ["scene_id", "duration", "objects"],
+                "property_ordering": ["scene_id", "duration", "background_color", "narration", "objects"],
+            },
+        },
+        "audio": {
+            "type": "OBJECT",
+            "properties": {
+                "enabled": {"type": "BOOLEAN"},
+                "text": _STRING,
+                "voice": _STRING,
+                "audio_url": _STRING,
+            },
+        },
+    },
+    "required": ["metadata", "scenes"],
+    "property_ordering": ["version", "metadata", "style", "scenes", "audio"],
+}
+
+# Part of every response cache key, so editing a prompt invalidates old entries
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT + MODIFICATION_PROMPT_TEMPLATE + PATCH_PROMPT_TEMPLATE).encode("utf-8")
+).hexdigest()[:12]
+
+prompt_cache = PromptCache(
+    settings.GEMINI_CACHE_DIR,
+    settings.GEMINI_CACHE_MAX_MB * 1024 * 1024,
+    settings.GEMINI_CACHE_TTL_SECONDS,
+    enabled=settings.GEMINI_CACHE_ENABLED
+)
+
+
 class GeminiService:
     def __init__(self):
         self.client = client
         self.model = "models/gemini-flash-lite-latest"
+        self.timeout = settings.GEMINI_TIMEOUT_SECONDS
+        self.limiter = limiter
+        self.breaker = circuit_breaker
+        self.latency = latency_tracker
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.cache = prompt_cache
+        self.fast_edits = 0
+        self.templates = TemplateService()
+        self.template_matches = 0
+        self.modification_mode = settings.GEMINI_MODIFICATION_MODE
+        self.generation_config = {
+            "temperature": 0.7,
+            "max_output_tokens": 4096,
+        }
+        # Edits are small; a low temperature keeps ids and untouched values stable
+        self.patch_config = {
+            "temperature": 0.2,
+            "max_output_tokens": 1024,
+        }
+        if settings.GEMINI_STRUCTURED_OUTPUT in ("json", "schema"):
+            self.generation_config["response_mime_type"] = "application/json"
+            self.patch_config["response_mime_type"] = "application/json"
+        if settings.GEMINI_STRUCTURED_OUTPUT == "schema":
+            # Patch ops are polymorphic, so only full animations get a schema
+            self.generation_config["response_schema"] = ANIMATION_RESPONSE_SCHEMA
+    
+    def _provider_throttled(self, e: errors.APIError) -> GeminiOverloadedError:
+        """Gemini answered 429: pause admissions and pass a Retry-After on"""
+        print(f"Gemini rate limited the request: {str(e)}")
+        return GeminiOverloadedError(self.limiter.throttle())
+    
+    def _record_outcome(self, error: BaseException | None) -> None:
+        """Feed a finished call into the circuit breaker"""
+        if error is None:
+            self.breaker.record(True)
+        elif isinstance(error, (GeminiOverloadedError, errors.ClientError, asyncio.CancelledError, GeneratorExit)):
+            self.breaker.release()  # throttling, bad requests and cancellations are not outages
+        else:
+            self.breaker.record(False)
     
-    def generate_animation_json(self, user_prompt: str) -> AnimationIR:
+    async def _attempt(self, prompt: str, config: dict, kind: str = "primary") -> str:
+        """One Gemini call through the shared limiter; latency is recorded per attempt"""
+        reserved = estimate_tokens(prompt, config)
+        used = reserved
+        outcome = "error"
+        
+        async with self.limiter.slot(reserved):
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    self.client.aio.models.generate_content(
+                        model=self.model,
+                        contents=prompt,
+                        config=config
+                    ),
+                    timeout=self.timeout
+                )
+                usage = getattr(response, "usage_metadata", None)
+                used = getattr(usage, "total_token_count", None) or reserved
+                outcome = "ok"
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise GeminiTimeoutError(f"Gemini request timed out after {self.timeout:.0f}s")
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                raise
+            except errors.APIError as e:
+                if e.code == 429:
+                    outcome = "throttled"
+                    raise self._provider_throttled(e)
+                raise
+            finally:
+                self.limiter.refund(reserved, used)
+                self.latency.record(kind, time.monotonic() - started, outcome)
+        
+        return response.text
+    
+    def _hedge_delay(self) -> float:
+        """Delay before a hedge: the configured percentile of recent primary latencies"""
+        if self.latency.count("primary") < settings.GEMINI_HEDGE_MIN_SAMPLES:
+            return settings.GEMINI_HEDGE_DEFAULT_DELAY_SECONDS
+        return max(
+            self.latency.percentile(settings.GEMINI_HEDGE_PERCENTILE, "primary"),
+            settings.GEMINI_HEDGE_MIN_DELAY_SECONDS
+        )
+    
+    async def _hedged_attempt(self, prompt: str, config: dict) -> str:
         """
-        Generate a NEW animation from scratch.
+        Run the primary attempt; if it is still running after the hedge delay
+        and the limiter has spare capacity, fire an identical second attempt
+        and return whichever succeeds first.
         """
-        full_prompt = f"{SYSTEM_PROMPT}\n\nUSER REQUEST:\n{user_prompt}\n\nOUTPUT (JSON only):"
+        primary = asyncio.create_task(self._attempt(prompt, config, "primary"))
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay())
+            if done or not self.limiter.available_now(estimate_tokens(prompt, config)):
+                return await primary
+            
+            self.hedges_fired += 1
+            hedge = asyncio.create_task(self._attempt(prompt, config, "hedge"))
+            tasks.add(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.cancelled() and task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won += 1
+                        return task.result()
+            return primary.result()  # both failed: surface the primary's error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    async def _generate_content(self, prompt: str, config: dict | None = None) -> str:
+        """Call Gemini behind the circuit breaker, hedging slow calls if enabled"""
+        config = config or self.generation_config
+        self.breaker.before_call()
+        
+        try:
+            if settings.GEMINI_HEDGE_ENABLED:
+                text = await self._hedged_attempt(prompt, config)
+            else:
+                text = await self._attempt(prompt, config)
+        except BaseException as e:
+            self._record_outcome(e)
+            raise
+        
+        self._record_outcome(None)
+        return text
+    
+    async def _stream_content(self, prompt: str) -> AsyncIterator[str]:
+        """Stream Gemini output text chunks; the timeout covers the whole stream"""
+        self.breaker.before_call()
+        loop = asyncio.get_running_loop()
+        reserved = estimate_tokens(prompt, self.generation_config)
+        used = reserved
+        outcome = "error"
+        error: BaseException | None = None
         
         try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=full_prompt,
-                config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 4096,
-                }
+            async with self.limiter.slot(reserved):
+                started = time.monotonic()
+                deadline = loop.time() + self.timeout
+                try:
+                    stream = await asyncio.wait_for(
+                        self.client.aio.models.generate_content_stream(
+                            model=self.model,
+                            contents=prompt,
+                            config=self.generation_config
+                        ),
+                        timeout=self.timeout
+                    )
+                    iterator = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(
+                                iterator.__anext__(),
+                                timeout=max(deadline - loop.time(), 0)
+                            )
+                        except StopAsyncIteration:
+                            break
+                        usage = getattr(chunk, "usage_metadata", None)
+                        used = getattr(usage, "total_token_count", None) or used
+                        if chunk.text:
+                            yield chunk.text
+                    outcome = "ok"
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    raise GeminiTimeoutError(f"Gemini request timed out after {self.timeout:.0f}s")
+                except (asyncio.CancelledError, GeneratorExit):
+                    outcome = "cancelled"
+                    raise
+                except errors.APIError as e:
+                    if e.code == 429:
+                        outcome = "throttled"
+                        raise self._provider_throttled(e)
+                    raise
+                finally:
+                    self.limiter.refund(reserved, used)
+                    self.latency.record("stream", time.monotonic() - started, outcome)
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._record_outcome(error)
+    
+    def _creation_prompt(self, user_prompt: str) -> str:
+        return f"{SYSTEM_PROMPT}\n\nUSER REQUEST:\n{user_prompt}\n\nOUTPUT (JSON only):"
+    
+    def _encode_current(self, current_animation: AnimationIR) -> str:
+        """Serialize the current animation for a prompt (compact unless disabled)"""
+        if settings.GEMINI_COMPACT_PROMPTS:
+            return f"{COMPACT_LEGEND}\n{encode_compact(current_animation)}"
+        return json.dumps(current_animation.model_dump(), indent=2)
+    
+    def _modification_prompt(self, user_request: str, current_animation: AnimationIR) -> str:
+        return MODIFICATION_PROMPT_TEMPLATE.format(
+            current_animation=self._encode_current(current_animation),
+            user_request=user_request
+        )
+    
+    def match_template(
+        self, user_prompt: str, fallback: bool = False, include_premium: bool = False
+    ) -> AnimationIR | None:
+        """
+        Return the customized template when the prompt confidently matches one.
+        With fallback=True (Gemini unavailable) the closest template is accepted.
+        Premium templates are only considered with include_premium.
+        """
+        if not settings.TEMPLATE_MATCH_ENABLED:
+            return None
+        
+        if fallback:
+            match = self.templates.match_template(
+                user_prompt, threshold=settings.TEMPLATE_FALLBACK_THRESHOLD, margin=0.0,
+                include_premium=include_premium
             )
-            
-            raw_output = self._clean_output(response.text)
-            json_data = json.loads(raw_output)
-            animation_ir = AnimationIR(**json_data)
-            
-            return animation_ir
-            
-        except json.JSONDecodeError as e:
+        else:
+            match = self.templates.match_template(user_prompt, include_premium=include_premium)
+        if not match:
+            return None
+        
+        template_id, customizations, score = match
+        print(f"Prompt matched template {template_id} (score {score:.2f})")
+        self.template_matches += 1
+        return self.templates.apply_template(template_id, customizations)
+    
+    def _cache_key(
+        self,
+        kind: str,
+        user_request: str,
+        config: dict,
+        current_animation: AnimationIR | None = None
+    ) -> str:
+        """Response cache key: normalized request, current state, model, temperature, prompt version"""
+        return self.cache.key(
+            kind=kind,
+            request=normalize_prompt(user_request),
+            current=encode_compact(current_animation) if current_animation else None,
+            model=self.model,
+            temperature=config.get("temperature"),
+            version=PROMPT_VERSION,
+            structured=settings.GEMINI_STRUCTURED_OUTPUT,
+            compact=settings.GEMINI_COMPACT_PROMPTS
+        )
+    
+    def _parse_animation(self, response_text: str, action: str = "generate") -> AnimationIR:
+        """Repair, expand and coerce model output into a valid AnimationIR"""
+        try:
+            json_data = coerce_animation(expand_compact(repair_json(response_text)))
+        except ValueError as e:
             raise ValueError(f"Gemini output was not valid JSON: {e}")
+        
+        try:
+            return AnimationIR(**json_data)
         except Exception as e:
-            raise ValueError(f"Failed to generate valid animation IR: {e}")
+            raise ValueError(f"Failed to {action} valid animation IR: {e}")
     
-    def modify_animation_json(
+    async def generate_animation_json(
+        self, user_prompt: str, use_cache: bool = True, include_premium: bool = False
+    ) -> AnimationIR:
+        """
+        Generate a NEW animation from scratch.
+        Prompts that clearly ask for a built-in template (premium ones only
+        with include_premium), and identical (normalized) prompts, are
+        answered locally unless use_cache is False.
+        """
+        if use_cache:
+            animation_ir = self.match_template(user_prompt, include_premium=include_premium)
+            if animation_ir:
+                return animation_ir
+        
+        full_prompt = self._creation_prompt(user_prompt)
+        
+        try:
+            return await self.cache.get_or_generate(
+                self._cache_key("create", user_prompt, self.generation_config),
+                lambda: self._generate_content(full_prompt),
+                self._parse_animation,
+                use_cache=use_cache
+            )
+        except GeminiUnavailableError:
+            fallback = self.match_template(user_prompt, fallback=True, include_premium=include_premium)
+            if fallback:
+                return fallback
+            raise
+    
+    async def modify_animation_json(
         self, 
         user_request: str, 
-        current_animation: AnimationIR
+        current_animation: AnimationIR,
+        use_cache: bool = True
     ) -> AnimationIR:
         """
         MODIFY an existing animation based on user request.
+        In patch mode the model returns an edit list that is applied locally;
+        if the patch is unusable we fall back to regenerating the full JSON
+        (not on a timeout: a full call is slower still).
         """
-        current_json = json.dumps(current_animation.model_dump(), indent=2)
+        if self.modification_mode == "patch":
+            try:
+                return await self.patch_animation_json(user_request, current_animation, use_cache)
+            except GeminiTimeoutError:
+                raise
+            except ValueError as e:
+                print(f"Patch modification failed, falling back to full JSON: {str(e)}")
         
-        full_prompt = MODIFICATION_PROMPT_TEMPLATE.format(
-            current_animation=current_json,
+        return await self._modify_full_animation_json(user_request, current_animation, use_cache)
+    
+    async def patch_animation_json(
+        self,
+        user_request: str,
+        current_animation: AnimationIR,
+        use_cache: bool = True
+    ) -> AnimationIR:
+        """
+        Ask Gemini for an operation list against stable object/scene ids and
+        apply it locally, so output size scales with the edit.
+        """
+        full_prompt = PATCH_PROMPT_TEMPLATE.format(
+            current_animation=self._encode_current(current_animation),
             user_request=user_request
         )
         
-        try:
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=full_prompt,
-                config={
-                    "temperature": 0.7,
-                    "max_output_tokens": 4096,
-                }
-            )
-            
-            raw_output = self._clean_output(response.text)
-            json_data = json.loads(raw_output)
-            animation_ir = AnimationIR(**json_data)
+        def parse(response_text: str) -> AnimationIR:
+            try:
+                ops = expand_compact(repair_json(response_text))
+            except ValueError as e:
+                raise ValueError(f"Gemini patch was not valid JSON: {e}")
             
-            return animation_ir
+            if isinstance(ops, dict):
+                ops = ops.get("ops", [ops])
             
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Gemini output was not valid JSON: {e}")
-        except Exception as e:
-            raise ValueError(f"Failed to modify animation IR: {e}")
+            try:
+                return apply_patch(current_animation, coerce_patch_ops(ops))
+            except ValueError:
+                raise
+            except Exception as e:
+                raise ValueError(f"Patched animation is invalid: {e}")
+        
+        return await self.cache.get_or_generate(
+            self._cache_key("patch", user_request, self.patch_config, current_animation),
+            lambda: self._generate_content(full_prompt, self.patch_config),
+            parse,
+            use_cache=use_cache
+        )
+    
+    async def _modify_full_animation_json(
+        self,
+        user_request: str,
+        current_animation: AnimationIR,
+        use_cache: bool = True
+    ) -> AnimationIR:
+        """Regenerate the complete updated animation JSON"""
+        full_prompt = self._modification_prompt(user_request, current_animation)
+        
+        return await self.cache.get_or_generate(
+            self._cache_key("modify", user_request, self.generation_config, current_animation),
+            lambda: self._generate_content(full_prompt),
+            lambda text: self._parse_animation(text, "modify"),
+            use_cache=use_cache
+        )
+    
+    def fast_edit(
+        self,
+        user_message: str,
+        current_animation: AnimationIR
+    ) -> tuple[str, AnimationIR] | None:
+        """
+        Apply simple, unambiguous edits (recolor, move, resize, speed,
+        background, style) locally without a model call.
+        Returns None when the request needs Gemini.
+        """
+        if not settings.FAST_EDITS_ENABLED:
+            return None
+        
+        intent = match_edit_intent(user_message, current_animation)
+        if not intent:
+            return None
+        
+        ops, summary = intent
+        try:
+            updated_animation = apply_patch(current_animation, ops)
+        except ValueError as e:
+            print(f"Fast edit failed, falling back to Gemini: {str(e)}")
+            return None
+        
+        self.fast_edits += 1
+        return f"Done! I {summary}.", updated_animation
     
-    def generate_conversational_response(
+    async def generate_conversational_response(
         self,
         user_message: str,
         conversation_history: list[ChatMessage],
-        current_animation: AnimationIR | None
+        current_animation: AnimationIR | None,
+        use_cache: bool = True,
+        include_premium: bool = False
     ) -> tuple[str, AnimationIR]:
         """
         Generate response in conversational mode.
         Returns (assistant_message, updated_animation)
         """
         if current_animation:
-            updated_animation = self.modify_animation_json(user_message, current_animation)
+            fast = self.fast_edit(user_message, current_animation)
+            if fast:
+                return fast
+            
+            updated_animation = await self.modify_animation_json(user_message, current_animation, use_cache)
             assistant_message = self._generate_modification_message(user_message, updated_animation)
         else:
-            updated_animation = self.generate_animation_json(user_message)
+            updated_animation = await self.generate_animation_json(user_message, use_cache, include_premium)
             assistant_message = self._generate_creation_message(updated_animation)
         
         return assistant_message, updated_animation
     
+    async def stream_conversational_response(
+        self,
+        user_message: str,
+        conversation_history: list[ChatMessage],
+        current_animation: AnimationIR | None,
+        use_cache: bool = True,
+        include_premium: bool = False
+    ) -> AsyncIterator[tuple[str, object]]:
+        """
+        Streaming variant of generate_conversational_response.
+        Yields ("scene", Scene) as each scene completes and validates, then
+        ("done", (assistant_message, updated_animation)).
+        """
+        fast = self.fast_edit(user_message, current_animation) if current_animation else None
+        if fast:
+            for scene in fast[1].scenes:
+                yield "scene", scene
+            yield "done", fast
+            return
+        
+        if current_animation and self.modification_mode == "patch":
+            # Patches are small and applied locally; there is nothing to stream
+            updated_animation = await self.modify_animation_json(user_message, current_animation, use_cache)
+            for scene in updated_animation.scenes:
+                yield "scene", scene
+            assistant_message = self._generate_modification_message(user_message, updated_animation)
+            yield "done", (assistant_message, updated_animation)
+            return
+        
+        template_animation = None
+        if not current_animation and (use_cache or self.breaker.is_open()):
+            template_animation = self.match_template(
+                user_message, fallback=self.breaker.is_open(), include_premium=include_premium
+            )
+        if template_animation:
+            for scene in template_animation.scenes:
+                yield "scene", scene
+            yield "done", (self._generate_creation_message(template_animation), template_animation)
+            return
+        
+        if current_animation:
+            prompt = self._modification_prompt(user_message, current_animation)
+            cache_key = self._cache_key("modify", user_message, self.generation_config, current_animation)
+        else:
+            prompt = self._creation_prompt(user_message)
+            cache_key = self._cache_key("create", user_message, self.generation_config)
+        
+        use_cache = use_cache and self.cache.enabled
+        cached = await asyncio.to_thread(self.cache.get, cache_key) if use_cache else None
+        if cached is not None:
+            self.cache.hits += 1
+        elif use_cache:
+            pending = self.cache.join(cache_key)
+            if pending is not None:
+                # The same prompt is streaming for another request: share its response
+                cached = await asyncio.shield(pending)
+        
+        action = "modify" if current_animation else "generate"
+        if cached is not None:
+            updated_animation = self._parse_animation(cached, action)
+            for scene in updated_animation.scenes:
+                yield "scene", scene
+        else:
+            async with self.cache.generating(cache_key) if use_cache else nullcontext() as store:
+                parser = IncrementalSceneParser()
+                async for text in self._stream_content(prompt):
+                    for scene in parser.feed(text):
+                        yield "scene", scene
+                
+                updated_animation = self._parse_animation(parser.text, action)
+                if store:
+                    await store(parser.text)
+        
+        if current_animation:
+            assistant_message = self._generate_modification_message(user_message, updated_animation)
+        else:
+            assistant_message = self._generate_creation_message(updated_animation)
+        
+        yield "done", (assistant_message, updated_animation)
+    
     def _generate_creation_message(self, animation: AnimationIR) -> str:
         """Generate a friendly message for new animations"""
         scene_count = len(animation.scenes)
@@ -204,16 +784,3 @@ class GeminiService:
     def _generate_modification_message(self, request: str, animation: AnimationIR) -> str:
         """Generate a friendly message for modifications"""
         return f"I've updated the animation based on your request. The changes have been applied!"
-    
-    def _clean_output(self, raw_output: str) -> str:
-        """Clean markdown artifacts from output"""
-        raw_output = raw_output.strip()
-        
-        if raw_output.startswith("```json"):
-            raw_output = raw_output[7:]
-        if raw_output.startswith("```"):
-            raw_output = raw_output[3:]
-        if raw_output.endswith("```"):
-            raw_output = raw_output[:-3]
-        
-        return raw_output.strip()
\ No newline at end of file
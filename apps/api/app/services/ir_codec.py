@@ -0,0 +1,93 @@
+import json
+from typing import Any
+from ..models import AnimationIR
+
+# Long field name -> short prompt key. Short keys never collide with long
+# names, so expanding already-expanded (or mixed) data is a no-op.
+SHORT_KEYS = {
+    "version": "v",
+    "metadata": "m",
+    "scenes": "S",
+    "style": "st",
+    "audio": "au",
+    "scene_id": "sid",
+    "duration": "d",
+    "background_color": "bg",
+    "objects": "o",
+    "narration": "n",
+    "type": "t",
+    "content": "c",
+    "shape": "sh",
+    "radius": "r",
+    "width": "w",
+    "height": "h",
+    "side_length": "sl",
+    "position": "p",
+    "font_size": "fs",
+    "color": "col",
+    "fill_opacity": "fo",
+    "stroke_width": "sw",
+    "animations": "a",
+    "start_time": "s",
+    "target_position": "tp",
+    "scale_factor": "sf",
+    "angle": "ang",
+    "easing": "e",
+    "enabled": "en",
+    "text": "tx",
+    "voice": "vo",
+    "audio_url": "url",
+}
+LONG_KEYS = {short: long for long, short in SHORT_KEYS.items()}
+
+# Metadata is free-form; its keys are passed through untouched
+OPAQUE_FIELDS = {"metadata"}
+
+COMPACT_LEGEND = (
+    "Compact JSON: omitted fields use schema defaults. Keys: "
+    + ", ".join(f"{short}={long}" for long, short in SHORT_KEYS.items())
+)
+
+
+def _rename(value: Any, mapping: dict[str, str]) -> Any:
+    if isinstance(value, list):
+        return [_rename(item, mapping) for item in value]
+    if not isinstance(value, dict):
+        return value
+
+    renamed = {}
+    for key, item in value.items():
+        new_key = mapping.get(key, key)
+        long_key = LONG_KEYS.get(new_key, new_key)
+        renamed[new_key] = item if long_key in OPAQUE_FIELDS else _rename(item, mapping)
+    return renamed
+
+
+def _compact_number(value: Any) -> Any:
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, list):
+        return [_compact_number(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _compact_number(item) for key, item in value.items()}
+    return value
+
+
+def encode_compact(animation: AnimationIR) -> str:
+    """
+    Serialize an AnimationIR for prompts: defaults and nulls dropped, short
+    keys, integral floats written as ints, no whitespace.
+    """
+    data = animation.model_dump(exclude_defaults=True, exclude_none=True)
+    data = _compact_number(_rename(data, SHORT_KEYS))
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def expand_compact(data: Any) -> Any:
+    """Map short keys back to field names; defaults are restored by the models"""
+    return _rename(data, LONG_KEYS)
+
+
+def decode_compact(text: str) -> AnimationIR:
+    """Parse compact (or regular) IR JSON into an AnimationIR"""
+    return AnimationIR(**expand_compact(json.loads(text)))
@@ -0,0 +1,151 @@
+import math
+from typing import Optional
+from ..models import AnimationObject, Scene
+from .ir_timeline import WAIT_EPSILON, Step, scene_steps
+
+INTRODUCERS = {"write", "create", "fade_in"}
+
+# Visible area in scene units at the 16:9 every render uses (frame height 8)
+FRAME_HALF_WIDTH = 8.0 * 16 / 9 / 2
+FRAME_HALF_HEIGHT = 4.0
+STROKE_MARGIN = 0.1
+DOT_RADIUS = 0.08
+
+POSITION_TOLERANCE = 1e-9
+
+
+def bounding_radius(obj: AnimationObject) -> Optional[float]:
+    """
+    Radius of a circle around the object's center that contains it, for
+    the objects the code generator draws with a known size (None for text
+    and LaTeX, whose extent depends on font metrics).
+    """
+    if obj.type == "shape":
+        if obj.shape == "circle":
+            return (obj.radius or 1.0) + STROKE_MARGIN
+        if obj.shape == "square":
+            return (obj.side_length or 2.0) * math.sqrt(2) / 2 + STROKE_MARGIN
+        if obj.shape == "rectangle":
+            return math.hypot(obj.width or 2.0, obj.height or 1.0) / 2 + STROKE_MARGIN
+        if obj.shape == "triangle":
+            return 1.0 + STROKE_MARGIN
+    if obj.type in ("text", "latex"):
+        return None
+    return DOT_RADIUS + STROKE_MARGIN  # everything else is drawn as a Dot
+
+
+class _ObjectState:
+    def __init__(self, obj: AnimationObject):
+        self.center = list(obj.position or [0, 0, 0])
+        self.scale = 1.0
+        self.radius = bounding_radius(obj)
+
+    def off_screen(self, scale: Optional[float] = None) -> bool:
+        if self.radius is None:
+            return False
+        extent = self.radius * abs(self.scale if scale is None else scale)
+        return (
+            abs(self.center[0]) - extent > FRAME_HALF_WIDTH
+            or abs(self.center[1]) - extent > FRAME_HALF_HEIGHT
+        )
+
+
+def _is_noop(step: Step, state: _ObjectState, on_scene: bool, final: bool) -> bool:
+    """
+    A play whose frames are the same as waiting for its duration. `final`:
+    the object has nothing but fade_outs left to play, so a transform it
+    gets off-screen can never be seen later either.
+    """
+    anim = step.anim
+    if not on_scene:
+        return False  # playing would add the object to the scene
+    if anim.type == "scale":
+        factor = anim.scale_factor or 1.0
+        return factor == 1.0 or (final and state.off_screen() and state.off_screen(state.scale * factor))
+    if anim.type == "rotate":
+        return (anim.angle or 0.0) == 0.0 or (final and state.off_screen())
+    if anim.type == "move_to":
+        return all(abs(a - b) <= POSITION_TOLERANCE for a, b in zip(anim.target_position, state.center))
+    return False
+
+
+def _apply(step: Step, state: _ObjectState, on_scene: list[str]) -> None:
+    """Track what a play leaves behind (mirrors IRScene._restore)"""
+    obj_id, anim = step.obj.id, step.anim
+    if anim.type in INTRODUCERS and obj_id in on_scene:
+        on_scene.remove(obj_id)
+    if obj_id not in on_scene:
+        on_scene.append(obj_id)
+
+    if anim.type == "fade_out":
+        on_scene.remove(obj_id)
+    elif anim.type == "move_to":
+        state.center = list(anim.target_position)
+    elif anim.type == "scale":
+        state.scale *= anim.scale_factor or 1.0
+
+
+def optimize_scene(scene: Scene) -> Scene:
+    """
+    Drop work that does not change the rendered video:
+    - plays that look the same as a wait: scale by 1, rotate by 0, move_to
+      the current position, and scale/rotate of a shape that stays
+      entirely off-screen and never plays anything but a fade_out after it
+      (only while the object is already on the scene, since a play would
+      otherwise add it)
+    - off-screen fade_out as an object's last play, and off-screen
+      fade_in/write/create immediately undone by a fade_out
+    - objects left with nothing to play (they are never added to the scene)
+    Animations are re-timed to when they actually play, so dropped plays
+    become waits that merge with their neighbours, and the scene keeps its
+    rendered length. Plays shorter than a wait the code generator would
+    emit are kept, so nothing after them shifts.
+    """
+    steps = scene_steps(scene)
+    plays = [step for step in steps if step.kind == "play"]
+    states = {obj.id: _ObjectState(obj) for obj in scene.objects}
+    on_scene: list[str] = []
+    dropped: set[int] = set()
+
+    for i, step in enumerate(plays):
+        if i in dropped:
+            continue
+        state = states[step.obj.id]
+        later = [j for j in range(i + 1, len(plays)) if plays[j].obj.id == step.obj.id]
+        droppable = step.duration > WAIT_EPSILON
+        final = all(plays[j].anim.type == "fade_out" for j in later)
+
+        if droppable and _is_noop(step, state, step.obj.id in on_scene, final):
+            dropped.add(i)
+            continue
+        if droppable and state.off_screen():
+            if step.anim.type == "fade_out" and step.obj.id in on_scene and not later:
+                dropped.add(i)
+                continue
+            if (
+                step.anim.type in INTRODUCERS
+                and step.obj.id not in on_scene
+                and later
+                and plays[later[0]].anim.type == "fade_out"
+                and plays[later[0]].duration > WAIT_EPSILON
+            ):
+                dropped.update((i, later[0]))  # leaves the scene as it found it
+                continue
+        _apply(step, state, on_scene)
+
+    kept: dict[str, list] = {obj.id: [] for obj in scene.objects}
+    for i, step in enumerate(plays):
+        if i not in dropped:
+            kept[step.obj.id].append(step.anim.model_copy(update={"start_time": step.start}))
+
+    objects = [
+        obj.model_copy(update={"animations": kept[obj.id]})
+        for obj in scene.objects
+        if kept[obj.id]
+    ]
+    # Validation is skipped on purpose: plays can run past the scene's duration
+    return scene.model_copy(update={
+        "objects": objects,
+        "duration": sum(step.duration for step in steps),
+    })
+
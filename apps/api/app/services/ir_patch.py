@@ -0,0 +1,118 @@
+import copy
+from typing import Any, Optional
+from ..models import AnimationIR
+
+# Fields a patch may change on each level of the IR
+OBJECT_FIELDS = {
+    "type", "content", "shape", "radius", "width", "height", "side_length",
+    "position", "font_size", "color", "fill_opacity", "stroke_width", "animations",
+}
+SCENE_FIELDS = {"duration", "background_color", "narration"}
+ANIMATION_FIELDS = {"metadata", "style", "audio"}
+
+
+def _find_scene(data: dict, scene_id: str) -> dict:
+    for scene in data["scenes"]:
+        if scene["scene_id"] == scene_id:
+            return scene
+    raise ValueError(f"Unknown scene_id '{scene_id}'")
+
+
+def _find_objects(data: dict, object_id: str, scene_id: Optional[str]) -> list[tuple[dict, dict]]:
+    """Return (scene, object) pairs matching an object id, optionally within one scene"""
+    scenes = [_find_scene(data, scene_id)] if scene_id else data["scenes"]
+    matches = [
+        (scene, obj)
+        for scene in scenes
+        for obj in scene["objects"]
+        if obj["id"] == object_id
+    ]
+    if not matches:
+        raise ValueError(f"Unknown object id '{object_id}'")
+    return matches
+
+
+def _check_fields(values: dict, allowed: set, op: str) -> None:
+    unknown = set(values) - allowed
+    if unknown:
+        raise ValueError(f"{op}: cannot set {', '.join(sorted(unknown))}")
+
+
+def _apply_op(data: dict, op: dict[str, Any]) -> dict:
+    kind = op.get("op")
+
+    if kind == "update_object":
+        values = op.get("set") or {}
+        _check_fields(values, OBJECT_FIELDS, kind)
+        for _, obj in _find_objects(data, op["id"], op.get("scene_id")):
+            obj.update(copy.deepcopy(values))
+
+    elif kind == "add_object":
+        scene = _find_scene(data, op["scene_id"])
+        new_object = copy.deepcopy(op["object"])
+        if any(obj["id"] == new_object.get("id") for obj in scene["objects"]):
+            raise ValueError(f"add_object: id '{new_object.get('id')}' already exists")
+        scene["objects"].append(new_object)
+
+    elif kind == "remove_object":
+        for scene, obj in _find_objects(data, op["id"], op.get("scene_id")):
+            scene["objects"].remove(obj)
+
+    elif kind == "update_scene":
+        values = op.get("set") or {}
+        _check_fields(values, SCENE_FIELDS, kind)
+        _find_scene(data, op["scene_id"]).update(copy.deepcopy(values))
+
+    elif kind == "add_scene":
+        new_scene = copy.deepcopy(op["scene"])
+        if any(scene["scene_id"] == new_scene.get("scene_id") for scene in data["scenes"]):
+            raise ValueError(f"add_scene: scene_id '{new_scene.get('scene_id')}' already exists")
+        after = op.get("after")
+        index = len(data["scenes"])
+        if after:
+            index = data["scenes"].index(_find_scene(data, after)) + 1
+        data["scenes"].insert(index, new_scene)
+
+    elif kind == "remove_scene":
+        data["scenes"].remove(_find_scene(data, op["scene_id"]))
+
+    elif kind == "update_animation":
+        values = op.get("set") or {}
+        _check_fields(values, ANIMATION_FIELDS, kind)
+        data.update(copy.deepcopy(values))
+
+    elif kind == "replace_all":
+        return copy.deepcopy(op["animation"])
+
+    else:
+        raise ValueError(f"Unknown patch op '{kind}'")
+
+    return data
+
+
+def apply_patch(animation: AnimationIR, ops: list[dict]) -> AnimationIR:
+    """
+    Apply an operation list to an AnimationIR and validate the result.
+    Objects are addressed by their stable id (plus scene_id when ambiguous),
+    scenes by scene_id. Raises ValueError if an op or the result is invalid.
+    """
+    if not isinstance(ops, list):
+        raise ValueError("Patch must be a list of operations")
+
+    data = animation.model_dump()
+    for op in ops:
+        if not isinstance(op, dict):
+            raise ValueError("Each patch operation must be an object")
+        try:
+            data = _apply_op(data, op)
+        except KeyError as e:
+            raise ValueError(f"{op.get('op')}: missing field {e}")
+
+    scene_ops = {"add_scene", "remove_scene", "update_scene"}
+    if any(op.get("op") in scene_ops for op in ops) and isinstance(data.get("metadata"), dict):
+        data["metadata"]["total_scenes"] = len(data.get("scenes", []))
+        data["metadata"]["duration_estimate"] = sum(
+            scene.get("duration", 0) for scene in data.get("scenes", [])
+        )
+
+    return AnimationIR(**data)
@@ -0,0 +1,273 @@
+import json
+import re
+from typing import Any, Optional
+from ..config import get_settings
+
+settings = get_settings()
+
+# Bounds enforced by the AnimationIR models
+X_RANGE = (-7.0, 7.0)
+Y_RANGE = (-4.0, 4.0)
+FONT_SIZE_RANGE = (12, 120)
+MIN_DURATION = 0.1
+MAX_SCENE_SECONDS = min(settings.MAX_SCENE_DURATION, 10.0)
+MAX_OBJECTS_PER_SCENE = 10
+MAX_SCENES = 20
+
+ANIMATION_TYPES = {"write", "create", "fade_in", "fade_out", "move_to", "scale", "rotate"}
+EASINGS = {"linear", "ease_in", "ease_out", "ease_in_out", "bounce"}
+LITERALS = {"true": "true", "false": "false", "null": "null", "True": "true", "False": "false", "None": "null"}
+
+_CLOSERS = {"{": "}", "[": "]"}
+_MAX_TRUNCATION_ATTEMPTS = 64
+
+
+def _strip_fences(text: str) -> str:
+    text = text.strip()
+    text = re.sub(r"^```(?:json)?\s*", "", text)
+    text = re.sub(r"\s*```$", "", text)
+    return text
+
+
+def _close(text: str, stack: list[str]) -> str:
+    return text.rstrip().rstrip(",") + "".join(_CLOSERS[ch] for ch in reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse model output as JSON, tolerating the usual LLM mistakes: code
+    fences, prose around the document, single quotes, Python literals,
+    unquoted keys, trailing commas, raw newlines in strings, and output
+    truncated mid-document (completed at the last element that still parses).
+    Raises ValueError if nothing usable is found.
+    """
+    text = _strip_fences(text)
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        raise ValueError("No JSON document found in model output")
+
+    out: list[str] = []
+    stack: list[str] = []
+    cut_points: list[tuple[int, tuple[str, ...]]] = []  # (output length, open containers)
+    quote: Optional[str] = None
+    escape = False
+    i = min(starts)
+
+    while i < len(text):
+        ch = text[i]
+
+        if quote:
+            if escape:
+                escape = False
+                out.append("'" if ch == "'" else "\\" + ch)
+            elif ch == "\\":
+                escape = True
+                i += 1
+                continue
+            elif ch == quote:
+                quote = None
+                out.append('"')
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            elif ch == "\t":
+                out.append("\\t")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch == "{":
+            cut_points.append((len(out), tuple(stack)))  # drop a partial object
+            stack.append(ch)
+            out.append(ch)
+        elif ch == "[":
+            stack.append(ch)
+            out.append(ch)
+            cut_points.append((len(out), tuple(stack)))  # keep an empty list
+        elif ch in "}]":
+            if not stack:
+                break
+            while out and out[-1] in " \n\r\t,":
+                out.pop()
+            out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                break
+        elif ch == ",":
+            cut_points.append((len(out), tuple(stack)))
+            out.append(ch)
+        elif ch.isalpha() or ch == "_":
+            match = re.match(r"[A-Za-z_][A-Za-z0-9_]*", text[i:])
+            word = match.group(0)
+            if out and out[-1][-1:].isdigit():
+                out.append(word)  # exponent of a number, e.g. 1e-3
+            else:
+                out.append(LITERALS.get(word, json.dumps(word)))
+            i += len(word)
+            continue
+        elif ch == "/" and text.startswith("//", i):
+            end = text.find("\n", i)
+            i = len(text) if end < 0 else end
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    candidate = "".join(out)
+
+    if not stack:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Model output is not valid JSON: {e}")
+
+    # Truncated: close what is open, then retry from earlier element boundaries.
+    # A value cut off inside a string is never kept.
+    attempts = [] if quote else [(candidate, tuple(stack))]
+    attempts += [
+        ("".join(out[:length]), snapshot)
+        for length, snapshot in reversed(cut_points)
+    ]
+    for partial, snapshot in attempts[:_MAX_TRUNCATION_ATTEMPTS]:
+        try:
+            return json.loads(_close(partial, list(snapshot)))
+        except json.JSONDecodeError:
+            continue
+    raise ValueError("Model output was truncated and could not be completed")
+
+
+def _number(value: Any, default: Optional[float] = None) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+def coerce_position(value: Any) -> list[float]:
+    """Pad/truncate to [x, y, z] and clamp into the frame"""
+    coords = [_number(v, 0.0) for v in value] if isinstance(value, (list, tuple)) else []
+    coords = (coords + [0.0, 0.0, 0.0])[:3]
+    return [_clamp(coords[0], *X_RANGE), _clamp(coords[1], *Y_RANGE), coords[2]]
+
+
+def coerce_animation_entry(data: Any) -> Optional[dict]:
+    """Fix one object animation; returns None if it cannot be salvaged"""
+    if not isinstance(data, dict) or data.get("type") not in ANIMATION_TYPES:
+        return None
+    data = dict(data)
+    data["start_time"] = max(_number(data.get("start_time"), 0.0), 0.0)
+    data["duration"] = max(_number(data.get("duration"), 1.0), MIN_DURATION)
+    if data.get("target_position") is not None:
+        data["target_position"] = coerce_position(data["target_position"])
+    if data.get("easing") not in EASINGS:
+        data["easing"] = "linear"
+    return data
+
+
+def coerce_object(data: Any) -> dict:
+    """Clamp an object's numeric fields into the model bounds"""
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    if "position" in data:
+        data["position"] = coerce_position(data["position"])
+    if data.get("font_size") is not None:
+        data["font_size"] = int(_clamp(_number(data["font_size"], 36), *FONT_SIZE_RANGE))
+    if data.get("fill_opacity") is not None:
+        data["fill_opacity"] = _clamp(_number(data["fill_opacity"], 1.0), 0.0, 1.0)
+    if data.get("stroke_width") is not None:
+        data["stroke_width"] = _clamp(_number(data["stroke_width"], 2.0), 0.0, 10.0)
+    if isinstance(data.get("animations"), list):
+        data["animations"] = [
+            anim for anim in map(coerce_animation_entry, data["animations"]) if anim
+        ]
+    return data
+
+
+def coerce_scene(data: Any, index: int = 0) -> dict:
+    """Clamp a scene's duration and object list; fill a missing scene_id"""
+    if not isinstance(data, dict):
+        return data
+    data = dict(data)
+    data.setdefault("scene_id", f"scene_{index + 1}")
+
+    objects = data.get("objects") if isinstance(data.get("objects"), list) else []
+    objects = [coerce_object(obj) for obj in objects if isinstance(obj, dict) and obj.get("type")]
+    for i, obj in enumerate(objects):
+        obj.setdefault("id", f"{data['scene_id']}_obj_{i + 1}")
+    data["objects"] = objects[:MAX_OBJECTS_PER_SCENE]
+
+    ends = [
+        anim["start_time"] + anim["duration"]
+        for obj in data["objects"]
+        for anim in obj.get("animations", [])
+    ]
+    duration = _number(data.get("duration"), max(ends, default=5.0))
+    data["duration"] = _clamp(duration, MIN_DURATION, MAX_SCENE_SECONDS)
+    return data
+
+
+def coerce_animation(data: Any) -> Any:
+    """
+    Coerce a (long-key) AnimationIR dict into the model bounds: positions,
+    durations, sizes and counts are clamped, unusable animations dropped,
+    and metadata totals recomputed. Structural problems are left for
+    validation to report.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("scenes"), list):
+        return data
+    data = dict(data)
+    # A scene without an objects list is what a truncated response leaves behind
+    scenes = [
+        coerce_scene(scene, i) for i, scene in enumerate(data["scenes"])
+        if isinstance(scene, dict) and "objects" in scene
+    ]
+    data["scenes"] = scenes[:MAX_SCENES]
+
+    metadata = data.get("metadata") if isinstance(data.get("metadata"), dict) else {}
+    metadata = dict(metadata)
+    metadata.setdefault("title", "Untitled Animation")
+    metadata["total_scenes"] = len(data["scenes"])
+    metadata["duration_estimate"] = sum(scene["duration"] for scene in data["scenes"])
+    data["metadata"] = metadata
+    return data
+
+
+def coerce_patch_ops(ops: Any) -> Any:
+    """Apply the same coercion to the payloads of patch operations"""
+    if not isinstance(ops, list):
+        return ops
+    coerced = []
+    for op in ops:
+        if not isinstance(op, dict):
+            coerced.append(op)
+            continue
+        op = dict(op)
+        kind = op.get("op")
+        if kind == "update_object" and isinstance(op.get("set"), dict):
+            op["set"] = coerce_object(op["set"])
+        elif kind == "add_object":
+            op["object"] = coerce_object(op.get("object"))
+        elif kind == "update_scene" and isinstance(op.get("set"), dict):
+            if "duration" in op["set"]:
+                duration = _number(op["set"]["duration"], 5.0)
+                op["set"] = {**op["set"], "duration": _clamp(duration, MIN_DURATION, MAX_SCENE_SECONDS)}
+        elif kind == "add_scene":
+            op["scene"] = coerce_scene(op.get("scene"))
+        elif kind == "replace_all":
+            op["animation"] = coerce_animation(op.get("animation"))
+        coerced.append(op)
+    return coerced
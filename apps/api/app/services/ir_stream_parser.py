@@ -0,0 +1,104 @@
+import json
+from typing import Optional
+from ..models import Scene
+from .ir_codec import expand_compact
+from .ir_repair import MAX_SCENES, coerce_scene
+
+
+class IncrementalSceneParser:
+    """
+    Incremental parser for streamed AnimationIR JSON.
+
+    Text chunks are fed as they arrive from the model. Every element of the
+    top-level "scenes" array (compact key "S") is emitted as soon as its
+    closing brace arrives and it validates as a Scene; the full document is
+    parsed at the end. Scenes are coerced like coerce_animation does it
+    (numbered by array position, no scene without objects, at most
+    MAX_SCENES), so their ids match the final IR's.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.pos = 0
+        self.stack: list[str] = []
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.last_string: Optional[str] = None
+        self.pending_key: Optional[str] = None
+        self.scenes_depth: Optional[int] = None
+        self.element_start: Optional[int] = None
+        self.element_index = 0  # position in the scenes array
+        self.scene_count = 0
+
+    def feed(self, chunk: str) -> list[Scene]:
+        """Consume a chunk and return the scenes completed by it"""
+        self.buffer += chunk
+        completed: list[Scene] = []
+
+        while self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == "\\":
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    self.last_string = self.buffer[self.string_start + 1:self.pos]
+            elif ch == '"':
+                if self.stack:
+                    self.in_string = True
+                    self.string_start = self.pos
+            elif ch == ":":
+                self.pending_key = self.last_string if len(self.stack) == 1 else None
+            elif ch == "," and self.scenes_depth is not None and len(self.stack) == self.scenes_depth:
+                self.element_index += 1
+            elif ch in "{[":
+                if not self.stack and ch != "{":
+                    self.pos += 1
+                    continue
+                if (
+                    ch == "[" and len(self.stack) == 1
+                    and self.pending_key in ("scenes", "S") and self.scenes_depth is None
+                ):
+                    self.scenes_depth = len(self.stack) + 1
+                if ch == "{" and self.scenes_depth is not None and len(self.stack) == self.scenes_depth:
+                    self.element_start = self.pos
+                self.stack.append(ch)
+                self.pending_key = None
+            elif ch in "}]":
+                if self.stack:
+                    self.stack.pop()
+                if (
+                    ch == "}" and self.element_start is not None
+                    and len(self.stack) == self.scenes_depth
+                ):
+                    scene = self._parse_scene(self.buffer[self.element_start:self.pos + 1])
+                    if scene:
+                        completed.append(scene)
+                    self.element_start = None
+                if ch == "]" and self.scenes_depth is not None and len(self.stack) == self.scenes_depth - 1:
+                    self.scenes_depth = -1  # scenes array closed; ignore nested arrays named scenes
+
+            self.pos += 1
+
+        return completed
+
+    def _parse_scene(self, raw: str) -> Optional[Scene]:
+        if self.scene_count >= MAX_SCENES:
+            return None
+        try:
+            data = expand_compact(json.loads(raw))
+            if "objects" not in data:
+                return None
+            scene = Scene(**coerce_scene(data, self.element_index))
+        except Exception:
+            return None
+        self.scene_count += 1
+        return scene
+
+    @property
+    def text(self) -> str:
+        return self.buffer
@@ -0,0 +1,67 @@
+from typing import NamedTuple, Optional
+from ..models import Animation, AnimationObject, Scene
+
+# Gaps shorter than this are not turned into waits (same as the code generator)
+WAIT_EPSILON = 0.01
+
+
+class Step(NamedTuple):
+    kind: str  # "play" or "wait"
+    start: float
+    duration: float
+    obj: Optional[AnimationObject] = None
+    anim: Optional[Animation] = None
+
+
+class TimedAnimation(NamedTuple):
+    start: float  # when the animation actually starts playing
+    obj: AnimationObject
+    anim: Animation
+
+
+def is_playable(anim: Animation) -> bool:
+    """Animations the code generator turns into a self.play call"""
+    return anim.type != "move_to" or bool(anim.target_position)
+
+
+def scene_steps(scene: Scene) -> list[Step]:
+    """
+    The scene as the sequence of self.play / self.wait calls it renders to.
+    Manim plays one animation at a time in start_time order, waiting out
+    gaps, so animations that overlap in the IR run back to back.
+    """
+    entries = sorted(
+        ((anim.start_time, obj, anim) for obj in scene.objects for anim in obj.animations),
+        key=lambda entry: entry[0],
+    )
+    steps = []
+    current = 0.0
+    for start_time, obj, anim in entries:
+        wait = start_time - current
+        if wait > WAIT_EPSILON:
+            steps.append(Step("wait", current, wait))
+            current = start_time
+        if not is_playable(anim):
+            continue
+        steps.append(Step("play", current, anim.duration, obj, anim))
+        current += anim.duration
+
+    remaining = scene.duration - current
+    if remaining > WAIT_EPSILON:
+        steps.append(Step("wait", current, remaining))
+    return steps
+
+
+def schedule_scene(scene: Scene) -> list[TimedAnimation]:
+    """Resolve a scene's animations to the times the rendered video plays them"""
+    return [
+        TimedAnimation(step.start, step.obj, step.anim)
+        for step in scene_steps(scene)
+        if step.kind == "play"
+    ]
+
+
+def scene_length(scene: Scene, timeline: list[TimedAnimation]) -> float:
+    """Length of the rendered scene: its duration, or longer if the plays overrun it"""
+    played = max((item.start + item.anim.duration for item in timeline), default=0.0)
+    return max(scene.duration, played)
@@ -1,10 +1,17 @@
 import asyncio
+import hashlib
+import os
 from typing import Optional
 from datetime import datetime
 from ..models import RenderJob, RenderJobStatus, AnimationIR
 from .manim_service import ManimService
 from .video_service import VideoService
 from .audio_service import AudioService
+from .artifact_store_service import ArtifactStoreService
+from .temp_gc_service import pin_path, unpin_path
+from .ir_timeline import schedule_scene, scene_length
+from .render_scheduler import render_scheduler, URGENT, NORMAL, BACKGROUND
+from ..database.database import get_db_context
 from ..config import get_settings
 
 settings = get_settings()
@@ -13,13 +20,29 @@ settings = get_settings()
 JOB_QUEUE: dict[str, RenderJob] = {}
 
 
+def render_key(animation_ir: AnimationIR, output_format: str, quality: str) -> str:
+    """Identifies renders that would produce the same output"""
+    payload = animation_ir.model_dump_json() + f"|{output_format}|{quality}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 class JobQueueService:
     def __init__(self):
         self.manim_service = ManimService()
         self.video_service = VideoService()
         self.audio_service = AudioService()
-        self.max_concurrent_jobs = 3
+        self.artifact_store = ArtifactStoreService()
+        # Jobs in flight; CPU is shared out per task by the render scheduler
+        self.max_concurrent_jobs = settings.RENDER_MAX_ACTIVE_JOBS
         self.current_jobs = 0
+        self.waiting_jobs = 0  # requested jobs waiting for a slot
+        self.tasks: dict[str, asyncio.Task] = {}
+        # user_id -> (render key, job_id) of the latest speculative preview
+        self.speculative: dict[str, tuple[str, str]] = {}
+        # job_id -> finished speculative video, pinned in TEMP_DIR and kept
+        # out of the artifact store (and the user's quota) until adopted
+        self.speculative_outputs: dict[str, str] = {}
+        self.speculative_stats = {"started": 0, "adopted": 0, "superseded": 0, "dropped": 0, "expired": 0}
     
     def create_render_job(
         self,
@@ -29,8 +52,14 @@ class JobQueueService:
         quality: str = "medium",
         project_id: Optional[str] = None,
         manim_code: Optional[str] = None,
+        speculative: bool = False,
     ) -> RenderJob:
-        """Create a new render job"""
+        """Create a new render job, reusing a matching speculative preview if one exists"""
+        if not speculative and not manim_code:
+            adopted = self._adopt_speculative(user_id, animation_ir, output_format, quality, project_id)
+            if adopted:
+                return adopted
+        
         # Estimate duration
         total_duration = sum(scene.duration for scene in animation_ir.scenes)
         estimated_render_time = total_duration * 2  # Rough estimate
@@ -43,69 +72,211 @@ class JobQueueService:
             quality=quality,
             estimated_duration=estimated_render_time,
             manim_code=manim_code,
+            speculative=speculative,
         )
         
         JOB_QUEUE[job.id] = job
         
         # Start processing asynchronously
-        asyncio.create_task(self._process_job(job.id))
+        task = asyncio.create_task(self._process_job(job.id))
+        self.tasks[job.id] = task
+        task.add_done_callback(lambda _: self.tasks.pop(job.id, None))
+        
+        return job
+    
+    def speculate(self, user_id: str, animation_ir: AnimationIR) -> Optional[RenderJob]:
+        """
+        Start a low-priority render of an IR the user has just been shown,
+        so a following /render/queue finds it done or underway. Replaces the
+        user's previous speculation; skipped when render slots are busy.
+        Discarded if not adopted within SPECULATIVE_RENDER_TTL_SECONDS.
+        """
+        self.cancel_speculative(user_id)
+        if not settings.SPECULATIVE_RENDER_ENABLED or self._busy():
+            return None
         
+        quality = settings.SPECULATIVE_RENDER_QUALITY
+        job = self.create_render_job(user_id, animation_ir, quality=quality, speculative=True)
+        self.speculative[user_id] = (render_key(animation_ir, job.output_format, quality), job.id)
+        self.speculative_stats["started"] += 1
+        asyncio.get_running_loop().call_later(
+            settings.SPECULATIVE_RENDER_TTL_SECONDS, self._expire_speculative, user_id, job.id
+        )
         return job
     
+    def cancel_speculative(self, user_id: str) -> None:
+        """Throw away the user's speculative preview (superseded by a new chat turn)"""
+        entry = self.speculative.pop(user_id, None)
+        if entry and self._discard_speculative(entry[1]):
+            self.speculative_stats["superseded"] += 1
+    
+    def _expire_speculative(self, user_id: str, job_id: str) -> None:
+        entry = self.speculative.get(user_id)
+        if not entry or entry[1] != job_id:
+            return  # adopted or replaced meanwhile
+        del self.speculative[user_id]
+        if self._discard_speculative(job_id):
+            self.speculative_stats["expired"] += 1
+    
+    def _busy(self) -> bool:
+        return (
+            self.waiting_jobs > 0
+            or self.current_jobs >= self.max_concurrent_jobs
+            or render_scheduler.backlog() >= render_scheduler.workers
+        )
+    
+    def _adopt_speculative(
+        self,
+        user_id: str,
+        animation_ir: AnimationIR,
+        output_format: str,
+        quality: str,
+        project_id: Optional[str],
+    ) -> Optional[RenderJob]:
+        entry = self.speculative.get(user_id)
+        if not entry or entry[0] != render_key(animation_ir, output_format, quality):
+            return None
+        
+        job = JOB_QUEUE.get(entry[1])
+        if not job or job.status == RenderJobStatus.FAILED:
+            return None
+        
+        del self.speculative[user_id]
+        job.speculative = False
+        job.project_id = project_id
+        self.speculative_stats["adopted"] += 1
+        
+        # Already rendered: only the store is left (a running job stores as it finishes)
+        output = self.speculative_outputs.pop(job.id, None)
+        if output:
+            task = asyncio.create_task(self._store_adopted(job, output))
+            self.tasks[job.id] = task
+            task.add_done_callback(lambda _: self.tasks.pop(job.id, None))
+        return job
+    
+    async def _store_adopted(self, job: RenderJob, output: str) -> None:
+        try:
+            await self._store_output(job, output)
+        except Exception as e:
+            job.status = RenderJobStatus.FAILED
+            job.error_message = str(e)
+            job.completed_at = datetime.utcnow()
+        finally:
+            unpin_path(output)
+    
+    def _discard_speculative(self, job_id: str) -> bool:
+        """Cancel a speculative job (if still speculative) and delete its output"""
+        job = JOB_QUEUE.get(job_id)
+        if not job or not job.speculative:
+            return False
+        
+        task = self.tasks.get(job_id)
+        if task:
+            task.cancel()
+        render_scheduler.cancel(job_id)  # before a freed worker picks up its next unit
+        del JOB_QUEUE[job_id]
+        
+        output = self.speculative_outputs.pop(job_id, None)
+        if output:
+            unpin_path(output)
+            if os.path.exists(output):
+                os.remove(output)
+        return True
+    
+    def _preempt_speculative(self) -> bool:
+        """Give a running speculative job's slot to a job the user asked for"""
+        for user_id, (_, job_id) in list(self.speculative.items()):
+            job = JOB_QUEUE.get(job_id)
+            if job and job.status == RenderJobStatus.PROCESSING and job_id not in self.speculative_outputs:
+                del self.speculative[user_id]
+                self._discard_speculative(job_id)
+                self.speculative_stats["dropped"] += 1
+                return True
+        return False
+    
     async def _process_job(self, job_id: str):
         """Process a render job asynchronously"""
         job = JOB_QUEUE.get(job_id)
         if not job:
             return
         
-        # Wait if too many concurrent jobs
-        while self.current_jobs >= self.max_concurrent_jobs:
-            await asyncio.sleep(1)
+        # Wait if too many concurrent jobs. Speculative work never queues:
+        # it is dropped, and running previews give up their slot.
+        if job.speculative and self._busy():
+            self.speculative.pop(job.user_id, None)
+            self._discard_speculative(job_id)
+            self.speculative_stats["dropped"] += 1
+            return
+        
+        self.waiting_jobs += 1
+        try:
+            while self.current_jobs >= self.max_concurrent_jobs:
+                if not self._preempt_speculative():
+                    await asyncio.sleep(1)
+                await asyncio.sleep(0)
+        finally:
+            self.waiting_jobs -= 1
+        
+        # Keep the GC away from this job's outputs while it runs: every file
+        # it writes to TEMP_DIR (scene, segment and merged videos) starts with job_prefix
+        job_prefix = os.path.join(settings.TEMP_DIR, f"job_{job_id}")
+        pin_path(job_prefix)
         
         try:
             self.current_jobs += 1
             job.status = RenderJobStatus.PROCESSING
             job.started_at = datetime.utcnow()
             
-            # Render the animation
-            if job.manim_code:
-                video_files = self.manim_service.render_custom_code(job.manim_code)
-            else:
-                video_files = self.manim_service.render_scenes(job.animation_ir)
+            # Start narration now so TTS overlaps with scene rendering
+            audio_task = asyncio.create_task(self._prepare_audio(job))
+            
+            # Render the animation: every scene (or scene segment) is a task
+            # on the shared render pool, followed by an urgent merge task
+            tier = BACKGROUND if job.speculative else NORMAL
+            media_key = job.project_id or f"user_{job.user_id}"  # Manim's partial movie cache
+            try:
+                if job.manim_code:
+                    video_files = await render_scheduler.run(
+                        job_id, self.manim_service.render_custom_code, job.manim_code, media_key, f"job_{job_id}_",
+                        cost=sum(scene.duration for scene in job.animation_ir.scenes), tier=tier
+                    )
+                else:
+                    # If a unit fails, render_planned deletes the videos the others finished
+                    units = self.manim_service.plan_animation(job.animation_ir, media_key, f"job_{job_id}_")
+                    video_files = await self.manim_service.render_planned(job_id, units, tier=tier)
+            except (Exception, asyncio.CancelledError):
+                audio_task.cancel()
+                raise
             
             # Merge videos
-            import os
             output_path = os.path.join(
                 settings.TEMP_DIR,
                 f"job_{job_id}.mp4"
             )
             
-            final_video = self.video_service.merge_videos(video_files, output_path)
+            final_video = await render_scheduler.run(
+                job_id, self.video_service.merge_videos, video_files, output_path, tier=URGENT
+            )
             
             # Process Audio
-            if job.animation_ir.audio and job.animation_ir.audio.enabled:
+            audio_path = await audio_task
+            if audio_path:
                 try:
-                    audio_path = None
-                    if job.animation_ir.audio.text:
-                        audio_path = self.audio_service.generate_voiceover(
-                            job.animation_ir.audio.text,
-                            job.animation_ir.audio.voice
-                        )
+                    video_with_audio = output_path.replace('.mp4', '_audio.mp4')
+                    await asyncio.to_thread(
+                        self.video_service.add_audio_track, final_video, audio_path, video_with_audio
+                    )
+                    
+                    # Cleanup intermediate video (optional, keeping clean)
+                    if os.path.exists(final_video):
+                        os.remove(final_video)
                     
-                    if audio_path:
-                        video_with_audio = output_path.replace('.mp4', '_audio.mp4')
-                        # Use add_audio_track to merge
-                        self.video_service.add_audio_track(final_video, audio_path, video_with_audio)
-                        
-                        # Cleanup intermediate video (optional, keeping clean)
-                        if os.path.exists(final_video):
-                            os.remove(final_video)
-                        self.audio_service.cleanup_audio(audio_path)
-                        
-                        final_video = video_with_audio
+                    final_video = video_with_audio
                 except Exception as e:
                     print(f"Audio processing failed: {str(e)}")
                     # We continue with silent video if audio fails
+                finally:
+                    self.audio_service.cleanup_audio(audio_path)
             
             # Convert format if needed
             if job.output_format == "gif":
@@ -113,9 +284,13 @@ class JobQueueService:
             elif job.output_format == "webm":
                 final_video = self._convert_to_webm(final_video)
             
-            job.video_url = final_video
-            job.status = RenderJobStatus.COMPLETED
-            job.completed_at = datetime.utcnow()
+            if job.speculative:
+                # Wait for adoption outside the artifact store; it may never come
+                pin_path(final_video)
+                self.speculative_outputs[job_id] = final_video
+                return
+            
+            await self._store_output(job, final_video)
             
         except Exception as e:
             job.status = RenderJobStatus.FAILED
@@ -124,14 +299,82 @@ class JobQueueService:
         
         finally:
             self.current_jobs -= 1
+            unpin_path(job_prefix)
+    
+    async def _store_output(self, job: RenderJob, video_path: str) -> None:
+        """Hand the output to the content-addressed store (dedupes + enforces quota)"""
+        def store() -> tuple[str, str]:
+            with get_db_context() as db:
+                artifact = self.artifact_store.store(db, job.user_id, video_path, ref_name=job.id)
+                return artifact.content_hash, self.artifact_store.local_path(artifact) or artifact.storage_key
+        
+        # Hashing and copying the video would block the event loop
+        job.artifact_hash, job.video_url = await asyncio.to_thread(store)
+        job.status = RenderJobStatus.COMPLETED
+        job.completed_at = datetime.utcnow()
+    
+    async def _prepare_audio(self, job: RenderJob) -> Optional[str]:
+        """
+        Synthesize the job's narration (only with audio enabled). Per-scene
+        narration is synthesized concurrently and aligned to the rendered
+        scene boundaries; otherwise the global audio text is used. Returns
+        None if there is nothing to narrate or TTS fails (the job then
+        continues silently).
+        """
+        audio = job.animation_ir.audio
+        scenes = job.animation_ir.scenes
+        if not audio or not audio.enabled:
+            return None
+        voice = audio.voice
+        
+        try:
+            if not job.manim_code and any(scene.narration for scene in scenes):
+                narrated = [scene for scene in scenes if scene.narration]
+                paths = iter(await asyncio.to_thread(
+                    self.audio_service.generate_voiceovers,
+                    [(scene.narration, voice) for scene in narrated]
+                ))
+                # Scenes whose plays overrun their duration render longer
+                segments = [
+                    (next(paths) if scene.narration else None, scene_length(scene, schedule_scene(scene)))
+                    for scene in scenes
+                ]
+                output_path = os.path.join(settings.TEMP_DIR, f"job_{job.id}_narration.m4a")
+                return await asyncio.to_thread(
+                    self.audio_service.build_aligned_track, segments, output_path
+                )
+            
+            if audio.text:
+                parts = self.audio_service.split_narration(audio.text)
+                chunks = await asyncio.to_thread(
+                    self.audio_service.generate_voiceovers,
+                    [(part, voice) for part in parts]
+                )
+                if len(chunks) == 1:
+                    return chunks[0]
+                
+                # Long narration was synthesized as parallel chunks; join them
+                output_path = os.path.join(settings.TEMP_DIR, f"job_{job.id}_narration.m4a")
+                return await asyncio.to_thread(
+                    self.audio_service.build_aligned_track,
+                    [(chunk, None) for chunk in chunks],
+                    output_path
+                )
+        except Exception as e:
+            print(f"Audio processing failed: {str(e)}")
+        
+        return None
     
     def get_job_status(self, job_id: str) -> Optional[RenderJob]:
         """Get the status of a render job"""
         return JOB_QUEUE.get(job_id)
     
     def get_user_jobs(self, user_id: str) -> list[RenderJob]:
-        """Get all jobs for a user"""
-        return [job for job in JOB_QUEUE.values() if job.user_id == user_id]
+        """Get all jobs for a user (speculative previews stay hidden until requested)"""
+        return [
+            job for job in JOB_QUEUE.values()
+            if job.user_id == user_id and not job.speculative
+        ]
     
     def cancel_job(self, job_id: str, user_id: str) -> bool:
         """Cancel a pending or processing job"""
@@ -147,6 +390,21 @@ class JobQueueService:
         
         return False
     
+    def delete_job(self, job_id: str, user_id: str) -> bool:
+        """Delete a finished job and release its stored output"""
+        job = JOB_QUEUE.get(job_id)
+        if not job or job.user_id != user_id:
+            return False
+        
+        if job.status in [RenderJobStatus.PENDING, RenderJobStatus.PROCESSING]:
+            return False
+        
+        with get_db_context() as db:
+            self.artifact_store.release(db, user_id, ref_name=job_id)
+        
+        del JOB_QUEUE[job_id]
+        return True
+    
     def _convert_to_gif(self, mp4_path: str) -> str:
         """Convert MP4 to GIF using FFmpeg"""
         import subprocess
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import re
+import uuid
+from ..config import get_settings
+
+settings = get_settings()
+
+
+class ManimAssetCache:
+    """
+    Persistent tex/text cache shared by every Manim process.
+    Manim keys compiled LaTeX (Tex/) and Pango text (texts/) outputs by a
+    hash of their source and reuses existing files, so pointing every render
+    at one directory (through a generated manim.cfg) lets formulas and
+    labels compile once across scenes, jobs and users. The directory is
+    kept under max_bytes by LRU eviction (see TempDirGarbageCollector).
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.cache_dir = os.path.join(root, "media")
+        self.tex_dir = os.path.join(self.cache_dir, "Tex")
+        self.text_dir = os.path.join(self.cache_dir, "texts")
+        self.config_path = os.path.join(root, "manim.cfg")
+        os.makedirs(self.tex_dir, exist_ok=True)
+        os.makedirs(self.text_dir, exist_ok=True)
+        self._write_config()
+
+    def _write_config(self) -> None:
+        config = (
+            "[CLI]\n"
+            f"tex_dir = {self.tex_dir}\n"
+            f"text_dir = {self.text_dir}\n"
+        )
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                if f.read() == config:
+                    return
+        except OSError:
+            pass
+
+        tmp_path = f"{self.config_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(config)
+        os.replace(tmp_path, self.config_path)
+
+    def cli_args(self) -> list[str]:
+        """Arguments that make a manim run use the shared cache"""
+        return ["--config_file", self.config_path]
+
+    def get_metrics(self) -> dict:
+        tex_files = len(os.listdir(self.tex_dir)) if os.path.isdir(self.tex_dir) else 0
+        text_files = len(os.listdir(self.text_dir)) if os.path.isdir(self.text_dir) else 0
+        return {"root": self.root, "tex_files": tex_files, "text_files": text_files}
+
+
+class ManimMediaStore:
+    """
+    Persistent Manim media directories, one per project (or user).
+    With caching on, Manim stores every play call's partial movie under a
+    hash of the scene state and animation, and skips rendering calls whose
+    file already exists; keeping a project's media directory and module
+    names stable between renders lets an edited animation re-render only
+    the plays that changed. Whole directories are evicted LRU to stay
+    under max_bytes (see TempDirGarbageCollector.add_dir_cache).
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def project_dir(self, key: str) -> str:
+        """Media directory for a project key, created and marked as just used"""
+        name = re.sub(r"[^A-Za-z0-9_-]", "_", key)
+        if len(name) > 64:
+            name = hashlib.sha256(key.encode()).hexdigest()[:32]
+        path = os.path.join(self.root, name)
+        os.makedirs(path, exist_ok=True)
+        os.utime(path)
+        return path
+
+    def get_metrics(self) -> dict:
+        return {"root": self.root, "projects": len(os.listdir(self.root))}
+
+
+manim_asset_cache = ManimAssetCache(
+    settings.MANIM_CACHE_DIR,
+    settings.MANIM_CACHE_MAX_MB * 1024 * 1024,
+)
+
+manim_media_store = ManimMediaStore(
+    settings.MANIM_MEDIA_DIR,
+    settings.MANIM_MEDIA_MAX_MB * 1024 * 1024,
+)
@@ -1,40 +1,62 @@
-from manim import *
+import asyncio
+import glob
 import os
 import subprocess
+import threading
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
+from typing import NamedTuple, Optional
 from ..models import AnimationIR, Scene as SceneModel, AnimationObject
 from ..config import get_settings
+from ..render_worker import RenderWorkerPool
+from .ir_optimizer import optimize_scene
+from .ir_timeline import Step, scene_steps
+from .manim_cache_service import manim_asset_cache, manim_media_store
+from .render_scheduler import NORMAL, render_scheduler
+from .styles import STYLES
+from .temp_gc_service import in_use
 
 settings = get_settings()
 
+class RenderUnit(NamedTuple):
+    program: dict  # what IRScene plays (see ManimService.scene_program)
+    module_name: str
+    output_name: str
+    seconds: float  # length of video it renders, the scheduler's cost estimate
+    media_dir: Optional[str] = None  # persistent project media dir (Manim caching on)
+
+
+# Most segments a scene is split into
+SEGMENT_WORKERS = settings.RENDER_SEGMENT_WORKERS or os.cpu_count() or 2
+
+# One Manim process for each render scheduler thread (every render runs there)
+render_workers = RenderWorkerPool(
+    processes=render_scheduler.workers,
+    cache_entries=settings.MOBJECT_CACHE_ENTRIES,
+    max_tasks_per_worker=settings.RENDER_WORKER_MAX_TASKS,
+)
+
+# Renders reusing a persistent media dir take turns per module
+_module_locks: dict[str, threading.Lock] = {}
+_module_locks_guard = threading.Lock()
+
+
+@contextmanager
+def claim_module(media_dir: Optional[str], module_name: str):
+    """
+    Hold a module's files in a persistent media dir for one render: Manim
+    writes shared files there (the partial movie list), and the GC must
+    not evict the directory meanwhile. No-op without a media dir.
+    """
+    if not media_dir:
+        yield
+        return
+    with _module_locks_guard:
+        lock = _module_locks.setdefault(os.path.join(media_dir, module_name), threading.Lock())
+    with in_use(media_dir), lock:
+        yield
 
-# Style Presets
-STYLES = {
-    "default": {
-        "bg": None, # Use scene default
-        "text": "#ffffff",
-        "math": "#ffffff",
-        "primary": "#ffffff"
-    },
-    "cyberpunk": {
-        "bg": "#050510",
-        "text": "#00ff9f", # Neon Green
-        "math": "#ff0055", # Neon Red/Pink
-        "primary": "#00dbff" # Neon Blue
-    },
-    "chalkboard": {
-        "bg": "#2b3d2b", # Dark Green
-        "text": "#eeeeee", # Chalk white
-        "math": "#dddddd",
-        "primary": "#ffffff"
-    },
-    "light": {
-        "bg": "#ffffff",
-        "text": "#000000",
-        "math": "#000000",
-        "primary": "#000000"
-    }
-}
 
 class ManimService:
     """Service to render individual scenes using Manim"""
@@ -43,61 +65,194 @@ class ManimService:
         self.quality = settings.MANIM_QUALITY
         os.makedirs(settings.TEMP_DIR, exist_ok=True)
     
-    def render_scene(self, scene_data: SceneModel, scene_index: int, style: str = "default") -> str:
+    def plan_scene(
+        self,
+        scene_data: SceneModel,
+        scene_index: int,
+        style: str = "default",
+        media_key: Optional[str] = None,
+        output_prefix: str = "",
+    ) -> list[RenderUnit]:
         """
-        Render a single scene to video file.
-        Returns path to rendered video.
+        Break a scene into independently renderable units: the whole scene,
+        or segments that each start from the state the earlier steps leave.
+        Concatenating the units' videos in order gives the scene.
+        With a media_key, units render in that project's persistent media
+        dir under module names that stay the same between renders, so
+        Manim reuses the partial movies of unchanged play calls.
+        Output files in TEMP_DIR start with output_prefix (e.g. a pinned
+        job prefix, so the GC leaves them alone until the merge).
         """
-        temp_scene_file = os.path.join(
-            settings.TEMP_DIR,
-            f"temp_scene_{scene_index}.py"
-        )
+        if settings.RENDER_OPTIMIZE_IR:
+            scene_data = optimize_scene(scene_data)
         
-        output_name = f"scene_{scene_index:03d}_{scene_data.scene_id}"
+        # Unique names so concurrent renders don't share files
+        token = uuid.uuid4().hex[:8]
+        output_name = f"{output_prefix}scene_{scene_index:03d}_{scene_data.scene_id}_{token}"
+        media_dir = self._media_dir(media_key)
+        module_name = f"scene_{scene_index:03d}" if media_dir else f"temp_scene_{scene_index}_{token}"
         
-        scene_code = self._generate_scene_code(scene_data, scene_index, style)
-        with open(temp_scene_file, 'w') as f:
-            f.write(scene_code)
+        steps = scene_steps(scene_data)
+        segments = self._split_steps(steps)
+        if len(segments) == 1:
+            return [RenderUnit(
+                self.scene_program(scene_data, style),
+                module_name,
+                output_name,
+                sum(step.duration for step in steps),
+                media_dir,
+            )]
         
-        cmd = [
-            'manim',
-            '-ql',
-            '--disable_caching',
-            '-o', f'{output_name}.mp4',
-            temp_scene_file,
-            f'DynamicScene{scene_index}'
-        ]
+        units = []
+        done = 0
+        for part, segment in enumerate(segments):
+            units.append(RenderUnit(
+                self.scene_program(scene_data, style, steps=segment, prior_steps=steps[:done]),
+                f"{module_name}_part{part}",
+                f"{output_name}_part{part:02d}",
+                sum(step.duration for step in segment),
+                media_dir,
+            ))
+            done += len(segment)
+        return units
+    
+    def render_unit(
+        self,
+        unit: RenderUnit,
+        resolution: Optional[tuple[int, int]] = None,
+        fps: Optional[int] = None,
+    ) -> str:
+        """
+        Render one planned unit on a render worker; returns the video path.
+        Manim caching is on only with a persistent media dir.
+        """
+        with claim_module(unit.media_dir, unit.module_name):
+            output_file = render_workers.render(
+                unit.program, unit.module_name, self._manim_options(unit.output_name, resolution, fps, unit.media_dir)
+            )
         
+        final_path = os.path.join(settings.TEMP_DIR, f'{unit.output_name}.mp4')
+        if not os.path.exists(output_file):
+            raise RuntimeError(f"Output file not found: {output_file}")
+        os.rename(output_file, final_path)
+        return final_path
+    
+    def plan_animation(
+        self,
+        animation_ir: AnimationIR,
+        media_key: Optional[str] = None,
+        output_prefix: str = "",
+    ) -> list[RenderUnit]:
+        """plan_scene for every scene, in order"""
+        style = animation_ir.style or "default"
+        return [
+            unit
+            for i, scene in enumerate(animation_ir.scenes)
+            for unit in self.plan_scene(scene, i, style, media_key, output_prefix)
+        ]
+    
+    async def render_planned(
+        self,
+        job_id: str,
+        units: list[RenderUnit],
+        resolution: Optional[tuple[int, int]] = None,
+        fps: Optional[int] = None,
+        tier: int = NORMAL,
+    ) -> list[str]:
+        """
+        Render units on the shared render scheduler, ranked against every
+        other job's work. Returns their videos in order (merged, they are
+        the animation). If a unit fails, the videos the others have
+        finished are deleted.
+        """
         try:
-            result = subprocess.run(
-                cmd,
-                cwd=settings.TEMP_DIR,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            output_file = os.path.join(
-                settings.TEMP_DIR,
-                'media', 'videos', f'temp_scene_{scene_index}', '480p15',
-                f'{output_name}.mp4'
+            return await render_scheduler.run_all(
+                job_id,
+                [(self.render_unit, (unit, resolution, fps), unit.seconds) for unit in units],
+                tier=tier
             )
-            
-            final_path = os.path.join(settings.TEMP_DIR, f'{output_name}.mp4')
-            if os.path.exists(output_file):
-                os.rename(output_file, final_path)
-                return final_path
-            else:
-                raise RuntimeError(f"Output file not found: {output_file}")
-                
-        except subprocess.CalledProcessError as e:
-            raise RuntimeError(f"Manim rendering failed: {e.stderr}")
-        finally:
-            if os.path.exists(temp_scene_file):
-                os.remove(temp_scene_file)
+        except (Exception, asyncio.CancelledError):
+            for unit in units:
+                path = os.path.join(settings.TEMP_DIR, f"{unit.output_name}.mp4")
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+    
+    def _media_dir(self, media_key: Optional[str]) -> Optional[str]:
+        if not media_key or not settings.MANIM_PARTIAL_CACHE_ENABLED:
+            return None
+        return manim_media_store.project_dir(media_key)
+    
+    def _split_steps(self, steps: list[Step]) -> list[list[Step]]:
+        """Cut a scene's steps into roughly equal-length runs, at most one per segment worker"""
+        total = sum(step.duration for step in steps)
+        parts = min(SEGMENT_WORKERS, int(total // settings.RENDER_SEGMENT_MIN_SECONDS))
+        if not settings.RENDER_SPLIT_SCENES or parts < 2:
+            return [steps]
+        
+        target = total / parts
+        segments: list[list[Step]] = [[]]
+        elapsed = 0.0
+        for step in steps:
+            if segments[-1] and len(segments) < parts and elapsed >= target * len(segments):
+                segments.append([])
+            segments[-1].append(step)
+            elapsed += step.duration
+        return segments
+    
+    def _manim_options(
+        self,
+        output_name: str,
+        resolution: Optional[tuple[int, int]] = None,
+        fps: Optional[int] = None,
+        media_dir: Optional[str] = None,
+    ) -> dict:
+        """Manim config for a render: -ql unless overridden, shared tex/text cache"""
+        width, height = resolution or (854, 480)
+        return {
+            "media_dir": media_dir or os.path.join(settings.TEMP_DIR, 'media'),
+            "disable_caching": not media_dir,
+            "output_file": output_name,
+            "pixel_width": width,
+            "pixel_height": height,
+            "frame_rate": fps or 15,
+            "tex_dir": manim_asset_cache.tex_dir,
+            "text_dir": manim_asset_cache.text_dir,
+            "verbosity": "WARNING",
+            "progress_bar": "none",
+        }
+    
+    def scene_program(
+        self,
+        scene_data: SceneModel,
+        style: str = "default",
+        steps: Optional[list[Step]] = None,
+        prior_steps: list[Step] = (),
+    ) -> dict:
+        """
+        What a render worker's IRScene plays for a scene, or for the run of
+        `steps` within it (objects first put into the state `prior_steps`
+        leave). Plain data, so it crosses the process boundary as is.
+        """
+        style_config = STYLES.get(style, STYLES["default"])
+        if steps is None:
+            steps = scene_steps(scene_data)
+        
+        return {
+            "background": style_config["bg"] if style_config["bg"] else scene_data.background_color,
+            "text_color": style_config["text"],
+            "math_color": style_config["math"],
+            "primary_color": style_config["primary"],
+            "objects": [obj.model_dump(exclude={"animations"}) for obj in scene_data.objects],
+            "prior": [(step.obj.id, step.anim.model_dump()) for step in prior_steps if step.kind == "play"],
+            "steps": [
+                ("wait", step.duration) if step.kind == "wait" else ("play", step.obj.id, step.anim.model_dump())
+                for step in steps
+            ],
+        }
     
     def _generate_scene_code(self, scene_data: SceneModel, scene_index: int, style: str = "default") -> str:
-        """Generate Python code for a Manim scene"""
+        """Generate Python code for a Manim scene (the manim_code export; renders use scene_program)"""
         style_config = STYLES.get(style, STYLES["default"])
         bg_color = style_config["bg"] if style_config["bg"] else scene_data.background_color
         
@@ -117,28 +272,11 @@ class DynamicScene{scene_index}(Scene):
             code += f"        {obj.id} = {self._generate_object_code(obj)}\n"
         
         code += "\n        # Animations\n"
-        animations_timeline = []
-        for obj in scene_data.objects:
-            for anim in obj.animations:
-                animations_timeline.append((anim.start_time, obj.id, anim))
-        
-        animations_timeline.sort(key=lambda x: x[0])
-        
-        current_time = 0.0
-        for start_time, obj_id, anim in animations_timeline:
-            wait_time = start_time - current_time
-            if wait_time > 0.01:
-                code += f"        self.wait({wait_time})\n"
-                current_time = start_time
-            
-            anim_code = self._generate_animation_code(obj_id, anim)
-            if anim_code:
-                code += f"        {anim_code}\n"
-                current_time += anim.duration
-        
-        remaining = scene_data.duration - current_time
-        if remaining > 0.01:
-            code += f"        self.wait({remaining})\n"
+        for step in scene_steps(scene_data):
+            if step.kind == "wait":
+                code += f"        self.wait({step.duration})\n"
+            else:
+                code += f"        {self._generate_animation_code(step.obj.id, step.anim)}\n"
         
         return code
     
@@ -183,26 +321,63 @@ class DynamicScene{scene_index}(Scene):
             return f'self.play(Rotate({obj_id}, angle={anim.angle or 0.0}*DEGREES), run_time={anim.duration})'
         return ""
     
-    def render_custom_code(self, code: str) -> list[str]:
+    def warm_cache(self, objects: list[AnimationObject]) -> int:
+        """
+        Compile the LaTeX and text of `objects` into the shared cache without
+        rendering anything. Objects are built by the same code scenes use,
+        so the cache keys match. Returns the number of distinct constructions.
+        """
+        constructions = {
+            (obj.type, obj.content, obj.font_size, obj.color): obj.model_dump(exclude={"animations"})
+            for obj in objects
+            if obj.type in ("text", "latex") and obj.content
+        }
+        if not constructions:
+            return 0
+        
+        options = {
+            "tex_dir": manim_asset_cache.tex_dir,
+            "text_dir": manim_asset_cache.text_dir,
+            "verbosity": "WARNING",
+        }
+        return render_workers.warm(list(constructions.values()), options)
+    
+    def render_custom_code(self, code: str, media_key: Optional[str] = None, output_prefix: str = "") -> list[str]:
         """
         Render custom Manim code.
+        media_key (project or user) enables Manim's partial movie cache.
+        Output files in TEMP_DIR start with output_prefix.
         Returns list of video file paths.
         """
+        media_dir = self._media_dir(media_key)
+        with claim_module(media_dir, "custom_code"):
+            return self._run_custom_code(code, media_dir, output_prefix)
+    
+    def _run_custom_code(self, code: str, media_dir: Optional[str], output_prefix: str = "") -> list[str]:
         import time
         timestamp = int(time.time() * 1000)
-        filename = f"custom_{timestamp}"
-        temp_file = os.path.join(settings.TEMP_DIR, f"{filename}.py")
+        # A stable module name lets Manim find its cached partial movies
+        filename = "custom_code" if media_dir else f"custom_{timestamp}"
+        media_root = media_dir or os.path.join(settings.TEMP_DIR, 'media')
+        temp_file = os.path.join(media_dir or settings.TEMP_DIR, f"{filename}.py")
         
         with open(temp_file, 'w') as f:
             f.write(code)
+        
+        # Scene videos a failed earlier render left behind would be picked up below
+        for stale in glob.glob(os.path.join(media_root, 'videos', filename, '*', '*.mp4')):
+            os.remove(stale)
             
         cmd = [
             'manim',
             '-ql',
-            '--disable_caching',
+            *manim_asset_cache.cli_args(),
+            '--media_dir', media_root,
             temp_file,
             '-a' # Render all scenes
         ]
+        if not media_dir:
+            cmd[2:2] = ['--disable_caching']
         
         try:
             subprocess.run(
@@ -216,11 +391,11 @@ class DynamicScene{scene_index}(Scene):
             # Find output files
             # Manim output structure: media/videos/{filename}/{quality}/*.mp4
             quality_dir = "480p15" # -ql corresponds to 480p15
-            output_dir = os.path.join(settings.TEMP_DIR, 'media', 'videos', filename, quality_dir)
+            output_dir = os.path.join(media_root, 'videos', filename, quality_dir)
             
             if not os.path.exists(output_dir):
                  # Try to find any directory inside videos/filename
-                 base_video_dir = os.path.join(settings.TEMP_DIR, 'media', 'videos', filename)
+                 base_video_dir = os.path.join(media_root, 'videos', filename)
                  if os.path.exists(base_video_dir):
                      subdirs = [d for d in os.listdir(base_video_dir) if os.path.isdir(os.path.join(base_video_dir, d))]
                      if subdirs:
@@ -234,7 +409,7 @@ class DynamicScene{scene_index}(Scene):
                 if f.endswith('.mp4'):
                     # Move to TEMP_DIR root to match other logic
                     src = os.path.join(output_dir, f)
-                    dst = os.path.join(settings.TEMP_DIR, f"{filename}_{f}")
+                    dst = os.path.join(settings.TEMP_DIR, f"{output_prefix}custom_{timestamp}_{f}")
                     os.rename(src, dst)
                     video_files.append(dst)
             
@@ -250,20 +425,6 @@ class DynamicScene{scene_index}(Scene):
             if os.path.exists(temp_file):
                 os.remove(temp_file)
 
-    def render_scenes(self, animation_ir: AnimationIR) -> list[str]:
-        """
-        Render all scenes from IR.
-        Returns list of video file paths.
-        """
-        video_files = []
-        style = animation_ir.style or "default"
-        
-        for i, scene in enumerate(animation_ir.scenes):
-            video_file = self.render_scene(scene, i, style)
-            video_files.append(video_file)
-        
-        return video_files
-    
     def generate_full_code(self, animation_ir: AnimationIR) -> str:
         """
         Generate complete Manim Python code for all scenes.
@@ -0,0 +1,175 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+from .temp_gc_service import evict_lru, scan_files
+
+T = TypeVar("T")
+
+_QUOTED = re.compile(r"(\"[^\"]*\"|'[^']*')")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Normalize a user prompt for cache keys: unicode, whitespace and trailing
+    punctuation are folded, and case is folded outside quoted text (quoted
+    text usually ends up on screen, so its case is kept).
+    """
+    text = " ".join(unicodedata.normalize("NFC", prompt).split()).rstrip(".!?")
+    parts = _QUOTED.split(text)
+    return "".join(
+        part if i % 2 else part.casefold()
+        for i, part in enumerate(parts)
+    ).strip()
+
+
+class PromptCache:
+    """
+    Shared, size-bounded cache of Gemini response text on disk.
+    Entries expire after ttl_seconds; least-recently-used entries are evicted
+    once the directory exceeds max_bytes (tracked with a byte counter, so
+    writes under budget don't scan it). Concurrent misses for the same key
+    within a worker are coalesced into one model call.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: float, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._size_lock = threading.Lock()
+        self._size_bytes = sum(size for _, size, _ in scan_files(self.cache_dir))
+
+    def key(self, **parts: Any) -> str:
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - entry.get("created_at", 0) > self.ttl_seconds:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        os.utime(path)  # mark as recently used for LRU eviction
+        return entry.get("text")
+
+    def put(self, key: str, text: str) -> None:
+        """Write an entry atomically; evict once the size budget is exceeded"""
+        path = self.path_for(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        data = json.dumps({"created_at": time.time(), "text": text}).encode("utf-8")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        with self._size_lock:
+            self._size_bytes += len(data) - replaced
+            if self._size_bytes > self.max_bytes:
+                _, _, self._size_bytes = evict_lru(self.cache_dir, self.max_bytes, max_age_seconds=self.ttl_seconds)
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """The in-flight generation of key in this worker, if any; resolves to its text"""
+        pending = self.inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+        return pending
+
+    @asynccontextmanager
+    async def generating(self, key: str) -> AsyncIterator[Callable[[str], Awaitable[None]]]:
+        """
+        Claim a miss: until the block exits, join(key) returns a future for
+        its result instead of letting another caller hit the model. Call the
+        yielded store(text) with text that parsed; it is cached and handed
+        to the waiters. Leaving without storing fails them.
+        """
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+
+        async def store(text: str) -> None:
+            try:
+                await asyncio.to_thread(self.put, key, text)
+            except OSError as e:
+                print(f"Prompt cache write failed: {str(e)}")
+            future.set_result(text)
+
+        try:
+            yield store
+            if not future.done():
+                raise RuntimeError("Generation ended without a response")
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e if isinstance(e, Exception) else RuntimeError("Generation cancelled"))
+                future.exception()  # waiters re-raise; avoid "never retrieved" warnings
+            raise
+        finally:
+            self.inflight.pop(key, None)
+
+    async def get_or_generate(
+        self,
+        key: str,
+        generate: Callable[[], Awaitable[str]],
+        parse: Callable[[str], T],
+        use_cache: bool = True,
+    ) -> T:
+        """
+        Return parse(text) for a cached or freshly generated response.
+        Only responses that parse are stored. With use_cache=False the cache
+        is neither read nor written.
+        """
+        if not (self.enabled and use_cache):
+            return parse(await generate())
+
+        text = await asyncio.to_thread(self.get, key)
+        if text is not None:
+            self.hits += 1
+            return parse(text)
+
+        pending = self.join(key)
+        if pending is not None:
+            return parse(await asyncio.shield(pending))
+
+        async with self.generating(key) as store:
+            text = await generate()
+            result = parse(text)
+            await store(text)
+            return result
+
+    def get_metrics(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "inflight": len(self.inflight),
+        }
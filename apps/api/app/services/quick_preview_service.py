@@ -0,0 +1,194 @@
+import asyncio
+import hashlib
+import json
+import math
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Optional
+from ..models import AnimationIR
+from .manim_service import ManimService
+from .video_service import VideoService
+from .ir_timeline import schedule_scene, scene_length
+from .temp_gc_service import evict_lru
+from ..config import get_settings
+
+settings = get_settings()
+
+QUICK_PREVIEW_FORMATS = {"webp": ".webp", "sprite": ".jpg"}
+
+
+def preview_key(animation_ir: AnimationIR, kind: str, width: int, height: int, fps: int) -> str:
+    """Hash of everything that changes the preview's pixels (audio and narration do not)"""
+    ir_json = animation_ir.model_dump_json(exclude={"audio": True, "scenes": {"__all__": {"narration"}}})
+    payload = f"{ir_json}|{kind}|{width}x{height}@{fps}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class QuickPreviewService:
+    """
+    Cheap "did my edit work?" previews: the animation rendered at a tiny
+    resolution and frame rate, delivered as a looping animated WebP or as a
+    JPEG sprite sheet plus a frame index. Results are cached on disk by IR
+    hash, so an unchanged animation is never rendered twice.
+    """
+
+    def __init__(self):
+        self.manim_service = ManimService()
+        self.video_service = VideoService()
+        self.cache_dir = settings.QUICK_PREVIEW_CACHE_DIR
+        self.max_bytes = settings.QUICK_PREVIEW_CACHE_MAX_MB * 1024 * 1024
+        self.slots = threading.BoundedSemaphore(settings.QUICK_PREVIEW_MAX_CONCURRENCY)
+        self._locks: dict[str, list] = {}  # key -> [lock, threads using it]
+        self._locks_guard = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @contextmanager
+    def _lock_for(self, key: str):
+        """Per-key lock so concurrent requests for one preview render once; dropped when no thread needs it"""
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def path_for(self, key: str, kind: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}{QUICK_PREVIEW_FORMATS[kind]}")
+
+    def index_path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def find(self, name: str) -> Optional[str]:
+        """Cached preview file by its public name (key plus extension)"""
+        key, ext = os.path.splitext(name)
+        if len(key) != 64 or ext not in QUICK_PREVIEW_FORMATS.values():
+            return None
+        path = os.path.join(self.cache_dir, f"{key}{ext}")
+        return path if os.path.exists(path) else None
+
+    def _fps_for(self, animation_ir: AnimationIR) -> int:
+        """Configured fps, lowered for long animations so the frame count stays bounded"""
+        length = sum(scene_length(scene, schedule_scene(scene)) for scene in animation_ir.scenes)
+        budget = settings.QUICK_PREVIEW_MAX_FRAMES / max(length, 1.0)
+        return max(1, min(settings.QUICK_PREVIEW_FPS, int(budget)))
+
+    def get_preview(
+        self,
+        animation_ir: AnimationIR,
+        loop: asyncio.AbstractEventLoop,
+        kind: str = "webp",
+        on_miss: Optional[Callable[[], None]] = None,
+    ) -> tuple[str, str, Optional[dict]]:
+        """
+        Return (key, path, frame index) for the preview, rendering it on a
+        cache miss. The frame index is only set for sprite sheets.
+        Blocking; call it from a worker thread. Renders go through the
+        render scheduler on `loop` (the app's event loop). on_miss is
+        called before rendering (e.g. to charge a rate limit); an exception
+        from it is raised instead of rendering.
+        """
+        if kind not in QUICK_PREVIEW_FORMATS:
+            raise ValueError(f"Unknown preview format: {kind}")
+
+        width, height = settings.QUICK_PREVIEW_WIDTH, settings.QUICK_PREVIEW_HEIGHT
+        fps = self._fps_for(animation_ir)
+        key = preview_key(animation_ir, kind, width, height, fps)
+
+        cached = self._get_cached(key, kind)
+        if cached:
+            self.hits += 1
+            return (key, *cached)
+
+        with self._lock_for(key):
+            cached = self._get_cached(key, kind)
+            if cached:
+                self.hits += 1
+                return (key, *cached)
+
+            if on_miss:
+                on_miss()
+            self.misses += 1
+            with self.slots:
+                path, index = self._render(animation_ir, loop, key, kind, width, height, fps)
+            evict_lru(self.cache_dir, self.max_bytes)
+            return key, path, index
+
+    def _get_cached(self, key: str, kind: str) -> Optional[tuple[str, Optional[dict]]]:
+        path = self.path_for(key, kind)
+        if not os.path.exists(path):
+            return None
+
+        index = None
+        if kind == "sprite":
+            try:
+                with open(self.index_path_for(key), "r", encoding="utf-8") as f:
+                    index = json.load(f)
+            except (OSError, ValueError):
+                return None  # sheet without its index: render again
+            os.utime(self.index_path_for(key))
+        os.utime(path)  # mark as recently used for LRU eviction
+        return path, index
+
+    def _render(
+        self,
+        animation_ir: AnimationIR,
+        loop: asyncio.AbstractEventLoop,
+        key: str,
+        kind: str,
+        width: int,
+        height: int,
+        fps: int,
+    ) -> tuple[str, Optional[dict]]:
+        units = self.manim_service.plan_animation(animation_ir)
+        video_files = asyncio.run_coroutine_threadsafe(
+            self.manim_service.render_planned(f"quick_{key}", units, (width, height), fps), loop
+        ).result()
+        video_path = os.path.join(settings.TEMP_DIR, f"quick_{uuid.uuid4().hex}.mp4")
+        video_path = self.video_service.merge_videos(video_files, video_path)
+
+        path = self.path_for(key, kind)
+        tmp_path = f"{os.path.splitext(path)[0]}.{uuid.uuid4().hex[:8]}.tmp{QUICK_PREVIEW_FORMATS[kind]}"
+        try:
+            if kind == "webp":
+                self.video_service.to_animated_webp(video_path, tmp_path)
+                os.replace(tmp_path, path)
+                return path, None
+
+            frames = self.video_service.count_frames(video_path)
+            columns = math.ceil(math.sqrt(frames))
+            rows = math.ceil(frames / columns)
+            self.video_service.to_sprite_sheet(video_path, tmp_path, columns, rows)
+            index = {
+                "frames": frames,
+                "fps": fps,
+                "frame_width": width,
+                "frame_height": height,
+                "columns": columns,
+                "rows": rows,
+            }
+            # Index first: a sheet is only served once its index exists
+            with open(self.index_path_for(key), "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(tmp_path, path)
+            return path, index
+        finally:
+            for leftover in (video_path, tmp_path):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+
+    def get_metrics(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
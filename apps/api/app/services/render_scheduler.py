@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+from ..config import get_settings
+
+settings = get_settings()
+
+URGENT, NORMAL, BACKGROUND = 0, 1, 2
+
+
+@dataclass
+class RenderTask:
+    job_id: str
+    fn: Callable
+    args: tuple
+    cost: float
+    tier: int
+    future: asyncio.Future
+    seq: int
+    submitted_at: float = field(default_factory=time.monotonic)
+
+
+class RenderScheduler:
+    """
+    One pool of render workers shared by every job. Jobs hand in their
+    render units (scenes or scene segments) and follow-up work (the merge)
+    as tasks; whenever a worker frees up, the next task is picked globally:
+    urgent work first (merges finish a job), then the task whose job has the
+    least work left, so small jobs are not stuck behind a 20-scene render.
+    Waiting time is credited against a job's remaining work (`aging`
+    seconds per second waited) so big jobs still progress. Background work
+    (speculative renders) only runs when nothing else is waiting.
+    """
+
+    def __init__(self, workers: int, aging: float):
+        self.workers = workers
+        self.aging = aging
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self.pending: list[RenderTask] = []
+        self.running = 0
+        self.remaining: dict[str, float] = {}  # job_id -> cost of its unfinished tasks
+        self._seq = itertools.count()
+        self.completed = 0
+        self.failed = 0
+
+    def _priority(self, task: RenderTask, now: float) -> tuple:
+        waited = now - task.submitted_at
+        return (task.tier, self.remaining.get(task.job_id, 0.0) - self.aging * waited, task.seq)
+
+    def _dispatch(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.running < self.workers and self.pending:
+            now = time.monotonic()
+            task = min(self.pending, key=lambda t: self._priority(t, now))
+            self.pending.remove(task)
+            self.running += 1
+            work = loop.run_in_executor(self.executor, task.fn, *task.args)
+            work.add_done_callback(lambda done, task=task: self._finished(task, done))
+
+    def _finished(self, task: RenderTask, done: asyncio.Future) -> None:
+        self.running -= 1
+        self._settle(task)
+        if done.exception():
+            self.failed += 1
+            if not task.future.done():
+                task.future.set_exception(done.exception())
+        else:
+            self.completed += 1
+            if not task.future.done():
+                task.future.set_result(done.result())
+        self._dispatch()
+
+    def _settle(self, task: RenderTask) -> None:
+        left = self.remaining.get(task.job_id, 0.0) - task.cost
+        if left <= 1e-9 and not any(t.job_id == task.job_id for t in self.pending):
+            self.remaining.pop(task.job_id, None)
+        else:
+            self.remaining[task.job_id] = max(left, 0.0)
+
+    def _submit(self, job_id: str, fn: Callable, args: tuple, cost: float, tier: int) -> RenderTask:
+        task = RenderTask(
+            job_id=job_id,
+            fn=fn,
+            args=args,
+            cost=cost,
+            tier=tier,
+            future=asyncio.get_running_loop().create_future(),
+            seq=next(self._seq),
+        )
+        self.remaining[job_id] = self.remaining.get(job_id, 0.0) + cost
+        self.pending.append(task)
+        return task
+
+    def _drop(self, tasks: list[RenderTask]) -> None:
+        """Forget tasks that have not started (their job gave up on them)"""
+        for task in tasks:
+            if task in self.pending:
+                self.pending.remove(task)
+                self._settle(task)
+            task.future.cancel()
+
+    async def run_all(
+        self,
+        job_id: str,
+        calls: list[tuple[Callable, tuple, float]],
+        tier: int = NORMAL,
+    ) -> list[Any]:
+        """
+        Run (fn, args, cost) calls for a job on the shared pool and return
+        their results in order. All calls are queued before any is
+        dispatched, so the job is ranked by its full remaining work. If one
+        fails or the caller is cancelled, the job's calls that have not
+        started are dropped (running ones finish in their threads).
+        """
+        tasks = [self._submit(job_id, fn, args, cost, tier) for fn, args, cost in calls]
+        self._dispatch()
+        try:
+            return await asyncio.gather(*(task.future for task in tasks))
+        except BaseException:
+            self._drop(tasks)
+            raise
+
+    async def run(
+        self,
+        job_id: str,
+        fn: Callable,
+        *args: Any,
+        cost: float = 0.0,
+        tier: int = NORMAL,
+    ) -> Any:
+        results = await self.run_all(job_id, [(fn, args, cost)], tier)
+        return results[0]
+
+    def cancel(self, job_id: str) -> int:
+        """
+        Drop a job's tasks that have not started, right away rather than when
+        its caller next runs (running ones finish in their threads). The
+        caller's run_all raises CancelledError. Returns how many were dropped.
+        """
+        tasks = [task for task in self.pending if task.job_id == job_id]
+        self._drop(tasks)
+        return len(tasks)
+
+    def backlog(self) -> int:
+        """Tasks waiting for a worker"""
+        return len(self.pending)
+
+    def get_metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "pending": len(self.pending),
+            "jobs": len(self.remaining),
+            "queued_seconds": round(sum(task.cost for task in self.pending), 1),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+render_scheduler = RenderScheduler(
+    workers=settings.RENDER_WORKERS or os.cpu_count() or 2,
+    aging=settings.RENDER_SCHEDULER_AGING,
+)
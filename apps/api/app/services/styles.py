@@ -0,0 +1,27 @@
+# Style Presets
+STYLES = {
+    "default": {
+        "bg": None, # Use scene default
+        "text": "#ffffff",
+        "math": "#ffffff",
+        "primary": "#ffffff"
+    },
+    "cyberpunk": {
+        "bg": "#050510",
+        "text": "#00ff9f", # Neon Green
+        "math": "#ff0055", # Neon Red/Pink
+        "primary": "#00dbff" # Neon Blue
+    },
+    "chalkboard": {
+        "bg": "#2b3d2b", # Dark Green
+        "text": "#eeeeee", # Chalk white
+        "math": "#dddddd",
+        "primary": "#ffffff"
+    },
+    "light": {
+        "bg": "#ffffff",
+        "text": "#000000",
+        "math": "#000000",
+        "primary": "#000000"
+    }
+}
@@ -0,0 +1,320 @@
+import hashlib
+import html
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+from ..models import AnimationIR, AnimationObject, Scene
+from .ir_timeline import schedule_scene, scene_length
+from .styles import STYLES
+from .temp_gc_service import evict_lru
+from ..config import get_settings
+
+settings = get_settings()
+
+# Manim's frame is 8 units tall at 16:9; one font point is 1/960 of the frame width
+FRAME_HEIGHT = 8.0
+FRAME_WIDTH = FRAME_HEIGHT * 16 / 9
+UNITS_PER_POINT = FRAME_WIDTH / 960
+MATH_FONT_SIZE = 48  # MathTex default; the code generator does not pass font_size
+TEX_POINT_SIZE = 10  # LaTeX document font size the glyph outlines are set at
+STROKE_WIDTH = 0.04
+
+# Manim's default rate function (smooth) is what every play uses today
+TIMING = "cubic-bezier(0.45, 0, 0.55, 1)"
+RESET_SECONDS = 0.001  # separates a held state from the restart of the next play
+
+TEX_TEMPLATE = r"""\documentclass[preview]{standalone}
+\usepackage{amsmath}
+\usepackage{amssymb}
+\begin{document}
+\begin{align*}
+%s
+\end{align*}
+\end{document}
+"""
+
+
+def _num(value: float) -> str:
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return "0" if text in ("", "-0") else text
+
+
+class LatexSvgCache:
+    """
+    Persistent, size-bounded cache of LaTeX expressions rendered to SVG
+    glyph outlines (latex + dvisvgm), so previews never need a TeX run for
+    an expression seen before.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.failed: set[str] = set()  # expressions that do not compile, per process
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, expression: str) -> str:
+        payload = TEX_TEMPLATE % expression.strip()
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.svg")
+
+    def get_svg(self, expression: str) -> Optional[str]:
+        """SVG markup for an expression, or None if LaTeX is unavailable or fails"""
+        key = self.key(expression)
+        path = self.path_for(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                svg = f.read()
+            os.utime(path)  # mark as recently used for LRU eviction
+            return svg
+        except OSError:
+            pass
+
+        if key in self.failed:
+            return None
+        with self._lock:
+            try:
+                svg = self._compile(expression)
+            except RuntimeError as e:
+                print(f"LaTeX preview failed: {str(e)}")
+                self.failed.add(key)
+                return None
+
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(svg)
+            os.replace(tmp_path, path)
+            evict_lru(self.cache_dir, self.max_bytes)
+            return svg
+
+    def _compile(self, expression: str) -> str:
+        os.makedirs(settings.TEMP_DIR, exist_ok=True)
+        workdir = tempfile.mkdtemp(prefix="tex_", dir=settings.TEMP_DIR)
+        try:
+            tex_path = os.path.join(workdir, "expr.tex")
+            with open(tex_path, "w", encoding="utf-8") as f:
+                f.write(TEX_TEMPLATE % expression.strip())
+
+            commands = [
+                [settings.LATEX_BINARY, "-interaction=batchmode", "-halt-on-error", "expr.tex"],
+                [settings.DVISVGM_BINARY, "--no-fonts", "--exact-bbox", "-o", "expr.svg", "expr.dvi"],
+            ]
+            for cmd in commands:
+                try:
+                    subprocess.run(cmd, cwd=workdir, check=True, capture_output=True, timeout=30)
+                except FileNotFoundError:
+                    raise RuntimeError(f"{cmd[0]} is not installed")
+                except subprocess.CalledProcessError as e:
+                    raise RuntimeError(f"{cmd[0]} failed: {e.stdout.decode(errors='replace')[-500:]}")
+                except subprocess.TimeoutExpired:
+                    raise RuntimeError(f"{cmd[0]} timed out")
+
+            with open(os.path.join(workdir, "expr.svg"), "r", encoding="utf-8") as f:
+                return f.read()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+class SvgPreviewService:
+    """
+    Compiles an AnimationIR into a self-contained animated SVG (CSS
+    keyframes) that browsers play without any render. Timing follows the
+    rendered video: plays run back to back exactly as ManimService emits
+    them. Shapes, text and LaTeX are approximations of Manim's output.
+    """
+
+    def __init__(self):
+        self.latex = LatexSvgCache(
+            settings.LATEX_SVG_CACHE_DIR,
+            settings.LATEX_SVG_CACHE_MAX_MB * 1024 * 1024,
+        )
+
+    def compile(self, animation_ir: AnimationIR, loop: bool = True) -> str:
+        style = STYLES.get(animation_ir.style or "default", STYLES["default"])
+        scenes = [(scene, schedule_scene(scene)) for scene in animation_ir.scenes]
+        lengths = [scene_length(scene, timeline) for scene, timeline in scenes]
+        total = sum(lengths)
+
+        css = []
+        body = []
+        offset = 0.0
+        for index, ((scene, timeline), length) in enumerate(zip(scenes, lengths)):
+            scene_css, scene_svg = self._compile_scene(
+                scene, timeline, index, offset, length, total, style
+            )
+            css.extend(scene_css)
+            body.append(scene_svg)
+            offset += length
+
+        iterations = "infinite" if loop else "1"
+        css.insert(0, (
+            f".a{{animation-duration:{_num(total)}s;animation-iteration-count:{iterations};"
+            "animation-fill-mode:both;transform-box:view-box;transform-origin:0 0}"
+        ))
+        view_box = f"{_num(-FRAME_WIDTH / 2)} {_num(-FRAME_HEIGHT / 2)} {_num(FRAME_WIDTH)} {_num(FRAME_HEIGHT)}"
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+            f'viewBox="{view_box}" width="960" height="540" data-duration="{_num(total)}">'
+            f"<style>{''.join(css)}</style>{''.join(body)}</svg>"
+        )
+
+    def _compile_scene(
+        self,
+        scene: Scene,
+        timeline: list,
+        index: int,
+        offset: float,
+        length: float,
+        total: float,
+        style: dict,
+    ) -> tuple[list[str], str]:
+        def pct(t: float) -> str:
+            return f"{_num(100 * t / total)}%"
+
+        scene_class = f"s{index}"
+        # Scenes are shown one after another; step timing keeps the switch instant
+        frames = []
+        if offset > 0:
+            frames.append("0%{visibility:hidden}")
+        frames.append(f"{pct(offset)}{{visibility:visible}}")
+        if offset + length < total:
+            frames.append(f"{pct(offset + length)}{{visibility:hidden}}100%{{visibility:hidden}}")
+        css = [
+            f"@keyframes {scene_class}{{{''.join(frames)}}}",
+            f".{scene_class}{{animation-name:{scene_class};animation-timing-function:step-end}}",
+        ]
+
+        background = style["bg"] or scene.background_color
+        parts = [
+            f'<g class="a {scene_class}">',
+            f'<rect x="{_num(-FRAME_WIDTH / 2)}" y="{_num(-FRAME_HEIGHT / 2)}" '
+            f'width="{_num(FRAME_WIDTH)}" height="{_num(FRAME_HEIGHT)}" fill="{html.escape(background)}"/>',
+        ]
+        for obj_index, obj in enumerate(scene.objects):
+            plays = [item for item in timeline if item.obj is obj]
+            if not plays:
+                continue  # never played, so never on screen
+            name = f"o{index}_{obj_index}"
+            css.append(self._object_keyframes(name, obj, plays, offset, total))
+            parts.append(f'<g class="a {name}">{self._object_markup(obj, name)}</g>')
+        parts.append("</g>")
+        return css, "".join(parts)
+
+    def _object_keyframes(self, name: str, obj: AnimationObject, plays: list, offset: float, total: float) -> str:
+        state = {
+            "x": obj.position[0], "y": obj.position[1], "scale": 1.0, "angle": 0.0,
+            "opacity": 0.0, "reveal": 1.0,
+        }
+        frames: list[tuple[float, dict, str]] = [(-offset, dict(state), "step-end")]
+
+        for item in plays:
+            anim = item.anim
+            start, end = item.start, item.start + anim.duration
+
+            # Write/Create/FadeIn restart from nothing; hold the old state until then
+            before = dict(state)
+            if anim.type in ("write", "create"):
+                state.update(opacity=1.0, reveal=0.0)
+            elif anim.type == "fade_in":
+                state.update(opacity=0.0, reveal=1.0)
+            elif state["opacity"] == 0.0 and anim.type != "fade_out":
+                state["opacity"] = 1.0  # .animate and Rotate add the object to the scene
+            if state != before:
+                frames.append((start, before, "step-end"))
+                start += RESET_SECONDS
+            frames.append((start, dict(state), TIMING))
+
+            if anim.type in ("write", "create"):
+                state["reveal"] = 1.0
+            elif anim.type == "fade_in":
+                state["opacity"] = 1.0
+            elif anim.type == "fade_out":
+                state["opacity"] = 0.0
+            elif anim.type == "move_to":
+                state["x"], state["y"] = anim.target_position[0], anim.target_position[1]
+            elif anim.type == "scale":
+                state["scale"] *= anim.scale_factor or 1.0
+            elif anim.type == "rotate":
+                state["angle"] += anim.angle or 0.0
+            frames.append((end, dict(state), "step-end"))
+        frames.append((total - offset, dict(state), "step-end"))
+
+        keyframes = []
+        for t, frame, timing in frames:
+            percent = 100 * min(max(offset + t, 0.0), total) / total
+            props = [
+                f"opacity:{_num(frame['opacity'])}",
+                f"transform:translate({_num(frame['x'])}px,{_num(-frame['y'])}px) "
+                f"rotate({_num(-frame['angle'])}deg) scale({_num(frame['scale'])})",
+                # Reveal sweeps the right edge across the object, with slack for strokes
+                f"clip-path:inset(-50% {_num(100 - 150 * frame['reveal'])}% -50% -50%)",
+                f"animation-timing-function:{timing}",
+            ]
+            keyframes.append(f"{_num(percent)}%{{{';'.join(props)}}}")
+        return f"@keyframes {name}{{{''.join(keyframes)}}}.{name}{{animation-name:{name}}}"
+
+    def _object_markup(self, obj: AnimationObject, name: str) -> str:
+        color = html.escape(obj.color)
+        stroke = f'stroke="{color}" stroke-width="{STROKE_WIDTH}" fill="{color}" fill-opacity="{_num(obj.fill_opacity)}"'
+
+        if obj.type == "text":
+            size = (obj.font_size or 36) * UNITS_PER_POINT
+            return (
+                f'<text x="0" y="0" text-anchor="middle" dominant-baseline="central" '
+                f'font-family="sans-serif" font-size="{_num(size)}" fill="{color}">'
+                f"{html.escape(obj.content or '')}</text>"
+            )
+        if obj.type == "latex":
+            return self._latex_markup(obj.content or "x", color, name)
+        if obj.type == "shape":
+            if obj.shape == "circle":
+                return f'<circle cx="0" cy="0" r="{_num(obj.radius or 1.0)}" {stroke}/>'
+            if obj.shape in ("square", "rectangle"):
+                if obj.shape == "square":
+                    width = height = obj.side_length or 2.0
+                else:
+                    width, height = obj.width or 2.0, obj.height or 1.0
+                return (
+                    f'<rect x="{_num(-width / 2)}" y="{_num(-height / 2)}" '
+                    f'width="{_num(width)}" height="{_num(height)}" {stroke}/>'
+                )
+            if obj.shape == "triangle":
+                # Manim's Triangle: equilateral, circumradius 1, pointing up
+                return f'<polygon points="0,-1 0.866,0.5 -0.866,0.5" {stroke}/>'
+
+        return f'<circle cx="0" cy="0" r="0.08" fill="{color}"/>'
+
+    def _latex_markup(self, expression: str, color: str, name: str) -> str:
+        size = MATH_FONT_SIZE * UNITS_PER_POINT
+        svg = self.latex.get_svg(expression)
+        if not svg:
+            return (
+                f'<text x="0" y="0" text-anchor="middle" dominant-baseline="central" '
+                f'font-family="serif" font-style="italic" font-size="{_num(size)}" fill="{color}">'
+                f"{html.escape(expression)}</text>"
+            )
+
+        root = re.search(r"<svg\b[^>]*>", svg)
+        width = re.search(r"""\bwidth=['"]([\d.]+)pt""", root.group(0)) if root else None
+        height = re.search(r"""\bheight=['"]([\d.]+)pt""", root.group(0)) if root else None
+        view_box = re.search(r"""\bviewBox=['"]([^'"]+)""", root.group(0)) if root else None
+        if not (width and height and view_box):
+            return f'<text x="0" y="0" text-anchor="middle" fill="{color}">{html.escape(expression)}</text>'
+
+        scale = size / TEX_POINT_SIZE
+        w, h = float(width.group(1)) * scale, float(height.group(1)) * scale
+        inner = svg[root.end():svg.rindex("</svg>")]
+        # Glyph ids repeat across expressions; keep them unique within the document
+        inner = re.sub(r"""\bid=(['"])""", rf"id=\1{name}-", inner)
+        inner = re.sub(r"""href=(['"])#""", rf"href=\1#{name}-", inner)
+        return (
+            f'<svg x="{_num(-w / 2)}" y="{_num(-h / 2)}" width="{_num(w)}" height="{_num(h)}" '
+            f'viewBox="{html.escape(view_box.group(1))}" overflow="visible">'
+            f'<g fill="{color}" stroke="none">{inner}</g></svg>'
+        )
@@ -0,0 +1,265 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Optional
+from ..config import get_settings
+
+settings = get_settings()
+
+# Path prefixes currently in use by active jobs -> pin count
+PINNED_PATHS: dict[str, int] = {}
+_pin_lock = threading.Lock()
+
+
+def pin_path(prefix: str) -> None:
+    """Protect every file whose path starts with prefix from collection"""
+    with _pin_lock:
+        PINNED_PATHS[prefix] = PINNED_PATHS.get(prefix, 0) + 1
+
+
+def unpin_path(prefix: str) -> None:
+    with _pin_lock:
+        count = PINNED_PATHS.get(prefix, 0) - 1
+        if count > 0:
+            PINNED_PATHS[prefix] = count
+        else:
+            PINNED_PATHS.pop(prefix, None)
+
+
+@contextmanager
+def in_use(*prefixes: str):
+    """Pin paths for the duration of a block"""
+    for prefix in prefixes:
+        pin_path(prefix)
+    try:
+        yield
+    finally:
+        for prefix in prefixes:
+            unpin_path(prefix)
+
+
+def is_pinned(path: str) -> bool:
+    with _pin_lock:
+        return any(path.startswith(prefix) for prefix in PINNED_PATHS)
+
+
+def scan_files(root: str, exclude: Iterable[str] = ()) -> list[tuple[str, int, float]]:
+    """Return (path, size, last_used) for every regular file under root"""
+    excluded = [os.path.abspath(p) for p in exclude]
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [
+            d for d in dirnames
+            if os.path.abspath(os.path.join(dirpath, d)) not in excluded
+        ]
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path, follow_symlinks=False)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, max(st.st_atime, st.st_mtime)))
+    return entries
+
+
+def evict_lru(
+    root: str,
+    budget_bytes: int,
+    max_age_seconds: Optional[float] = None,
+    min_age_seconds: float = 0,
+    exclude: Iterable[str] = (),
+) -> tuple[int, int, int]:
+    """
+    Delete expired files, then least-recently-used files until root fits
+    in budget_bytes. Pinned files and files younger than min_age_seconds are
+    never removed. Returns (files_evicted, bytes_evicted, bytes_remaining).
+    """
+    now = time.time()
+    entries = scan_files(root, exclude)
+    total = sum(size for _, size, _ in entries)
+    evicted_files = 0
+    evicted_bytes = 0
+
+    def removable(path: str, last_used: float) -> bool:
+        return now - last_used >= min_age_seconds and not is_pinned(path)
+
+    def remove(path: str, size: int) -> bool:
+        nonlocal total, evicted_files, evicted_bytes
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        total -= size
+        evicted_files += 1
+        evicted_bytes += size
+        return True
+
+    remaining = []
+    for path, size, last_used in entries:
+        expired = max_age_seconds is not None and now - last_used > max_age_seconds
+        if expired and removable(path, last_used):
+            remove(path, size)
+        else:
+            remaining.append((path, size, last_used))
+
+    if total > budget_bytes:
+        for path, size, last_used in sorted(remaining, key=lambda e: e[2]):
+            if total <= budget_bytes:
+                break
+            if removable(path, last_used):
+                remove(path, size)
+
+    _prune_empty_dirs(root, exclude)
+    return evicted_files, evicted_bytes, total
+
+
+def evict_lru_dirs(root: str, budget_bytes: int, min_age_seconds: float = 0) -> tuple[int, int, int]:
+    """
+    Delete root's least-recently-used subdirectories, whole, until root fits
+    in budget_bytes. A directory counts as used when it was modified or
+    touched, or any file in it was used. Pinned directories and ones used within min_age_seconds are kept.
+    Returns (files_evicted, bytes_evicted, bytes_remaining).
+    """
+    now = time.time()
+    dirs = []
+    for entry in os.scandir(root):
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        # Directory mtime, not atime: scanning a directory updates its atime
+        mtime = entry.stat(follow_symlinks=False).st_mtime
+        files = scan_files(entry.path)
+        last_used = max([mtime] + [used for _, _, used in files])
+        dirs.append((entry.path, len(files), sum(size for _, size, _ in files), last_used))
+
+    total = sum(size for _, _, size, _ in dirs)
+    evicted_files = 0
+    evicted_bytes = 0
+    for path, count, size, last_used in sorted(dirs, key=lambda d: d[3]):
+        if total <= budget_bytes:
+            break
+        if now - last_used < min_age_seconds or is_pinned(path):
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        evicted_files += count
+        evicted_bytes += size
+    return evicted_files, evicted_bytes, total
+
+
+def _prune_empty_dirs(root: str, exclude: Iterable[str] = ()) -> None:
+    excluded = {os.path.abspath(p) for p in exclude}
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        if os.path.abspath(dirpath) == os.path.abspath(root):
+            continue
+        if os.path.abspath(dirpath) in excluded or is_pinned(dirpath):
+            continue
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass
+
+
+class TempDirGarbageCollector:
+    """
+    Background collector for settings.TEMP_DIR.
+    Removes leftovers older than the age policy and evicts LRU files when the
+    directory grows past its byte budget. Files pinned by active jobs are kept.
+    """
+
+    def __init__(self):
+        self.root = settings.TEMP_DIR
+        self.budget_bytes = settings.TEMP_GC_BUDGET_MB * 1024 * 1024
+        self.max_age_seconds = settings.TEMP_GC_MAX_AGE_HOURS * 3600
+        self.min_age_seconds = settings.TEMP_GC_MIN_AGE_SECONDS
+        self.interval_seconds = settings.TEMP_GC_INTERVAL_SECONDS
+        self.exclude_dirs: list[str] = []
+        self.caches: list[tuple[str, int]] = []
+        self.dir_caches: list[tuple[str, int]] = []
+        self.stats = {
+            "runs": 0,
+            "last_run_at": None,
+            "last_run_evicted_files": 0,
+            "last_run_evicted_bytes": 0,
+            "total_evicted_bytes": 0,
+        }
+        os.makedirs(self.root, exist_ok=True)
+
+    def exclude(self, path: str) -> None:
+        """Never collect inside path (e.g. a cache that manages its own budget)"""
+        self.exclude_dirs.append(path)
+
+    def add_cache(self, path: str, budget_bytes: int) -> None:
+        """Also keep a cache directory under its own budget on every pass (LRU only, no age limit)"""
+        self.caches.append((path, budget_bytes))
+        self.exclude(path)
+
+    def add_dir_cache(self, path: str, budget_bytes: int) -> None:
+        """Like add_cache, but evict path's subdirectories whole"""
+        self.dir_caches.append((path, budget_bytes))
+        self.exclude(path)
+
+    def collect(self) -> dict:
+        """Run one collection pass"""
+        files, freed, _ = evict_lru(
+            self.root,
+            self.budget_bytes,
+            max_age_seconds=self.max_age_seconds,
+            min_age_seconds=self.min_age_seconds,
+            exclude=self.exclude_dirs,
+        )
+        for path, budget_bytes in self.caches:
+            cache_files, cache_freed, _ = evict_lru(path, budget_bytes, min_age_seconds=self.min_age_seconds)
+            files += cache_files
+            freed += cache_freed
+        for path, budget_bytes in self.dir_caches:
+            cache_files, cache_freed, _ = evict_lru_dirs(path, budget_bytes, min_age_seconds=self.min_age_seconds)
+            files += cache_files
+            freed += cache_freed
+        self.stats["runs"] += 1
+        self.stats["last_run_at"] = datetime.utcnow().isoformat()
+        self.stats["last_run_evicted_files"] = files
+        self.stats["last_run_evicted_bytes"] = freed
+        self.stats["total_evicted_bytes"] += freed
+        return self.get_metrics()
+
+    async def run_forever(self):
+        """Collect every interval_seconds without blocking the event loop"""
+        while True:
+            try:
+                await asyncio.to_thread(self.collect)
+            except Exception as e:
+                print(f"TEMP_DIR garbage collection failed: {str(e)}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def get_metrics(self) -> dict:
+        """Disk-pressure metrics for TEMP_DIR and its filesystem"""
+        entries = scan_files(self.root, self.exclude_dirs)
+        used = sum(size for _, size, _ in entries)
+        disk = shutil.disk_usage(self.root)
+        budget_percent = 100 * used / self.budget_bytes if self.budget_bytes else 0.0
+        disk_free_percent = 100 * disk.free / disk.total if disk.total else 0.0
+
+        if budget_percent >= 100 or disk_free_percent < 5:
+            pressure = "critical"
+        elif budget_percent >= 80 or disk_free_percent < 15:
+            pressure = "high"
+        else:
+            pressure = "ok"
+
+        return {
+            "temp_dir": self.root,
+            "temp_dir_bytes": used,
+            "temp_dir_files": len(entries),
+            "budget_bytes": self.budget_bytes,
+            "budget_used_percent": round(budget_percent, 1),
+            "pinned_paths": len(PINNED_PATHS),
+            "disk_total_bytes": disk.total,
+            "disk_free_bytes": disk.free,
+            "disk_free_percent": round(disk_free_percent, 1),
+            "pressure": pressure,
+            **self.stats,
+        }
@@ -1,8 +1,106 @@
+import math
+import re
+from collections import Counter
 from typing import List, Optional
 from ..models import AnimationTemplate, AnimationIR, Scene, AnimationObject, Animation
+from ..config import get_settings
+from .edit_intents import COLOR_NAMES
+
+settings = get_settings()
 
 TEMPLATES: dict[str, AnimationTemplate] = {}
 
+# Words that say nothing about which template is meant
+STOPWORDS = {
+    "a", "an", "the", "for", "with", "and", "of", "to", "in", "on", "my", "our", "me", "i",
+    "make", "create", "generate", "build", "show", "want", "need", "please", "give",
+    "animation", "animated", "video", "clip", "simple", "quick", "nice", "cool", "some",
+    "that", "this", "it", "is", "be", "can", "you", "us",
+    "called", "named", "titled", "saying", "reading", "say",
+}
+
+# Named values in a prompt: quoted strings, "for Acme", "titled Welcome", "steps: a, b, c"
+# ("for my/our/the ..." says what the video is for, not what it shows)
+_QUOTED = re.compile(r"[\"\u201c]([^\"\u201d]+)[\"\u201d]|'([^']+)'")
+_DETERMINERS = r"(?:my|our|your|his|her|their|its|the|a|an|this|that|these|those)\b"
+# A prompt asking for one thing after another is more than a single template
+_SEQUENCE_WORDS = r"(?:then|after that|afterwards|followed by|next)\b"
+_SEQUENCE = re.compile(r"\b" + _SEQUENCE_WORDS, re.IGNORECASE)
+_NAMED = re.compile(
+    r"\b(?:for(?!\s+" + _DETERMINERS + r")|called|named|titled|saying|reading|that says|with the text|with text)\s+"
+    r"(?P<value>[^,.;:!?]+?)(?=\s+(?:with|on|in|using|and|that|" + _SEQUENCE_WORDS + r")\b|[,.;:!?]|$)",
+    re.IGNORECASE
+)
+_PURPOSE = re.compile(r"\bfor\s+" + _DETERMINERS + r"[^,.;:!?]*", re.IGNORECASE)
+_LISTED = re.compile(r":\s*(?P<items>[^.;!?]+)$")
+_BACKGROUND = re.compile(
+    r"\b(?:on\s+an?\s+|with\s+an?\s+)?(?P<color>" + "|".join(COLOR_NAMES) + r")\s+background\b",
+    re.IGNORECASE
+)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase word tokens without stopwords; plural "s" is stripped"""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+class TemplateIndex:
+    """TF-IDF index over template names, descriptions, categories and keywords"""
+
+    # Field weights (repeat counts) when building a template's document
+    FIELD_WEIGHTS = {"name": 3, "keywords": 2, "category": 1, "description": 1}
+
+    def __init__(self, templates: List[AnimationTemplate]):
+        documents = {}
+        for template in templates:
+            tokens = []
+            fields = {
+                "name": template.name,
+                "keywords": " ".join(template.keywords),
+                "category": template.category,
+                "description": template.description,
+            }
+            for field, text in fields.items():
+                tokens += tokenize(text) * self.FIELD_WEIGHTS[field]
+            documents[template.id] = Counter(tokens)
+
+        count = len(documents)
+        doc_freq = Counter(token for counts in documents.values() for token in counts)
+        self.idf = {
+            token: math.log((count + 1) / (freq + 1)) + 1
+            for token, freq in doc_freq.items()
+        }
+        self.default_idf = math.log(count + 1) + 1  # unseen query words count against a match
+        self.vectors = {
+            template_id: self._vector(counts)
+            for template_id, counts in documents.items()
+        }
+
+    def _vector(self, counts: Counter) -> dict[str, float]:
+        total = sum(counts.values()) or 1
+        vector = {
+            token: (n / total) * self.idf.get(token, self.default_idf)
+            for token, n in counts.items()
+        }
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {token: v / norm for token, v in vector.items()}
+
+    def search(self, text: str) -> list[tuple[str, float]]:
+        """Return (template_id, cosine score) pairs, best first"""
+        query = self._vector(Counter(tokenize(text)))
+        scores = [
+            (template_id, sum(weight * vector.get(token, 0.0) for token, weight in query.items()))
+            for template_id, vector in self.vectors.items()
+        ]
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
 
 class TemplateService:
     def __init__(self):
@@ -17,6 +115,7 @@ class TemplateService:
             name="Logo Reveal",
             description="Simple logo reveal animation with fade and scale",
             category="logo",
+            keywords=["logo", "brand", "company", "reveal", "intro", "emblem"],
             is_premium=False,
             animation_ir=AnimationIR(
                 version="1.0",
@@ -56,6 +155,7 @@ class TemplateService:
             name="Title Card",
             description="Professional title card with subtitle",
             category="presentation",
+            keywords=["title", "subtitle", "heading", "card", "opening", "intro", "slide"],
             is_premium=False,
             animation_ir=AnimationIR(
                 version="1.0",
@@ -103,6 +203,7 @@ class TemplateService:
             name="Loading Animation",
             description="Circular loading indicator",
             category="social",
+            keywords=["loading", "loader", "spinner", "spinning", "progress", "waiting"],
             is_premium=False,
             animation_ir=AnimationIR(
                 version="1.0",
@@ -141,6 +242,7 @@ class TemplateService:
             name="Three Steps",
             description="Animated three-step process visualization",
             category="explainer",
+            keywords=["three", "3", "steps", "process", "workflow", "stages", "how it works"],
             is_premium=True,
             animation_ir=AnimationIR(
                 version="1.0",
@@ -245,6 +347,8 @@ class TemplateService:
 
         for template in (logo_reveal, title_card, loading, three_steps):
             TEMPLATES[template.id] = template
+        
+        self.index = TemplateIndex(list(TEMPLATES.values()))
     
     def get_all_templates(self, include_premium: bool = False) -> List[AnimationTemplate]:
         """Get all available templates"""
@@ -265,6 +369,88 @@ class TemplateService:
         templates = self.get_all_templates(include_premium)
         return [t for t in templates if t.category == category]
     
+    def _prompt_values(self, prompt: str) -> tuple[list[str], str]:
+        """
+        Pull the user's own text out of a prompt. Returns the values in order
+        and the prompt with them removed (so they do not skew matching).
+        """
+        values = [a or b for a, b in _QUOTED.findall(prompt)]
+        remainder = _QUOTED.sub(" ", prompt)
+        
+        if not values:
+            listed = _LISTED.search(remainder)
+            if listed and "," in listed.group("items"):
+                values = [
+                    item.strip() for item in re.split(r",|\band\b", listed.group("items"))
+                    if item.strip()
+                ]
+                remainder = remainder[:listed.start()]
+        
+        if not values:
+            named = _NAMED.search(remainder)
+            if named:
+                values = [named.group("value").strip()]
+                remainder = remainder[:named.start("value")] + remainder[named.end("value"):]
+        
+        return values, remainder
+    
+    def match_template(
+        self,
+        prompt: str,
+        threshold: Optional[float] = None,
+        margin: Optional[float] = None,
+        include_premium: bool = False
+    ) -> Optional[tuple[str, dict, float]]:
+        """
+        Match a creation prompt against the template index (premium
+        templates only with include_premium).
+        Returns (template_id, customizations, score) when one template is a
+        confident match for the whole prompt, otherwise None. Text objects
+        are filled, in order, with the values found in the prompt.
+        """
+        threshold = settings.TEMPLATE_MATCH_THRESHOLD if threshold is None else threshold
+        margin = settings.TEMPLATE_MATCH_MARGIN if margin is None else margin
+        if _SEQUENCE.search(_QUOTED.sub(" ", prompt)):
+            return None  # several requests in a row: the rest would be lost
+        values, remainder = self._prompt_values(prompt)
+        
+        customizations: dict = {}
+        background = _BACKGROUND.search(remainder)
+        if background:
+            customizations["background_color"] = COLOR_NAMES[background.group("color").lower()]
+            remainder = remainder[:background.start()] + remainder[background.end():]
+        
+        if len([p for p in re.split(r"[,;]", remainder) if tokenize(p)]) > 1:
+            return None  # several clauses: the rest would be lost
+        remainder = _PURPOSE.sub(" ", remainder)
+        
+        results = [
+            (template_id, score) for template_id, score in self.index.search(remainder)
+            if include_premium or not TEMPLATES[template_id].is_premium
+        ]
+        if not results:
+            return None
+        
+        template_id, score = results[0]
+        runner_up = results[1][1] if len(results) > 1 else 0.0
+        if score < threshold or score - runner_up < margin:
+            return None
+        vocabulary = self.index.vectors[template_id]
+        if any(token not in vocabulary for token in tokenize(remainder)):
+            return None  # asks for something the template does not have
+        
+        placeholders: list[str] = []
+        for scene in TEMPLATES[template_id].animation_ir.scenes:
+            for obj in scene.objects:
+                if obj.type == "text" and obj.content and obj.content not in placeholders:
+                    placeholders.append(obj.content)
+        if len(values) > len(placeholders):
+            return None  # the prompt asks for more text than the template can show
+        if values:
+            customizations["text_replacements"] = dict(zip(placeholders, values))
+        
+        return template_id, customizations, score
+    
     def apply_template(
         self, 
         template_id: str, 
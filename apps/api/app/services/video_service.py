@@ -1,5 +1,6 @@
 import subprocess
 import os
+import uuid
 from pathlib import Path
 from ..config import get_settings
 
@@ -18,7 +19,7 @@ class VideoService:
             os.rename(video_files[0], output_path)
             return output_path
         
-        concat_file = os.path.join(settings.TEMP_DIR, "concat_list.txt")
+        concat_file = os.path.join(settings.TEMP_DIR, f"concat_list_{uuid.uuid4().hex}.txt")
         with open(concat_file, 'w') as f:
             for video_file in video_files:
                 f.write(f"file '{video_file}'\n")
@@ -50,13 +51,15 @@ class VideoService:
         """
         Merge video and audio files.
         Trims to the shortest stream (usually video).
+        AAC audio (e.g. from the TTS cache) is stream-copied instead of re-encoded.
         """
+        audio_codec = 'copy' if audio_path.endswith(('.m4a', '.aac')) else 'aac'
         cmd = [
             'ffmpeg',
             '-i', video_path,
             '-i', audio_path,
             '-c:v', 'copy',
-            '-c:a', 'aac',
+            '-c:a', audio_codec,
             '-map', '0:v:0',
             '-map', '1:a:0',
             '-shortest',
@@ -70,6 +73,66 @@ class VideoService:
         except subprocess.CalledProcessError as e:
             raise RuntimeError(f"FFmpeg audio merge failed: {e.stderr.decode()}")
             
+    def to_animated_webp(self, video_path: str, output_path: str, quality: int = 50) -> str:
+        """Re-encode a (small, low-fps) video as a looping animated WebP"""
+        cmd = [
+            'ffmpeg',
+            '-i', video_path,
+            '-an',
+            '-c:v', 'libwebp',
+            '-loop', '0',
+            '-q:v', str(quality),
+            '-preset', 'picture',
+            output_path,
+            '-y'
+        ]
+        
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg WebP encode failed: {e.stderr.decode()}")
+    
+    def count_frames(self, video_path: str) -> int:
+        """Exact number of video frames (decodes the stream)"""
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-count_frames',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=nb_read_frames',
+            '-of', 'csv=p=0',
+            video_path
+        ]
+        
+        try:
+            result = subprocess.run(cmd, check=True, capture_output=True, text=True)
+            return int(result.stdout.strip())
+        except (subprocess.CalledProcessError, ValueError) as e:
+            raise RuntimeError(f"FFprobe frame count failed: {str(e)}")
+    
+    def to_sprite_sheet(self, video_path: str, output_path: str, columns: int, rows: int) -> str:
+        """
+        Tile every frame of a video into one image, row by row
+        (unused cells at the end are left black).
+        """
+        cmd = [
+            'ffmpeg',
+            '-i', video_path,
+            '-an',
+            '-vf', f'tile={columns}x{rows}',
+            '-frames:v', '1',
+            '-q:v', '4',
+            output_path,
+            '-y'
+        ]
+        
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            return output_path
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"FFmpeg sprite sheet failed: {e.stderr.decode()}")
+    
     def cleanup_file(self, file_path: str):
         """Delete a file if it exists"""
         if os.path.exists(file_path):
@@ -0,0 +1,67 @@
+"""
+Precompile LaTeX and text into the shared Manim cache (settings.MANIM_CACHE_DIR).
+
+Run at deploy time, after LaTeX and Manim are installed:
+
+    uv run python -m app.warm_cache [formulas.txt ...]
+
+Template labels and formulas plus COMMON_FORMULAS are always included; each
+extra file adds one LaTeX expression per line (blank lines and lines starting
+with # are skipped).
+"""
+import sys
+from .models import AnimationObject
+from .services.manim_service import ManimService
+from .services.template_service import TemplateService
+
+COMMON_FORMULAS = [
+    r"e^{i\pi} + 1 = 0",
+    r"E = mc^2",
+    r"a^2 + b^2 = c^2",
+    r"x = \frac{-b \pm \sqrt{b^2 - 4ac}}{2a}",
+    r"\int_a^b f(x)\,dx",
+    r"\frac{d}{dx} f(x)",
+    r"\sum_{n=1}^{\infty} \frac{1}{n^2} = \frac{\pi^2}{6}",
+    r"\lim_{x \to 0} \frac{\sin x}{x} = 1",
+    r"f(x) = x^2",
+    r"y = mx + b",
+]
+
+
+def template_objects() -> list[AnimationObject]:
+    templates = TemplateService().get_all_templates(include_premium=True)
+    return [
+        obj
+        for template in templates
+        for scene in template.animation_ir.scenes
+        for obj in scene.objects
+    ]
+
+
+def formula_objects(formulas: list[str]) -> list[AnimationObject]:
+    return [
+        AnimationObject(type="latex", id=f"formula_{i}", content=formula)
+        for i, formula in enumerate(formulas)
+    ]
+
+
+def read_formulas(path: str) -> list[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [
+            line.strip() for line in f
+            if line.strip() and not line.lstrip().startswith("#")
+        ]
+
+
+def main(paths: list[str]) -> None:
+    formulas = list(COMMON_FORMULAS)
+    for path in paths:
+        formulas += read_formulas(path)
+
+    objects = template_objects() + formula_objects(formulas)
+    count = ManimService().warm_cache(objects)
+    print(f"Precompiled {count} text/LaTeX constructions into the Manim cache")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,101 @@
+import os
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database.models import Base, DBArtifact, DBArtifactRef, DBUser
+from app.services.artifact_store_service import ArtifactStoreService, LocalArtifactBackend
+
+
+@pytest.fixture
+def store(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(engine)
+    sessions = sessionmaker(bind=engine)
+    with sessions() as db:
+        for user_id in ("alice", "bob"):
+            db.add(DBUser(id=user_id, email=f"{user_id}@example.com", username=user_id, hashed_password="x"))
+        db.commit()
+
+    service = ArtifactStoreService(LocalArtifactBackend(str(tmp_path / "artifacts")))
+    service.get_limit_bytes = lambda db, user_id: 10
+    return service, sessions, tmp_path
+
+
+def _render(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_identical_outputs_are_stored_once_and_deleted_with_their_last_ref(store):
+    service, sessions, tmp_path = store
+    with sessions() as db:
+        first = service.store(db, "alice", _render(tmp_path, "job_1.mp4", b"video"), ref_name="job_1")
+        second = service.store(db, "bob", _render(tmp_path, "job_2.mp4", b"video"), ref_name="job_2")
+        path = service.local_path(first)
+
+        assert second.content_hash == first.content_hash and second.ref_count == 2
+        assert not os.path.exists(tmp_path / "job_1.mp4") and not os.path.exists(tmp_path / "job_2.mp4")
+        assert open(path, "rb").read() == b"video"
+
+        assert service.release(db, "alice", ref_name="job_1") == 1
+        assert service.get_artifact(db, first.content_hash).ref_count == 1 and os.path.exists(path)
+
+        assert service.release(db, "bob", ref_name="job_2") == 1
+        assert service.get_artifact(db, first.content_hash) is None and not os.path.exists(path)
+
+
+def test_quota_charges_each_distinct_artifact_once(store):
+    service, sessions, tmp_path = store
+    with sessions() as db:
+        service.store(db, "alice", _render(tmp_path, "a.mp4", b"123456"), ref_name="job_1")
+        service.store(db, "alice", _render(tmp_path, "b.mp4", b"123456"), ref_name="job_2")  # same bytes: free
+        assert service.get_usage_bytes(db, "alice") == 6
+        service.check_quota(db, "alice")
+
+        with pytest.raises(ValueError, match="Storage limit"):
+            service.store(db, "alice", _render(tmp_path, "c.mp4", b"abcdef"), ref_name="job_3")
+        assert not os.path.exists(tmp_path / "c.mp4")  # consumed even when refused
+
+        service.store(db, "alice", _render(tmp_path, "d.mp4", b"abcd"), ref_name="job_4")
+        with pytest.raises(ValueError, match="Storage limit"):
+            service.check_quota(db, "alice")  # full: nothing more can be queued
+        service.check_quota(db, "bob")
+
+
+def test_concurrent_store_of_the_same_content_shares_the_row(store):
+    service, sessions, tmp_path = store
+    limit_bytes = service.get_limit_bytes
+
+    def store_elsewhere_first(db, user_id):
+        # bob's render of the same bytes commits after alice's lookup, before her insert
+        service.get_limit_bytes = limit_bytes
+        with sessions() as other:
+            service.store(other, "bob", _render(tmp_path, "bob.mp4", b"video"), ref_name="job_2")
+        return limit_bytes(db, user_id)
+
+    service.get_limit_bytes = store_elsewhere_first
+    with sessions() as db:
+        artifact = service.store(db, "alice", _render(tmp_path, "alice.mp4", b"video"), ref_name="job_1")
+
+        assert artifact.ref_count == 2
+        assert db.query(DBArtifact).count() == 1 and db.query(DBArtifactRef).count() == 2
+
+
+def test_release_deletes_the_blob_only_after_the_rows_are_committed(store):
+    service, sessions, tmp_path = store
+    backend_delete = service.backend.delete
+    seen = []
+
+    def delete(storage_key):
+        with sessions() as other:
+            seen.append(other.query(DBArtifact).count())
+        backend_delete(storage_key)
+
+    service.backend.delete = delete
+    with sessions() as db:
+        artifact = service.store(db, "alice", _render(tmp_path, "job_1.mp4", b"video"), ref_name="job_1")
+        path = service.local_path(artifact)
+        assert service.release(db, "alice", ref_name="job_1") == 1
+
+    assert seen == [0] and not os.path.exists(path)
@@ -0,0 +1,102 @@
+import os
+import shutil
+import subprocess
+import time
+import pytest
+from app.services import audio_service
+from app.services.audio_service import AudioService, PiperBackend, TTSCache
+
+
+class FakeBackend:
+    name = "fake"
+    extension = ".wav"
+
+    def __init__(self):
+        self.calls = []
+
+    def synthesize(self, text, lang, output_path):
+        self.calls.append((text, lang))
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(f"{lang}:{text}")
+        return output_path
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_service.settings, "TEMP_DIR", str(tmp_path / "temp"))
+    service = AudioService(backend=FakeBackend())
+    service.cache = TTSCache(str(tmp_path / "tts"), 1024 * 1024)
+    service._transcode_to_aac = lambda src, dst: shutil.copyfile(src, dst)  # no ffmpeg here
+    return service
+
+
+def test_voiceovers_come_back_in_order_and_repeats_synthesize_once(service):
+    items = [("Hello  world", "en"), ("Hallo Welt", "de"), ("Hello world", "en"), ("Hello world", "fr")]
+
+    paths = service.generate_voiceovers(items)
+
+    contents = [open(path, encoding="utf-8").read() for path in paths]
+    assert contents == ["en:Hello world", "de:Hallo Welt", "en:Hello world", "fr:Hello world"]
+    assert paths[0] == paths[2] and service.cache.contains(paths[0])
+    assert sorted(service.backend.calls) == [("Hallo Welt", "de"), ("Hello world", "en"), ("Hello world", "fr")]
+    assert service.cache._locks == {}
+
+    service.cleanup_audio(paths[0])  # cached narration is kept
+    assert service.generate_voiceover("Hello world", "en") == paths[0]
+    assert len(service.backend.calls) == 3
+
+
+def test_backend_failures_are_reported_and_leave_nothing_behind(service, tmp_path):
+    def fail(text, lang, output_path):
+        raise RuntimeError("no voice")
+
+    service.backend.synthesize = fail
+    with pytest.raises(RuntimeError, match="TTS generation failed: no voice"):
+        service.generate_voiceover("Hello", "en")
+    with pytest.raises(ValueError):
+        service.generate_voiceover("   ", "en")
+    assert list((tmp_path / "temp").iterdir()) == []
+    assert service.cache._locks == {}
+
+
+def test_piper_picks_the_voice_model_for_the_language(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_service.settings, "PIPER_MODEL", "/models/en_US.onnx")
+    monkeypatch.setattr(audio_service.settings, "PIPER_MODEL_LANG", "en")
+    monkeypatch.setattr(audio_service.settings, "PIPER_MODELS", {"de": "/models/de_DE.onnx"})
+    commands = []
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kwargs: commands.append(cmd))
+
+    backend = PiperBackend()
+    backend.synthesize("Hallo", "de", str(tmp_path / "out.wav"))
+    backend.synthesize("Hello", "en-GB", str(tmp_path / "out.wav"))
+
+    assert [cmd[cmd.index("--model") + 1] for cmd in commands] == ["/models/de_DE.onnx", "/models/en_US.onnx"]
+    with pytest.raises(ValueError, match="No piper voice model for language 'fr'"):
+        backend.synthesize("Bonjour", "fr", str(tmp_path / "out.wav"))
+
+
+def test_cache_put_never_evicts_the_new_or_recently_used_entries(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_service.settings, "TEMP_GC_MIN_AGE_SECONDS", 900)
+    cache = TTSCache(str(tmp_path / "tts"), max_bytes=10)
+    old = cache.path_for("old")
+    with open(old, "wb") as f:
+        f.write(b"x" * 10)
+    os.utime(old, (time.time() - 3600, time.time() - 3600))
+    recent = cache.put("recent", _audio(tmp_path, "recent.m4a", 10))
+
+    assert not os.path.exists(old)  # over budget: the stale entry goes first
+    assert cache.get("recent") == recent
+
+    # still over budget, but nothing left is old enough to evict
+    assert cache.put("big", _audio(tmp_path, "big.m4a", 50)) == cache.path_for("big")
+    assert os.path.exists(recent) and os.path.exists(cache.path_for("big"))
+
+    monkeypatch.setattr(audio_service.settings, "TEMP_GC_MIN_AGE_SECONDS", 0)
+    huge = cache.put("huge", _audio(tmp_path, "huge.m4a", 100))
+    assert os.listdir(cache.cache_dir) == [os.path.basename(huge)]  # the entry just written stays
+
+
+def _audio(tmp_path, name, size):
+    path = tmp_path / name
+    path.write_bytes(b"a" * size)
+    return str(path)
@@ -0,0 +1,50 @@
+from app.models import AnimationIR
+from app.services.edit_intents import match_edit_intent
+from app.services.ir_patch import apply_patch
+
+
+def _animation():
+    return AnimationIR(
+        metadata={"title": "Demo", "duration_estimate": 4.0, "total_scenes": 1},
+        scenes=[{
+            "scene_id": "intro",
+            "duration": 4.0,
+            "objects": [
+                {"type": "text", "id": "title", "content": "Hello", "font_size": 48,
+                 "animations": [{"type": "write", "start_time": 0.0, "duration": 2.0}]},
+                {"type": "shape", "id": "dot", "shape": "circle", "radius": 1.0, "position": [0, -2, 0]},
+            ],
+        }],
+    )
+
+
+def _apply(message):
+    intent = match_edit_intent(message, _animation())
+    return apply_patch(_animation(), intent[0]) if intent else None
+
+
+def test_simple_edits_are_applied_locally():
+    assert _apply("Make the title red.").scenes[0].objects[0].color == "#ff0000"
+    assert _apply("move the circle to the left").scenes[0].objects[1].position == [-4.0, -2.0, 0]
+    assert _apply("make the circle 2x bigger").scenes[0].objects[1].radius == 2.0
+    assert _apply("change the background to black").scenes[0].background_color == "#000000"
+    assert _apply("use the cyberpunk style").style == "cyberpunk"
+
+    faster = _apply("make it 2 times faster")
+    assert faster.scenes[0].duration == 2.0
+    assert faster.scenes[0].objects[0].animations[0].duration == 1.0
+
+
+def test_slowing_down_stretches_scenes_and_plays_alike_within_the_scene_limit():
+    slower = _apply("make it 5 times slower")  # 20 s would not fit: capped at 10 s (2.5x)
+    assert slower.scenes[0].duration == 10.0
+    assert slower.scenes[0].objects[0].animations[0].duration == 5.0
+
+    assert _apply("make the title 2x slower").scenes[0].objects[0].animations[0].duration == 4.0
+    assert match_edit_intent("make it 2x slower", slower) is None  # already as long as a scene may be
+
+
+def test_ambiguous_or_compound_requests_fall_back():
+    assert match_edit_intent("make it red", _animation()) is None
+    assert match_edit_intent("make the title red and add a square", _animation()) is None
+    assert match_edit_intent("add a bouncing ball", _animation()) is None
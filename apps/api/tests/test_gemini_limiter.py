@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from app.services.gemini_limiter import GeminiLimiter, GeminiOverloadedError
+
+
+def test_limiter_queues_within_deadline_and_rejects_beyond_it():
+    limiter = GeminiLimiter(rpm=60, tpm=0, max_concurrency=4, queue_size=8, queue_timeout=1.5, backoff_seconds=5)
+    limiter.requests.tokens = 1
+
+    async def call():
+        async with limiter.slot(0):
+            return "ok"
+
+    async def run():
+        return await asyncio.gather(*[call() for _ in range(3)], return_exceptions=True)
+
+    first, second, third = asyncio.run(run())
+
+    assert first == "ok" and second == "ok"  # second waits ~1s for a refill
+    assert isinstance(third, GeminiOverloadedError) and third.retry_after >= 1
+
+
+def test_full_queue_is_rejected_immediately():
+    limiter = GeminiLimiter(rpm=0, tpm=0, max_concurrency=1, queue_size=0, queue_timeout=5, backoff_seconds=5)
+
+    with pytest.raises(GeminiOverloadedError):
+        limiter.check()
+
+
+def test_callers_cancelled_while_waiting_for_a_slot_get_their_quota_back():
+    limiter = GeminiLimiter(rpm=60, tpm=1000, max_concurrency=1, queue_size=8, queue_timeout=5, backoff_seconds=5)
+
+    async def run():
+        async with limiter.slot(100):
+            waiter = asyncio.create_task(limiter.acquire(300))
+            await asyncio.sleep(0.05)  # quota taken, waiting on the semaphore
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+
+    asyncio.run(run())
+
+    assert round(limiter.tokens.tokens) == 900 and round(limiter.requests.tokens) == 59
+    assert limiter.waiting == 0 and limiter.in_flight == 0
@@ -0,0 +1,63 @@
+import asyncio
+import time
+import pytest
+from app.services.gemini_resilience import CircuitBreaker, GeminiUnavailableError, LatencyTracker
+
+
+def test_breaker_opens_on_error_rate_and_recovers_after_probe():
+    breaker = CircuitBreaker(window=10, min_calls=4, error_rate=0.5, cooldown=0.05)
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success)
+
+    with pytest.raises(GeminiUnavailableError):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()  # the probe goes out
+    with pytest.raises(GeminiUnavailableError):
+        breaker.before_call()  # others still fail fast while it runs
+    breaker.record(True)
+
+    assert breaker.get_metrics()["state"] == "closed"
+
+
+def test_cancelled_attempts_do_not_skew_latency():
+    tracker = LatencyTracker()
+    for seconds in (1.0, 2.0, 3.0, 4.0):
+        tracker.record("primary", seconds, "ok")
+    tracker.record("primary", 0.1, "cancelled")
+
+    assert tracker.percentile(0.5) == 3.0
+    assert tracker.get_metrics()["primary"]["outcomes"] == {"ok": 4, "cancelled": 1}
+
+
+def test_patch_timeouts_do_not_fall_back_to_a_full_call():
+    from app.models import AnimationIR
+    from app.services.gemini_resilience import GeminiTimeoutError
+    from app.services.gemini_service import GeminiService
+
+    service = GeminiService()
+    service.modification_mode = "patch"
+    animation = AnimationIR(metadata={"title": "t"}, scenes=[{"scene_id": "s1", "duration": 1, "objects": []}])
+    full_calls = []
+
+    async def full(*args):
+        full_calls.append(args)
+        return animation
+
+    async def patch_times_out(*args):
+        raise GeminiTimeoutError("Gemini request timed out after 30s")
+
+    async def patch_is_invalid(*args):
+        raise ValueError("Gemini patch was not valid JSON")
+
+    service._modify_full_animation_json = full
+    service.patch_animation_json = patch_times_out
+    with pytest.raises(GeminiTimeoutError):
+        asyncio.run(service.modify_animation_json("make it red", animation))
+    assert not full_calls
+
+    service.patch_animation_json = patch_is_invalid
+    assert asyncio.run(service.modify_animation_json("make it red", animation)) is animation
+    assert len(full_calls) == 1
@@ -0,0 +1,19 @@
+from app.models import Animation, AnimationIR, AnimationObject, AudioConfig, Scene
+from app.services.gemini_service import ANIMATION_RESPONSE_SCHEMA
+
+
+def test_response_schema_covers_every_model_field():
+    scene = ANIMATION_RESPONSE_SCHEMA["properties"]["scenes"]["items"]
+    obj = scene["properties"]["objects"]["items"]
+    anim = obj["properties"]["animations"]["items"]
+    audio = ANIMATION_RESPONSE_SCHEMA["properties"]["audio"]
+
+    for model, schema in [
+        (AnimationIR, ANIMATION_RESPONSE_SCHEMA), (Scene, scene), (AnimationObject, obj),
+        (Animation, anim), (AudioConfig, audio),
+    ]:
+        assert set(model.model_fields) == set(schema["properties"]), model.__name__
+
+    assert "image" in obj["properties"]["type"]["enum"]
+    assert {"polygon", "arrow"} <= set(obj["properties"]["shape"]["enum"])
+    assert anim["properties"]["easing"]["enum"] == ["linear", "ease_in", "ease_out", "ease_in_out", "bounce"]
@@ -0,0 +1,24 @@
+import json
+from app.services.ir_codec import decode_compact, encode_compact
+from app.services.template_service import TemplateService
+
+
+def test_compact_encoding_round_trips_templates():
+    service = TemplateService()
+
+    for template in service.get_all_templates(include_premium=True):
+        animation = template.animation_ir
+        compact = encode_compact(animation)
+
+        assert decode_compact(compact) == animation
+        assert len(compact) < len(json.dumps(animation.model_dump(), indent=2)) / 3
+
+
+def test_compact_encoding_drops_defaults_and_nulls():
+    animation = TemplateService().get_template_by_id("title_card").animation_ir
+    compact = json.loads(encode_compact(animation))
+
+    title = compact["S"][0]["o"][0]
+    assert "stroke_width" not in title and "sw" not in title
+    assert "target_position" not in json.dumps(compact)
+    assert compact["m"]["title"] == "Title Card"
@@ -0,0 +1,53 @@
+from app.models import Scene
+from app.services.ir_optimizer import optimize_scene
+from app.services.ir_timeline import scene_steps
+
+
+def test_noops_become_waits_and_the_timeline_is_kept():
+    scene = Scene(scene_id="s1", duration=6, objects=[
+        {"type": "text", "id": "title", "content": "Hi", "animations": [
+            {"type": "write", "start_time": 0, "duration": 1},
+            {"type": "scale", "start_time": 1, "duration": 1, "scale_factor": 1.0},
+            {"type": "rotate", "start_time": 3, "duration": 1, "angle": 0},
+            {"type": "fade_out", "start_time": 4, "duration": 1},
+        ]},
+        {"type": "text", "id": "unused", "content": "never shown"},
+        {"type": "shape", "shape": "circle", "id": "dot", "animations": [
+            {"type": "scale", "start_time": 1.5, "duration": 1, "scale_factor": 1.0},  # not on screen yet: adds it
+        ]},
+    ])
+
+    optimized = optimize_scene(scene)
+    steps = [(step.kind, step.start, step.duration) for step in scene_steps(optimized)]
+
+    assert [obj.id for obj in optimized.objects] == ["title", "dot"]
+    assert steps == [
+        ("play", 0, 1),
+        ("wait", 1, 1),  # the no-op scale on "title"
+        ("play", 2, 1),  # overlapped in the IR, so it really starts at 2
+        ("wait", 3, 1),
+        ("play", 4, 1),
+        ("wait", 5, 1),
+    ]
+
+
+def test_offscreen_transforms_are_kept_when_the_object_comes_back():
+    scene = Scene(scene_id="s1", duration=5, objects=[
+        {"type": "shape", "shape": "square", "id": "sq", "animations": [
+            {"type": "fade_in", "start_time": 0, "duration": 1},
+            {"type": "move_to", "start_time": 1, "duration": 1, "target_position": [20, 0, 0]},
+            {"type": "scale", "start_time": 2, "duration": 0.5, "scale_factor": 3.0},
+            {"type": "rotate", "start_time": 2.5, "duration": 0.5, "angle": 45},
+            {"type": "move_to", "start_time": 3, "duration": 1, "target_position": [0, 0, 0]},
+        ]},
+        {"type": "shape", "shape": "circle", "id": "gone", "animations": [
+            {"type": "fade_in", "start_time": 0, "duration": 1},
+            {"type": "move_to", "start_time": 1, "duration": 1, "target_position": [0, 20, 0]},
+            {"type": "scale", "start_time": 2, "duration": 1, "scale_factor": 2.0},  # never seen again
+        ]},
+    ])
+
+    optimized = {obj.id: [anim.type for anim in obj.animations] for obj in optimize_scene(scene).objects}
+
+    assert optimized["sq"] == ["fade_in", "move_to", "scale", "rotate", "move_to"]
+    assert optimized["gone"] == ["fade_in", "move_to"]
@@ -0,0 +1,48 @@
+import pytest
+from app.models import AnimationIR
+from app.services.ir_patch import apply_patch
+
+
+def _animation():
+    return AnimationIR(
+        metadata={"title": "Demo", "duration_estimate": 3.0, "total_scenes": 1},
+        scenes=[{
+            "scene_id": "intro",
+            "duration": 3.0,
+            "objects": [
+                {"type": "text", "id": "title", "content": "Hello", "color": "#ffffff"},
+                {"type": "shape", "id": "dot", "shape": "circle", "radius": 0.5},
+            ],
+        }],
+    )
+
+
+def test_update_object_changes_only_addressed_fields():
+    patched = apply_patch(_animation(), [
+        {"op": "update_object", "id": "title", "set": {"color": "#ff0000"}},
+    ])
+
+    title = patched.scenes[0].objects[0]
+    assert title.color == "#ff0000"
+    assert title.content == "Hello"
+    assert patched.scenes[0].objects[1].radius == 0.5
+
+
+def test_scene_ops_keep_metadata_consistent():
+    patched = apply_patch(_animation(), [
+        {"op": "remove_object", "id": "dot"},
+        {"op": "add_scene", "after": "intro", "scene": {"scene_id": "outro", "duration": 2.0, "objects": []}},
+    ])
+
+    assert [scene.scene_id for scene in patched.scenes] == ["intro", "outro"]
+    assert len(patched.scenes[0].objects) == 1
+    assert patched.metadata["total_scenes"] == 2
+    assert patched.metadata["duration_estimate"] == 5.0
+
+
+def test_invalid_patch_is_rejected():
+    with pytest.raises(ValueError):
+        apply_patch(_animation(), [{"op": "update_object", "id": "missing", "set": {"color": "#000000"}}])
+
+    with pytest.raises(ValueError):
+        apply_patch(_animation(), [{"op": "update_object", "id": "title", "set": {"position": [99, 0, 0]}}])
@@ -0,0 +1,44 @@
+import pytest
+from app.models import AnimationIR
+from app.services.ir_repair import coerce_animation, repair_json
+
+
+def test_repair_json_handles_common_model_mistakes():
+    assert repair_json('```json\n{"a": [1, 2,],}\n```') == {"a": [1, 2]}
+    assert repair_json("Here you go: {'a': 'it\\'s', b: True} Enjoy!") == {"a": "it's", "b": True}
+
+    with pytest.raises(ValueError):
+        repair_json("I cannot help with that.")
+
+
+def test_truncated_output_is_completed_at_last_whole_element():
+    text = '{"scenes": [{"scene_id": "s1", "objects": []}, {"scene_id": "s2", "objects": [{"ty'
+
+    assert repair_json(text) == {"scenes": [{"scene_id": "s1", "objects": []}, {"scene_id": "s2", "objects": []}]}
+
+
+def test_out_of_range_values_are_coerced_into_bounds():
+    data = coerce_animation({
+        "metadata": {},
+        "scenes": [{
+            "scene_id": "intro",
+            "duration": 45,
+            "objects": [{
+                "type": "text",
+                "id": "title",
+                "content": "Hi",
+                "position": [12, -9],
+                "font_size": 400,
+                "animations": [{"type": "write", "start_time": -1, "duration": 0}, {"type": "explode"}],
+            }],
+        }, {"scene_id": "cut"}],
+    })
+
+    animation = AnimationIR(**data)
+    title = animation.scenes[0].objects[0]
+    assert len(animation.scenes) == 1
+    assert animation.scenes[0].duration == 10
+    assert title.position == [7, -4, 0]
+    assert title.font_size == 120
+    assert [(a.type, a.start_time) for a in title.animations] == [("write", 0)]
+    assert animation.metadata["total_scenes"] == 1
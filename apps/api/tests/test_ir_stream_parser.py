@@ -0,0 +1,60 @@
+import json
+from app.services.ir_stream_parser import IncrementalSceneParser
+
+
+def _animation_json():
+    return json.dumps({
+        "version": "1.0",
+        "metadata": {"title": "Braces { in [ strings", "scenes": "not the array"},
+        "scenes": [
+            {
+                "scene_id": f"scene_{i}",
+                "duration": 3.0,
+                "objects": [
+                    {
+                        "type": "text",
+                        "id": "title",
+                        "content": "quote \" and brace }",
+                        "animations": [{"type": "write", "start_time": 0.0, "duration": 1.0}]
+                    }
+                ]
+            }
+            for i in range(3)
+        ]
+    }, indent=2)
+
+
+def test_emits_each_scene_as_it_completes():
+    text = "```json\n" + _animation_json() + "\n```"
+    parser = IncrementalSceneParser()
+
+    emitted = []
+    for i in range(0, len(text), 5):
+        emitted += [scene.scene_id for scene in parser.feed(text[i:i + 5])]
+
+    assert emitted == ["scene_0", "scene_1", "scene_2"]
+    assert parser.text == text
+
+
+def test_incomplete_scene_is_not_emitted():
+    text = _animation_json()
+    cut = text.index('"scene_1"')
+    parser = IncrementalSceneParser()
+
+    assert [scene.scene_id for scene in parser.feed(text[:cut])] == ["scene_0"]
+
+
+def test_streamed_scenes_get_the_final_documents_ids():
+    from app.services.ir_repair import coerce_animation
+
+    data = {"metadata": {"title": "t"}, "scenes": [
+        {"duration": 2.0},  # truncated-looking: dropped, but it still takes a position
+        {"duration": 3.0, "objects": [{"type": "text", "content": "Hi"}]},
+        {"scene_id": "outro", "duration": 2.0, "objects": []},
+    ]}
+    parser = IncrementalSceneParser()
+
+    streamed = [scene.scene_id for scene in parser.feed(json.dumps(data))]
+    final = [scene["scene_id"] for scene in coerce_animation(data)["scenes"]]
+
+    assert streamed == final == ["scene_2", "outro"]
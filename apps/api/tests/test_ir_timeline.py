@@ -0,0 +1,25 @@
+from app.models import Scene
+from app.services.ir_timeline import scene_steps
+
+
+def test_steps_match_the_generated_play_and_wait_calls():
+    scene = Scene(scene_id="s1", duration=6, objects=[
+        {"type": "text", "id": "a", "content": "A", "animations": [
+            {"type": "write", "start_time": 0.5, "duration": 1},
+            {"type": "fade_out", "start_time": 4, "duration": 1},
+        ]},
+        {"type": "text", "id": "b", "content": "B", "animations": [
+            {"type": "fade_in", "start_time": 1, "duration": 1},  # overlaps: runs after the write
+        ]},
+    ])
+
+    steps = [(step.kind, step.start, step.duration) for step in scene_steps(scene)]
+
+    assert steps == [
+        ("wait", 0, 0.5),
+        ("play", 0.5, 1),
+        ("play", 1.5, 1),
+        ("wait", 2.5, 1.5),
+        ("play", 4, 1),
+        ("wait", 5, 1),
+    ]
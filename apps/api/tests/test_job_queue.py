@@ -0,0 +1,30 @@
+import asyncio
+from app.models import AnimationIR, RenderJob
+from app.services.job_queue_service import JobQueueService
+
+
+def _job(audio):
+    animation_ir = AnimationIR(metadata={"title": "t"}, audio=audio, scenes=[
+        {"scene_id": "intro", "duration": 2.0, "narration": "Hello", "objects": [
+            {"type": "text", "id": "title", "content": "Hi", "animations": [
+                {"type": "write", "start_time": 0, "duration": 5},  # overruns the 2 s scene
+            ]},
+        ]},
+        {"scene_id": "quiet", "duration": 3.0, "objects": []},
+    ])
+    return RenderJob(user_id="alice", animation_ir=animation_ir)
+
+
+def test_scene_narration_is_aligned_to_the_rendered_scene_length():
+    service = JobQueueService()
+    tracks = []
+    service.audio_service.generate_voiceovers = lambda items: [f"{text}.m4a" for text, _ in items]
+    service.audio_service.build_aligned_track = lambda segments, output: tracks.append(segments) or output
+
+    assert asyncio.run(service._prepare_audio(_job({"enabled": True}))).endswith("_narration.m4a")
+    assert tracks == [[("Hello.m4a", 5.0), (None, 3.0)]]
+
+    # narration follows the audio switch whether it is off or missing
+    assert asyncio.run(service._prepare_audio(_job({"enabled": False}))) is None
+    assert asyncio.run(service._prepare_audio(_job(None))) is None
+    assert len(tracks) == 1
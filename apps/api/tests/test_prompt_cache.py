@@ -0,0 +1,78 @@
+import asyncio
+import os
+from app.services.prompt_cache import PromptCache, normalize_prompt
+
+
+def test_normalize_prompt_keeps_quoted_text():
+    assert normalize_prompt("A Blue  circle that appears.") == "a blue circle that appears"
+    assert normalize_prompt('Logo reveal for "Acme"') == 'logo reveal for "Acme"'
+
+
+def test_concurrent_misses_share_one_generation(tmp_path):
+    cache = PromptCache(str(tmp_path), 1024 * 1024, ttl_seconds=60)
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return '{"ok": true}'
+
+    async def run():
+        key = cache.key(request="a blue circle")
+        results = await asyncio.gather(*[
+            cache.get_or_generate(key, generate, str.upper) for _ in range(3)
+        ])
+        results.append(await cache.get_or_generate(key, generate, str.upper))
+        return results
+
+    results = asyncio.run(run())
+
+    assert len(calls) == 1
+    assert results == ['{"OK": TRUE}'] * 4
+    assert cache.get_metrics()["hits"] == 1
+
+
+def test_writes_under_budget_do_not_scan_the_cache(tmp_path, monkeypatch):
+    from app.services import prompt_cache
+
+    cache = PromptCache(str(tmp_path), max_bytes=200, ttl_seconds=60)
+    evictions = []
+    evict_lru = prompt_cache.evict_lru
+    monkeypatch.setattr(prompt_cache, "evict_lru", lambda *args, **kwargs: evictions.append(1) or evict_lru(*args, **kwargs))
+
+    cache.put("a", "x" * 50)
+    cache.put("a", "y" * 50)  # replacing an entry does not grow the cache
+    assert evictions == []
+
+    cache.put("b", "z" * 150)
+    assert evictions == [1] and cache.get("b") == "z" * 150
+    assert cache._size_bytes == os.path.getsize(cache.path_for("b"))
+
+
+def test_identical_streamed_prompts_share_one_model_call(tmp_path):
+    from app.services.gemini_service import GeminiService
+
+    service = GeminiService()
+    service.cache = PromptCache(str(tmp_path), 1024 * 1024, ttl_seconds=60)
+    text = '{"metadata": {"title": "t"}, "scenes": [{"scene_id": "s1", "duration": 2, "objects": []}]}'
+    calls = []
+
+    async def stream(prompt):
+        calls.append(prompt)
+        for i in range(0, len(text), 20):
+            await asyncio.sleep(0.005)
+            yield text[i:i + 20]
+
+    service._stream_content = stream
+
+    async def chat():
+        events = [event async for event in service.stream_conversational_response("a blue circle", [], None)]
+        return events[-1][1][1]
+
+    async def run():
+        return await asyncio.gather(chat(), chat())
+
+    first, second = asyncio.run(run())
+
+    assert len(calls) == 1 and first == second
+    assert service.cache.get_metrics()["coalesced"] == 1
@@ -0,0 +1,108 @@
+import asyncio
+import pytest
+from app.models import AnimationIR
+from app.services import quick_preview_service
+from app.services.quick_preview_service import QuickPreviewService, preview_key
+
+
+def _animation(scenes=1, duration=4.0, narration=None, content="Hi"):
+    return AnimationIR(metadata={"title": "t"}, scenes=[
+        {"scene_id": f"s{i}", "duration": duration, "narration": narration, "objects": [
+            {"type": "text", "id": "title", "content": content, "animations": [
+                {"type": "write", "start_time": 0, "duration": 1},
+            ]},
+        ]}
+        for i in range(scenes)
+    ])
+
+
+@pytest.fixture
+def service(monkeypatch, tmp_path):
+    settings = quick_preview_service.settings
+    monkeypatch.setattr(settings, "TEMP_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "QUICK_PREVIEW_FPS", 12)
+    monkeypatch.setattr(settings, "QUICK_PREVIEW_MAX_FRAMES", 120)
+
+    service = QuickPreviewService()
+    service.cache_dir = str(tmp_path / "previews")
+    (tmp_path / "previews").mkdir()
+    service.renders = []
+
+    async def render_planned(job_id, units, resolution, fps):
+        service.renders.append((len(units), resolution, fps))
+        return [str(tmp_path / f"unit_{i}.mp4") for i in range(len(units))]
+
+    def write(path, data=b"x"):
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    service.manim_service.render_planned = render_planned
+    service.video_service.merge_videos = lambda files, output: write(output)
+    service.video_service.count_frames = lambda path: 10
+    service.video_service.to_sprite_sheet = lambda src, dst, columns, rows: write(dst, f"{columns}x{rows}".encode())
+    service.video_service.to_animated_webp = lambda src, dst: write(dst)
+    return service
+
+
+def _preview(service, animation_ir, kind, on_miss=None):
+    async def run():
+        # Blocking, like the endpoint: called from a thread, renders on this loop
+        return await asyncio.to_thread(service.get_preview, animation_ir, asyncio.get_running_loop(), kind, on_miss)
+    return asyncio.run(run())
+
+
+def test_preview_key_ignores_narration_and_audio_only():
+    base = preview_key(_animation(), "webp", 256, 144, 6)
+
+    assert preview_key(_animation(narration="Hello there"), "webp", 256, 144, 6) == base
+    narrated = _animation()
+    narrated.audio = {"enabled": True, "text": "Hello there"}
+    assert preview_key(narrated, "webp", 256, 144, 6) == base
+
+    assert preview_key(_animation(content="Bye"), "webp", 256, 144, 6) != base
+    assert len({
+        base,
+        preview_key(_animation(), "sprite", 256, 144, 6),
+        preview_key(_animation(), "webp", 320, 180, 6),
+        preview_key(_animation(), "webp", 256, 144, 5),
+    }) == 4
+
+
+def test_fps_drops_to_keep_long_animations_under_the_frame_budget(service):
+    assert service._fps_for(_animation(duration=4.0)) == 12  # 48 frames: configured fps
+    assert service._fps_for(_animation(scenes=3, duration=10.0)) == 4  # 120 frames / 30 s
+    assert service._fps_for(_animation(scenes=20, duration=10.0)) == 1  # never below 1 fps
+
+
+def test_sprite_sheet_grid_and_index_are_cached_with_the_sheet(service):
+    key, path, index = _preview(service, _animation(), "sprite")
+
+    assert index == {
+        "frames": 10, "fps": 12, "frame_width": 256, "frame_height": 144,
+        "columns": 4, "rows": 3,  # smallest near-square grid holding 10 frames
+    }
+    assert open(path, "rb").read() == b"4x3"
+    assert service.renders == [(1, (256, 144), 12)]
+
+    assert _preview(service, _animation(), "sprite") == (key, path, index)
+    assert service.renders == [(1, (256, 144), 12)] and (service.hits, service.misses) == (1, 1)
+
+    _, webp_path, webp_index = _preview(service, _animation(), "webp")
+    assert webp_path.endswith(".webp") and webp_index is None
+    assert len(service.renders) == 2
+
+
+def test_only_misses_are_charged_and_key_locks_are_dropped(service):
+    charged = []
+
+    _preview(service, _animation(), "webp", on_miss=lambda: charged.append(1))
+    _preview(service, _animation(), "webp", on_miss=lambda: charged.append(1))
+    assert charged == [1] and service._locks == {}
+
+    def refuse():
+        raise RuntimeError("Daily limit reached")
+
+    with pytest.raises(RuntimeError, match="Daily limit"):
+        _preview(service, _animation(content="Bye"), "webp", on_miss=refuse)
+    assert len(service.renders) == 1 and service.misses == 1 and service._locks == {}
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+from app.services.render_scheduler import RenderScheduler, URGENT
+
+
+def test_small_job_overtakes_queued_work_of_a_big_job():
+    scheduler = RenderScheduler(workers=1, aging=0.0)
+    gate = threading.Event()
+    order = []
+
+    def render(name):
+        gate.wait(5)
+        order.append(name)
+        return name
+
+    async def run():
+        big = asyncio.create_task(scheduler.run_all("big", [(render, (f"big{i}",), 5.0) for i in range(3)]))
+        await asyncio.sleep(0.05)  # big0 is running, big1 and big2 are queued
+        small = asyncio.create_task(scheduler.run_all("small", [(render, ("small",), 1.0)]))
+        merge = asyncio.create_task(scheduler.run("big", render, "merge", tier=URGENT))
+        await asyncio.sleep(0.05)
+        gate.set()
+        return await asyncio.gather(big, small, merge)
+
+    big, small, merge = asyncio.run(run())
+
+    assert big == ["big0", "big1", "big2"] and small == ["small"]
+    assert order == ["big0", "merge", "small", "big1", "big2"]
+    assert scheduler.remaining == {} and scheduler.running == 0
+
+
+def test_cancel_drops_the_jobs_queued_tasks_at_once():
+    scheduler = RenderScheduler(workers=1, aging=0.0)
+    gate = threading.Event()
+    order = []
+
+    def render(name):
+        gate.wait(5)
+        order.append(name)
+        return name
+
+    async def run():
+        spec = asyncio.create_task(scheduler.run_all("spec", [(render, (f"spec{i}",), 1.0) for i in range(3)]))
+        await asyncio.sleep(0.05)  # spec0 is running
+        other = asyncio.create_task(scheduler.run_all("other", [(render, ("other",), 5.0)]))
+        await asyncio.sleep(0)
+        assert scheduler.cancel("spec") == 2 and scheduler.backlog() == 1
+        gate.set()
+        results = await asyncio.gather(spec, other, return_exceptions=True)
+        return [type(result) if isinstance(result, BaseException) else result for result in results]
+
+    spec, other = asyncio.run(run())
+
+    assert spec is asyncio.CancelledError and other == ["other"]
+    assert order == ["spec0", "other"]  # the running unit finishes; its queued ones never start
+    assert scheduler.remaining == {} and scheduler.running == 0
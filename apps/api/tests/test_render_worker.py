@@ -0,0 +1,37 @@
+import copy
+from functools import partialmethod
+from app.render_worker import MobjectCache
+
+
+class Label:
+    builds = 0
+
+    def __init__(self, text, color="white"):
+        Label.builds += 1
+        self.text = text
+        self.color = color
+        self.position = [0, 0, 0]
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+
+def test_hits_are_copies_and_set_default_changes_the_key():
+    cache = MobjectCache(max_entries=2)
+
+    first = cache.build(Label, ("A",), {})
+    first.position = [1, 2, 0]
+    second = cache.build(Label, ("A",), {})
+    assert Label.builds == 1 and second is not first and second.position == [0, 0, 0]
+
+    original = Label.__init__
+    Label.__init__ = partialmethod(original, color="red")  # what Mobject.set_default does
+    try:
+        restyled = cache.build(Label, ("A",), {})
+    finally:
+        Label.__init__ = original
+    assert Label.builds == 2 and restyled.color == "red"
+
+    cache.build(Label, ("B",), {})  # evicts the least recently used entry (unstyled "A")
+    cache.build(Label, ("A",), {})
+    assert Label.builds == 4 and (cache.hits, cache.misses) == (1, 4)
@@ -0,0 +1,20 @@
+from app.models import Scene
+from app.services.ir_timeline import scene_steps
+from app.services.manim_service import ManimService
+
+
+def test_segment_program_starts_from_the_state_earlier_steps_leave():
+    scene = Scene(scene_id="s1", duration=4, objects=[
+        {"type": "latex", "id": "eq-1", "content": r'\text{"quoted"} \frac{a}{b}', "animations": [
+            {"type": "write", "start_time": 0, "duration": 1},
+            {"type": "scale", "start_time": 1, "duration": 1, "scale_factor": 2.0},
+        ]},
+    ])
+    steps = scene_steps(scene)
+
+    program = ManimService().scene_program(scene, "cyberpunk", steps=steps[1:], prior_steps=steps[:1])
+
+    assert program["background"] == "#050510" and program["math_color"] == "#ff0055"
+    assert program["objects"][0]["content"] == r'\text{"quoted"} \frac{a}{b}'  # passed as is, no escaping
+    assert [(obj_id, anim["type"]) for obj_id, anim in program["prior"]] == [("eq-1", "write")]
+    assert [step[:2] for step in program["steps"]] == [("play", "eq-1"), ("wait", 2)]
@@ -0,0 +1,43 @@
+from app.models import AnimationIR
+from app.services.ir_timeline import scene_length, schedule_scene
+from app.services.svg_preview_service import SvgPreviewService
+
+
+def _animation(objects, duration=3):
+    return AnimationIR(
+        metadata={"title": "Test"},
+        scenes=[{"scene_id": "s1", "duration": duration, "objects": objects}],
+    )
+
+
+def test_overlapping_plays_run_back_to_back_like_the_render():
+    animation = _animation([
+        {"type": "text", "id": "a", "content": "A", "animations": [{"type": "write", "start_time": 0, "duration": 2}]},
+        {"type": "text", "id": "b", "content": "B", "animations": [
+            {"type": "fade_in", "start_time": 1, "duration": 1},
+            {"type": "move_to", "start_time": 2.5, "duration": 1},  # no target: not played
+            {"type": "fade_out", "start_time": 4, "duration": 1},
+        ]},
+    ])
+    scene = animation.scenes[0]
+    timeline = schedule_scene(scene)
+
+    assert [(item.start, item.anim.type) for item in timeline] == [(0, "write"), (2, "fade_in"), (4, "fade_out")]
+    assert scene_length(scene, timeline) == 5
+
+
+def test_compiles_to_self_contained_animated_svg(tmp_path, monkeypatch):
+    service = SvgPreviewService()
+    monkeypatch.setattr(service.latex, "get_svg", lambda expression: None)  # no TeX toolchain
+    animation = _animation([
+        {"type": "latex", "id": "eq", "content": "a<b", "animations": [{"type": "write", "start_time": 0, "duration": 1}]},
+        {"type": "shape", "id": "c", "shape": "circle", "animations": [{"type": "create", "start_time": 1, "duration": 1}]},
+        {"type": "text", "id": "hidden", "content": "never played"},
+    ])
+
+    svg = service.compile(animation)
+
+    assert svg.startswith("<svg") and 'data-duration="3"' in svg
+    assert "a&lt;b" in svg and "<circle" in svg
+    assert "never played" not in svg
+    assert "@keyframes o0_0" in svg and "@keyframes o0_1" in svg
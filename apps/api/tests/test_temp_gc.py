@@ -0,0 +1,46 @@
+import os
+import time
+from app.services.temp_gc_service import evict_lru, evict_lru_dirs, in_use
+
+
+def _file(path, size, age):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    used = time.time() - age
+    os.utime(path, (used, used))
+
+
+def test_evict_lru_removes_oldest_first_and_keeps_pinned_and_young_files(tmp_path):
+    root = str(tmp_path)
+    _file(f"{root}/job_a_scene_000.mp4", 100, age=4000)  # oldest, but its job is running
+    _file(f"{root}/old.mp4", 100, age=3000)
+    _file(f"{root}/older.mp4", 100, age=3500)
+    _file(f"{root}/recent.mp4", 100, age=2000)
+    _file(f"{root}/fresh.mp4", 100, age=10)  # younger than min_age
+
+    with in_use(os.path.join(root, "job_a")):
+        files, freed, remaining = evict_lru(root, budget_bytes=100, min_age_seconds=900)
+
+    assert sorted(os.listdir(root)) == ["fresh.mp4", "job_a_scene_000.mp4"]
+    assert (files, freed, remaining) == (3, 300, 200)  # still over budget: nothing else may go
+
+
+def test_evict_lru_dirs_removes_whole_least_recently_used_dirs(tmp_path):
+    root = str(tmp_path)
+    _file(f"{root}/stale/videos/a.mp4", 100, age=5000)
+    _file(f"{root}/older/videos/a.mp4", 100, age=4000)
+    _file(f"{root}/pinned/videos/a.mp4", 100, age=6000)
+    _file(f"{root}/used/videos/a.mp4", 100, age=5000)
+    _file(f"{root}/used/videos/b.mp4", 100, age=1000)  # one recent file keeps the dir
+    _file(f"{root}/young/videos/a.mp4", 100, age=10)
+    for name, age in [("stale", 5000), ("older", 4000), ("pinned", 6000), ("used", 5000), ("young", 10)]:
+        used = time.time() - age
+        os.utime(f"{root}/{name}", (used, used))
+
+    with in_use(f"{root}/pinned"):
+        assert evict_lru_dirs(root, budget_bytes=400, min_age_seconds=900) == (2, 200, 400)
+        assert sorted(os.listdir(root)) == ["pinned", "used", "young"]
+
+        assert evict_lru_dirs(root, budget_bytes=0, min_age_seconds=900) == (2, 200, 200)
+        assert sorted(os.listdir(root)) == ["pinned", "young"]
@@ -0,0 +1,46 @@
+from app.services.template_service import TemplateService
+
+
+def test_confident_prompts_fill_template_text():
+    service = TemplateService()
+
+    template_id, customizations, _ = service.match_template('A logo reveal for "Acme Corp" on a black background')
+    assert template_id == "logo_reveal"
+    assert customizations == {
+        "background_color": "#000000",
+        "text_replacements": {"YOUR LOGO": "Acme Corp"},
+    }
+
+    template_id, customizations, _ = service.match_template(
+        "a three step process: Plan, Build, Ship", include_premium=True
+    )
+    animation = service.apply_template(template_id, customizations)
+    assert [scene.objects[1].content for scene in animation.scenes] == ["Plan", "Build", "Ship"]
+
+
+def test_unrelated_prompts_do_not_match():
+    service = TemplateService()
+
+    assert service.match_template("a blue circle that appears") is None
+    assert service.match_template("explain the pythagorean theorem with a triangle") is None
+
+
+def test_prompts_the_template_would_only_partly_cover():
+    service = TemplateService()
+
+    # "for my presentation" is what the card is for, not its title
+    template_id, customizations, _ = service.match_template("a title card for my presentation")
+    assert template_id == "title_card" and "text_replacements" not in customizations
+
+    # the slogan would be dropped
+    assert service.match_template("logo reveal for Acme, then show our slogan") is None
+    assert service.match_template("logo reveal for Acme with our slogan") is None
+    assert service.match_template("logo reveal for Acme then show a chart") is None
+
+
+def test_premium_templates_only_match_when_included():
+    service = TemplateService()
+
+    assert service.match_template("a three step process: Plan, Build, Ship") is None
+    template_id, _, _ = service.match_template("a three step process: Plan, Build, Ship", include_premium=True)
+    assert template_id == "three_steps"